@@ -1,15 +1,18 @@
 #ifndef BestZZCandSelector_h
 #define BestZZCandSelector_h
 
+#include <cmath>
+#include <map>
+
 #include "TChain.h"
 #include "TEntryList.h"
 #include "TSelector.h"
+#include "TTreeFormula.h"
 
+// Runs in a single thread with TTree::Process (multithreaded selection is done by columnar.py with -e rdf --columnar)
 class BestZZCandSelector : public TSelector {
 public:
   TTree *fChain = 0;
-  ULong64_t fCurrentEvt;
-  UInt_t fCurrentRun;
 
   ULong64_t evt;
   UInt_t run;
@@ -25,9 +28,10 @@ public:
   TBranch *b_l1Iso, *b_l2Iso, *b_l3Iso, *b_l4Iso;
 
   TEntryList *fEntryList = 0;
+  TTreeFormula *fCut = 0;
 
   BestZZCandSelector(TTree *tree = 0) {}
-  ~BestZZCandSelector() override {}
+  ~BestZZCandSelector() override { delete fCut; }
   void SlaveBegin(TTree *tree) override;
   void Init(TTree *tree) override;
   Bool_t Process(Long64_t entry) override;
@@ -35,7 +39,7 @@ public:
 
   Int_t Version() const override { return 2; }
   void Begin(TTree *tree) override {};
-  Bool_t Notify() override { return true; }
+  Bool_t Notify() override;
   Int_t GetEntry(Long64_t entry, Int_t getall = 0) override {
     return fChain ? fChain->GetTree()->GetEntry(entry, getall) : 0;
   }
@@ -48,12 +52,24 @@ public:
   ClassDefOverride(BestZZCandSelector, 0);
 
 private:
+  struct Candidate {
+    Long64_t entry;
+    float discriminant;
+    float z2PtSum;
+  };
+  // Among the candidates of an event with the best discriminant, the one with the lowest entry and the best pt sum
+  struct EventCandidates {
+    Candidate first;
+    Candidate best;
+  };
+  typedef std::map<std::pair<UInt_t, ULong64_t>, EventCandidates> CandidateMap;
+
+  bool passesCut();
   bool tightZZ();
-  void findBestEntry();
-  Long64_t nEntries;
-  std::vector<Long64_t> fTightEntries, fLooseEntries;
-  std::vector<float> fTightDiscriminants, fLooseDiscriminants;
-  std::vector<float> fTightZ2PtSums, fLooseZ2PtSums;
+  static bool isBetter(const Candidate &candidate, const Candidate &best);
+  static void addCandidate(CandidateMap &bestCandidates, const CandidateMap::key_type &key, const Candidate &candidate);
+  static const Candidate &getBest(const EventCandidates &event);
+  CandidateMap fBestTight, fBestLoose;  //! Best candidates of each (run, evt)
 };
 
 #endif
@@ -1,15 +1,17 @@
 #ifndef BestZplusLCandSelector_h
 #define BestZplusLCandSelector_h
 
+#include <map>
+
 #include "TChain.h"
 #include "TEntryList.h"
 #include "TSelector.h"
+#include "TTreeFormula.h"
 
+// Runs in a single thread with TTree::Process (multithreaded selection is done by columnar.py with -e rdf --columnar)
 class BestZplusLCandSelector : public TSelector {
 public:
   TTree *fChain = 0;
-  ULong64_t fCurrentEvt;
-  UInt_t fCurrentRun;
 
   ULong64_t evt;
   UInt_t run;
@@ -19,9 +21,10 @@ public:
   TBranch *b_Z1Mass;
 
   TEntryList *fEntryList = 0;
+  TTreeFormula *fCut = 0;
 
   BestZplusLCandSelector(TTree *tree = 0) {}
-  ~BestZplusLCandSelector() override {}
+  ~BestZplusLCandSelector() override { delete fCut; }
   void SlaveBegin(TTree *tree) override;
   void Init(TTree *tree) override;
   Bool_t Process(Long64_t entry) override;
@@ -29,7 +32,7 @@ public:
 
   Int_t Version() const override { return 2; }
   void Begin(TTree *tree) override {};
-  Bool_t Notify() override { return true; }
+  Bool_t Notify() override;
   Int_t GetEntry(Long64_t entry, Int_t getall = 0) override {
     return fChain ? fChain->GetTree()->GetEntry(entry, getall) : 0;
   }
@@ -42,10 +45,15 @@ public:
   ClassDefOverride(BestZplusLCandSelector, 0);
 
 private:
-  void findBestEntry();
-  Long64_t nEntries;
-  std::vector<Long64_t> fEntries;
-  std::vector<float> fDiscriminants;
+  struct Candidate {
+    Long64_t entry;
+    float discriminant;
+  };
+  typedef std::map<std::pair<UInt_t, ULong64_t>, Candidate> CandidateMap;
+
+  bool passesCut();
+  static bool isBetter(const Candidate &candidate, const Candidate &best);
+  CandidateMap fBestCandidates;  //! Best candidate of each (run, evt)
 };
 
 #endif
@@ -2,7 +2,6 @@
 #define ZplusLFakeRateSelector_h
 
 #include "TChain.h"
-#include "TFile.h"
 #include "TH1.h"
 #include "TH2.h"
 
@@ -27,12 +26,20 @@ public:
   void SlaveBegin(TTree *tree) override;
   void Init(TTree *tree) override;
   Bool_t Process(Long64_t entry) override;
-  void SlaveTerminate() override;
 
   ClassDefOverride(ZplusLFakeRateSelector, 0);
 
 private:
-  TFile *outfile_;
+  bool isElectron_;
+
+  template <typename T>
+  T *AddOutput(T *hist) {
+    // Keep histograms out of the current directory, so they can be merged by the caller
+    hist->SetDirectory(nullptr);
+    fOutput->Add(hist);
+    return hist;
+  }
+
   TH1D *looseElePt_barrel_, *looseElePt_endcap_, *looseEleEta_;
   TH1D *looseMuPt_barrel_, *looseMuPt_endcap_, *looseMuEta_;
   TH2D *looseElePtEta_, *looseMuPtEta_;
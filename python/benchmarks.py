@@ -0,0 +1,78 @@
+import os
+import subprocess
+import time
+from typing import Optional
+
+import ROOT
+from UWVV.VVAnalysis import helpers, skimtools
+
+
+def run_command(command: list, cwd: Optional[str] = None, verbose: bool = False) -> dict:
+    """Run a command, measuring its wall time, CPU time, and peak memory.
+
+    Parameters
+    ----------
+    command : list of str
+        The command to run.
+    cwd : str, optional
+        The working directory of the command, e.g. for temporary files. If None, the
+        current working directory is used (default is None).
+    verbose : bool, optional
+        Whether to show the output of the command (default is False).
+
+    Returns
+    -------
+    dict
+        A dict containing the wall time ("wall_time") and CPU time ("cpu_time") in
+        seconds and the peak resident set size in bytes ("max_rss"). The CPU time
+        includes any subprocesses, and the peak resident set size is that of the
+        largest process.
+
+    """
+    output = None if verbose else subprocess.DEVNULL
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=cwd, stdout=output, stderr=output)
+    _, status, usage = os.wait4(process.pid, 0)
+    wall_time = time.perf_counter() - start
+
+    # The process was already waited for, so set its return code directly
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"command failed with exit code {process.returncode}: {' '.join(command)}")
+    return {
+        "wall_time": wall_time,
+        "cpu_time": usage.ru_utime + usage.ru_stime,
+        "max_rss": usage.ru_maxrss * 1024,
+    }
+
+
+def run_selectors(paths: list, analysis: str):
+    """Run the best-candidate selector of an analysis on every channel tree of the given files.
+
+    Parameters
+    ----------
+    paths : list of str
+        The paths of the files to process.
+    analysis : str
+        The analysis of the files (e.g. ZZ4l).
+
+    """
+    for path in paths:
+        with ROOT.TFile.Open(path) as infile:
+            for channel in helpers.get_channels(analysis):
+                selector = skimtools.get_selector(analysis, channel)
+                if selector is None:
+                    continue
+                infile.Get(f"{channel}/ntuple").Process(selector)
+
+
+def get_output_size(path: str) -> int:
+    """Determine the total size in bytes of the ROOT files in a file or directory."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(dirpath, filename))
+        for dirpath, _, filenames in os.walk(path)
+        for filename in filenames
+        if filename.endswith(".root")
+    )
@@ -0,0 +1,225 @@
+import json
+from typing import Optional
+
+from UWVV.VVAnalysis import helpers, skimconfig
+
+BUNDLE_VERSION = 1
+
+
+def get_bundle_path(analysis: str, year: str) -> str:
+    """Determine the default path of the config bundle of an analysis and year (e.g. ZZ4l2022.bundle.json)."""
+    return f"{analysis}{year}.bundle.json"
+
+
+def build_bundle(analysis: str, year: str, json_dir: str = helpers.JSON_DIR) -> dict:
+    """Resolve the configuration of an analysis and year into a single bundle.
+
+    The JSON files of the analysis are merged once, and the cutstring, aliases,
+    required branches, and selector inputs of every channel are resolved for every
+    trigger, so skimming jobs only need to read the bundle.
+
+    Parameters
+    ----------
+    analysis : str
+        The analysis to bundle (e.g. ZZ4l).
+    year : str
+        The year of the analysis (e.g. 2022).
+    json_dir : str, optional
+        The directory of the JSON files (default is helpers.JSON_DIR).
+
+    Returns
+    -------
+    dict
+        A dict containing the version of the bundle format ("version"), the analysis
+        ("analysis") and year ("year"), the merged JSON files ("config"), the resolved
+        configuration of each channel for each trigger ("channels"), and a hash of all
+        of these ("hash").
+
+    """
+    config = {
+        name: helpers.load_json(analysis, year, f"{name}.json", json_dir=json_dir)
+        for name in ("cuts", "aliases", "triggers", "branches", "profiles")
+    }
+
+    channels = {}
+    for trigger in config["triggers"]:
+        channel_config = skimconfig.resolve_channels(
+            analysis, trigger, config["cuts"], config["aliases"], config["triggers"]
+        )
+        for info in channel_config.values():
+            info["required_branches"] = sorted(info["required_branches"])
+        channels[trigger] = channel_config
+
+    bundle = {"version": BUNDLE_VERSION, "analysis": analysis, "year": year, "config": config, "channels": channels}
+    bundle["hash"] = helpers.get_config_hash(bundle)
+    return bundle
+
+
+def load_bundle(path: str) -> dict:
+    """Load a config bundle, checking its version and hash.
+
+    Parameters
+    ----------
+    path : str
+        The path of the bundle, as saved by save_bundle().
+
+    Returns
+    -------
+    dict
+        The bundle, as returned by build_bundle().
+
+    Raises
+    ------
+    ValueError
+        If the bundle was made with a different version of the format, or its
+        content does not match its hash.
+
+    """
+    with open(path) as infile:
+        bundle = json.load(infile)
+
+    if bundle.get("version") != BUNDLE_VERSION:
+        raise ValueError(f"unsupported bundle version {bundle.get('version')} (expected {BUNDLE_VERSION}): {path}")
+    content = {key: val for key, val in bundle.items() if key != "hash"}
+    if helpers.get_config_hash(content) != bundle.get("hash"):
+        raise ValueError(f"bundle does not match its hash: {path}")
+    return bundle
+
+
+def load_bundles(paths: list) -> dict:
+    """Load the config bundles of several analyses, as for skim.py --bundle.
+
+    Parameters
+    ----------
+    paths : list of str
+        The paths of the bundles, as saved by save_bundle().
+
+    Returns
+    -------
+    dict
+        A dict mapping the analysis of each bundle to the bundle.
+
+    Raises
+    ------
+    ValueError
+        If any bundle cannot be loaded with load_bundle(), several bundles are for
+        the same analysis, or the bundles are for different years.
+
+    """
+    loaded_bundles = {}
+    for path in paths:
+        bundle = load_bundle(path)
+        if bundle["analysis"] in loaded_bundles:
+            raise ValueError(f"duplicate bundles for analysis: {bundle['analysis']}")
+        loaded_bundles[bundle["analysis"]] = bundle
+    if len({bundle["year"] for bundle in loaded_bundles.values()}) > 1:
+        raise ValueError("bundles are for different years")
+    return loaded_bundles
+
+
+def save_bundle(path: str, bundle: dict):
+    """Save a config bundle, as returned by build_bundle()."""
+    helpers.save_manifest(path, bundle)
+
+
+def get_analysis_config(bundle: dict, trigger: str, profile: str) -> dict:
+    """Get the configuration of an analysis from its bundle, as used by skimtools.skim_analyses().
+
+    Parameters
+    ----------
+    bundle : dict
+        The bundle, as returned by load_bundle().
+    trigger : str
+        The trigger selection to apply (e.g. MonteCarlo).
+    profile : str
+        The name of the output profile, as defined in profiles.json.
+
+    Returns
+    -------
+    dict
+        The configuration of the analysis, with the channels already resolved and the
+        hash of the bundle ("config_hash"). The output file ("outfile") is not set.
+
+    Raises
+    ------
+    ValueError
+        If the trigger or profile is not in the bundle.
+
+    """
+    if trigger not in bundle["channels"]:
+        raise ValueError(f"invalid trigger for analysis {bundle['analysis']}: {trigger}")
+    if profile not in bundle["config"]["profiles"]:
+        raise ValueError(f"invalid profile for analysis {bundle['analysis']}: {profile}")
+
+    channels = {}
+    for channel, info in bundle["channels"][trigger].items():
+        channels[channel] = {**info, "required_branches": set(info["required_branches"])}
+    return {
+        "trigger": trigger,
+        "cutinfo": bundle["config"]["cuts"],
+        "aliases": bundle["config"]["aliases"],
+        "triggers": bundle["config"]["triggers"],
+        "branchinfo": bundle["config"]["branches"],
+        "channels": channels,
+        "profile": bundle["config"]["profiles"][profile],
+        "config_hash": bundle["hash"],
+    }
+
+
+def load_analysis_config(
+    analysis: str,
+    year: str,
+    trigger: str,
+    profile: str,
+    json_dir: str = helpers.JSON_DIR,
+    bundle: Optional[dict] = None,
+) -> dict:
+    """Load the configuration of an analysis from its bundle, or from its JSON files if not bundled.
+
+    Parameters
+    ----------
+    analysis : str
+        The analysis to load (e.g. ZZ4l).
+    year : str
+        The year of the analysis (e.g. 2022).
+    trigger : str
+        The trigger selection to apply (e.g. MonteCarlo).
+    profile : str
+        The name of the output profile, as defined in profiles.json.
+    json_dir : str, optional
+        The directory of the JSON files (default is helpers.JSON_DIR).
+    bundle : dict, optional
+        The bundle of the analysis, as returned by load_bundle(). If given, the JSON
+        files are not read (default is None).
+
+    Returns
+    -------
+    dict
+        The configuration of the analysis, as used by skimtools.skim_analyses(). The
+        output file ("outfile") is not set, and the channels are only resolved if
+        taken from the bundle.
+
+    Raises
+    ------
+    ValueError
+        If the trigger or profile is not defined for the analysis.
+
+    """
+    if bundle is not None:
+        return get_analysis_config(bundle, trigger, profile)
+
+    triggers = helpers.load_json(analysis, year, "triggers.json", json_dir=json_dir)
+    output_profiles = helpers.load_json(analysis, year, "profiles.json", json_dir=json_dir)
+    if trigger not in triggers:
+        raise ValueError(f"invalid trigger for analysis {analysis}: {trigger}")
+    if profile not in output_profiles:
+        raise ValueError(f"invalid profile for analysis {analysis}: {profile}")
+
+    return {
+        "trigger": trigger,
+        "cutinfo": helpers.load_json(analysis, year, "cuts.json", json_dir=json_dir),
+        "aliases": helpers.load_json(analysis, year, "aliases.json", json_dir=json_dir),
+        "triggers": triggers,
+        "branchinfo": helpers.load_json(analysis, year, "branches.json", json_dir=json_dir),
+        "profile": output_profiles[profile],
+    }
@@ -0,0 +1,221 @@
+import concurrent.futures
+import glob
+import multiprocessing
+import os
+import time
+from typing import Optional
+
+from UWVV.VVAnalysis import helpers
+
+NUM_WORKERS = 16
+
+
+def get_catalog_path(path: str) -> str:
+    """Determine the path of the catalog for a given file listing.
+
+    Parameters
+    ----------
+    path : str
+        The path (or basename) of the listing JSON file (e.g. ntuples.json).
+
+    Returns
+    -------
+    str
+        The path of the sidecar catalog (e.g. ntuples.catalog.json for ntuples.json).
+
+    """
+    return os.path.splitext(path)[0] + ".catalog.json"
+
+
+def load_catalog(path: str) -> dict:
+    """Load the catalog of a file listing, returning an empty catalog if there is none.
+
+    Samples that are out of date are removed with remove_stale_samples().
+
+    Parameters
+    ----------
+    path : str
+        The path of the listing JSON file (e.g. ntuples.json), not of the catalog.
+
+    Returns
+    -------
+    dict
+        The catalog, as returned by build_catalog().
+
+    """
+    return remove_stale_samples(helpers.load_manifest(get_catalog_path(path)))
+
+
+def expand_patterns(patterns: list) -> list:
+    """Expand the glob patterns of a sample into a sorted list of files."""
+    return sorted({path for pattern in patterns for path in glob.iglob(pattern)})
+
+
+def get_pattern_dirs(patterns: list) -> list:
+    """Expand the directories that the glob patterns of a sample list files from."""
+    return sorted({dirname for pattern in patterns for dirname in glob.iglob(os.path.dirname(pattern) or ".")})
+
+
+def scan_file(path: str, channels: list) -> dict:
+    """Read the size, modification time, and entries of each channel of a file.
+
+    Only the tree headers are read, so this is cheap even for large files.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+    channels : list of str
+        The channels whose <channel>/ntuple trees should be counted.
+
+    Returns
+    -------
+    dict
+        A dict containing the size ("size") and modification time ("mtime") of the
+        file, and the number of entries of each channel tree found ("entries").
+
+    """
+    # Imported here, so listing files (e.g. make_json.py without --catalog) doesn't need ROOT
+    import ROOT  # noqa: PLC0415
+
+    info = helpers.get_file_signature(path)
+    info["entries"] = {}
+    with ROOT.TFile.Open(path) as infile:
+        for channel in channels:
+            tree = infile.Get(f"{channel}/ntuple")
+            if tree:
+                info["entries"][channel] = tree.GetEntries()
+    return info
+
+
+def build_catalog(samples: dict, channels: list, num_workers: int = NUM_WORKERS, verbose: bool = False) -> dict:
+    """Catalog the files of every sample in a file listing.
+
+    The glob patterns of all samples are expanded concurrently with a thread pool,
+    since listing directories on /hdfs is dominated by waiting on the filesystem.
+    The tree headers are then read by a pool of processes, since ROOT holds the
+    interpreter lock while reading.
+
+    Parameters
+    ----------
+    samples : dict
+        A dict mapping each sample to its list of glob patterns, as in ntuples.json
+        or skimmed.json.
+    channels : list of str
+        The channels whose entries should be counted.
+    num_workers : int, optional
+        The number of threads and processes to use (default is NUM_WORKERS).
+    verbose : bool, optional
+        Whether to print the progress of the scan (default is False).
+
+    Returns
+    -------
+    dict
+        A dict mapping each sample to its glob patterns ("patterns"), the time the
+        scan started ("scan_time"), and a dict of its files ("files"), mapping each
+        path to the information from scan_file().
+
+    """
+    # Files written while the directories are listed may be missed, so take the time before listing them
+    scan_time = time.time()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
+        sample_files = dict(zip(samples, executor.map(expand_patterns, samples.values())))
+
+    paths = sorted({path for files in sample_files.values() for path in files})
+    if verbose:
+        print(f"Found {len(paths)} file(s) for {len(samples)} sample(s)")
+    with multiprocessing.Pool(processes=num_workers) as pool:
+        infos = dict(zip(paths, pool.starmap(scan_file, [(path, channels) for path in paths])))
+
+    return {
+        sample: {"patterns": samples[sample], "scan_time": scan_time, "files": {path: infos[path] for path in files}}
+        for sample, files in sample_files.items()
+    }
+
+
+def save_catalog(path: str, catalog: dict):
+    """Save the catalog of a file listing next to it.
+
+    Parameters
+    ----------
+    path : str
+        The path of the listing JSON file (e.g. ntuples.json), not of the catalog.
+    catalog : dict
+        The catalog to save, as returned by build_catalog().
+
+    """
+    helpers.save_manifest(get_catalog_path(path), catalog)
+
+
+def remove_stale_samples(catalog: dict) -> dict:
+    """Remove the samples whose directories changed since they were cataloged, so their files are listed again.
+
+    A sample is stale if any directory its glob patterns list files from was modified
+    after the scan started (e.g. because files were added or removed), or if the
+    catalog does not record when it was scanned. Only the directories are checked,
+    so this is much cheaper than listing the files.
+
+    Parameters
+    ----------
+    catalog : dict
+        The catalog, as returned by build_catalog(). This will be overwritten.
+
+    Returns
+    -------
+    dict
+        The catalog, without its stale samples.
+
+    """
+    for sample in list(catalog):
+        entry = catalog[sample]
+        if "scan_time" in entry and all(
+            os.path.getmtime(dirname) <= entry["scan_time"] for dirname in get_pattern_dirs(entry["patterns"])
+        ):
+            continue
+        print(f"WARNING: catalog of {sample} is out of date, listing its files again (see make_json.py --catalog)")
+        del catalog[sample]
+    return catalog
+
+
+def is_cataloged(sample: str, patterns: list, catalog: Optional[dict] = None) -> bool:
+    """Check whether a sample was cataloged with the same glob patterns as in the file listing."""
+    return bool(catalog) and sample in catalog and catalog[sample]["patterns"] == patterns
+
+
+def get_sample_files(sample: str, patterns: list, catalog: Optional[dict] = None) -> list:
+    """Get the files of a sample from the catalog, globbing only if it is not cataloged.
+
+    Parameters
+    ----------
+    sample : str
+        The name of the sample.
+    patterns : list of str
+        The glob patterns of the sample in the file listing.
+    catalog : dict, optional
+        The catalog of the file listing, after remove_stale_samples(). The sample is
+        only taken from the catalog if it was cataloged with the same patterns
+        (default is None).
+
+    Returns
+    -------
+    list of str
+        The sorted paths of the files of the sample.
+
+    """
+    if is_cataloged(sample, patterns, catalog):
+        return sorted(catalog[sample]["files"])
+    return expand_patterns(patterns)
+
+
+def get_file_sizes(catalog: Optional[dict] = None) -> dict:
+    """Get the size in bytes of every cataloged file, keyed by path."""
+    if not catalog:
+        return {}
+    return {path: info["size"] for entry in catalog.values() for path, info in entry["files"].items()}
+
+
+def get_file_entries(catalog: Optional[dict] = None) -> dict:
+    """Get the number of entries over all channels of every cataloged file, keyed by path."""
+    if not catalog:
+        return {}
+    return {path: sum(info["entries"].values()) for entry in catalog.values() for path, info in entry["files"].items()}
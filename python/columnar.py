@@ -0,0 +1,270 @@
+import numpy as np
+
+# This module is imported by the numpy engine, so it must not import ROOT
+
+Z_MASS = 91.1876
+
+# Initial discriminant of the C++ selectors, which no candidate can be worse than
+MAX_DISCRIMINANT = np.float32(1e10)
+
+# Fields of a candidate, where lower ranks are preferred over any discriminant
+CANDIDATE_DTYPE = np.dtype(
+    [
+        ("run", np.uint32),
+        ("evt", np.uint64),
+        ("rank", np.int8),
+        ("discriminant", np.float32),
+        ("pt_sum", np.float32),
+        ("entry", np.int64),
+    ]
+)
+
+
+def get_columns(results: dict) -> dict:
+    """Convert the results of skimtools.book_columns() to arrays.
+
+    Parameters
+    ----------
+    results : dict
+        A dict mapping each column to its lazy result, as returned by skimtools.book_columns().
+
+    Returns
+    -------
+    dict
+        A dict mapping each column to a numpy array of its values, in the (arbitrary)
+        order the entries were processed.
+
+    """
+    return {name: np.asarray(result.GetValue()) for name, result in results.items()}
+
+
+def make_candidates(
+    columns: dict, valid: np.ndarray, ranks: np.ndarray, discriminants: np.ndarray, pt_sums: np.ndarray
+) -> np.ndarray:
+    """Build the array of valid candidates from the columns of a selector.
+
+    Parameters
+    ----------
+    columns : dict
+        A dict mapping each selector input and "entry" to its values.
+    valid : numpy.ndarray
+        Whether each entry can be chosen at all.
+    ranks : numpy.ndarray
+        The rank of each entry (e.g. 0 for tight and 1 for loose candidates).
+    discriminants : numpy.ndarray
+        The discriminant of each entry.
+    pt_sums : numpy.ndarray
+        The pt sum used to break ties between equal discriminants.
+
+    Returns
+    -------
+    numpy.ndarray
+        A structured array of CANDIDATE_DTYPE containing the valid entries.
+
+    """
+    candidates = np.empty(np.count_nonzero(valid), dtype=CANDIDATE_DTYPE)
+    candidates["run"] = columns["run"][valid]
+    candidates["evt"] = columns["evt"][valid]
+    candidates["rank"] = ranks[valid]
+    candidates["discriminant"] = discriminants[valid]
+    candidates["pt_sum"] = pt_sums[valid]
+    candidates["entry"] = columns["entry"][valid]
+    return candidates
+
+
+def get_candidates_zz(columns: dict) -> np.ndarray:
+    """Build the ZZ candidates of the given columns, matching BestZZCandSelector.
+
+    The discriminant of each candidate is the distance of its Z1 or Z2 mass to the Z
+    mass, whichever is closest, with the pt sum of the other pair to break ties.
+    Candidates whose leptons all pass the tight ID and isolation have a better rank
+    than those that don't.
+
+    Parameters
+    ----------
+    columns : dict
+        A dict mapping each input of BestZZCandSelector and "entry" to its values.
+
+    Returns
+    -------
+    numpy.ndarray
+        A structured array of CANDIDATE_DTYPE containing the valid candidates.
+
+    """
+    # Match the precision of the selector, which stores each discriminant as a float
+    discriminant_z1 = np.abs(columns["Z1Mass"].astype(np.float64) - Z_MASS).astype(np.float32)
+    discriminant_z2 = np.abs(columns["Z2Mass"].astype(np.float64) - Z_MASS).astype(np.float32)
+    use_z1 = discriminant_z1 < discriminant_z2
+    discriminants = np.where(use_z1, discriminant_z1, discriminant_z2)
+    pt_sums = np.where(use_z1, columns["l3Pt"] + columns["l4Pt"], columns["l1Pt"] + columns["l2Pt"])
+
+    # Candidates are only kept by the selector if they are better than its initial discriminant
+    tight = np.logical_and.reduce([columns[f"l{i}{var}"] for i in range(1, 5) for var in ("Tight", "Iso")])
+    valid = (discriminants < MAX_DISCRIMINANT) | ((discriminants == MAX_DISCRIMINANT) & (pt_sums > 0))
+    return make_candidates(columns, valid, np.where(tight, 0, 1), discriminants, pt_sums)
+
+
+def get_candidates_zplusl(columns: dict) -> np.ndarray:
+    """Build the Z+l candidates of the given columns, matching BestZplusLCandSelector.
+
+    Parameters
+    ----------
+    columns : dict
+        A dict mapping each input of BestZplusLCandSelector and "entry" to its values.
+
+    Returns
+    -------
+    numpy.ndarray
+        A structured array of CANDIDATE_DTYPE containing the valid candidates.
+
+    """
+    discriminants = np.abs(columns["Z1Mass"].astype(np.float64) - Z_MASS).astype(np.float32)
+    size = len(discriminants)
+    valid = discriminants < MAX_DISCRIMINANT
+    return make_candidates(columns, valid, np.zeros(size), discriminants, np.zeros(size))
+
+
+def get_candidates(analysis: str, columns: dict) -> np.ndarray:
+    """Build the candidates of the given columns for an analysis.
+
+    Parameters
+    ----------
+    analysis : str
+        The analysis of the candidates (e.g. ZZ4l).
+    columns : dict
+        A dict mapping each selector input and "entry" to its values, as returned by
+        get_columns().
+
+    Returns
+    -------
+    numpy.ndarray
+        A structured array of CANDIDATE_DTYPE containing the valid candidates.
+
+    """
+    if analysis == "ZZ4l":
+        return get_candidates_zz(columns)
+    elif analysis == "ZplusL":
+        return get_candidates_zplusl(columns)
+    raise ValueError(f"no columnar selection for analysis: {analysis}")
+
+
+def get_event_firsts(candidates: np.ndarray, keys: list) -> np.ndarray:
+    """Sort candidates by (run, evt) and then by the given arrays of keys, keeping the first candidate of each event."""
+    order = np.lexsort((*reversed(keys), candidates["evt"], candidates["run"]))
+    candidates = candidates[order]
+    first = np.ones(len(candidates), dtype=bool)
+    first[1:] = (candidates["run"][1:] != candidates["run"][:-1]) | (candidates["evt"][1:] != candidates["evt"][:-1])
+    return candidates[first]
+
+
+def get_first_and_best(candidates: np.ndarray) -> tuple:
+    """Find the two candidates of each (run, evt) that choose_best_candidates() chooses from.
+
+    Only the candidates with the lowest rank, and then the smallest discriminant, of
+    each event can be chosen. Of these, this finds the candidate with the lowest entry
+    number, and the candidate with the largest pt sum (NaN sorts last), breaking ties
+    by the lowest entry number.
+
+    Parameters
+    ----------
+    candidates : numpy.ndarray
+        A structured array of CANDIDATE_DTYPE.
+
+    Returns
+    -------
+    tuple of (numpy.ndarray, numpy.ndarray)
+        The first and the best candidate of each event, both ordered by (run, evt).
+
+    """
+    first = get_event_firsts(candidates, [candidates["rank"], candidates["discriminant"], candidates["entry"]])
+    best = get_event_firsts(
+        candidates, [candidates["rank"], candidates["discriminant"], -candidates["pt_sum"], candidates["entry"]]
+    )
+    return first, best
+
+
+def reduce_candidates(candidates: np.ndarray) -> np.ndarray:
+    """Keep only the candidates of each (run, evt) that can still be chosen, as found by get_first_and_best().
+
+    The result does not depend on the order of the candidates, so partial results
+    (e.g. of different threads, chunks, or files) can be combined with
+    merge_candidates(), and the best candidates chosen with choose_best_candidates().
+
+    Parameters
+    ----------
+    candidates : numpy.ndarray
+        A structured array of CANDIDATE_DTYPE.
+
+    Returns
+    -------
+    numpy.ndarray
+        At most two candidates of each event, ordered by (run, evt).
+
+    """
+    first, best = get_first_and_best(candidates)
+    reduced = np.concatenate((first, best[best["entry"] != first["entry"]]))
+    return reduced[np.lexsort((reduced["evt"], reduced["run"]))]
+
+
+def choose_best_candidates(candidates: np.ndarray) -> np.ndarray:
+    """Choose the best candidate of each (run, evt), matching the C++ selectors.
+
+    Within each event, the candidate with the lowest rank is chosen, then the smallest
+    discriminant, then the largest pt sum, and finally the lowest entry number. However,
+    if the candidate with the lowest entry number among these has a NaN pt sum, it is
+    chosen instead, as by the original selectors reading the entries of each event in
+    order, since no pt sum compares greater than NaN.
+
+    Parameters
+    ----------
+    candidates : numpy.ndarray
+        A structured array of CANDIDATE_DTYPE, or the partial results of
+        reduce_candidates() or merge_candidates().
+
+    Returns
+    -------
+    numpy.ndarray
+        The best candidate of each event, ordered by (run, evt).
+
+    """
+    first, best = get_first_and_best(candidates)
+    first_nan = np.isnan(first["pt_sum"])
+    best[first_nan] = first[first_nan]
+    return best
+
+
+def merge_candidates(*partials: np.ndarray) -> np.ndarray:
+    """Merge partial results of reduce_candidates() into the candidates that can still be chosen of each (run, evt)."""
+    return reduce_candidates(np.concatenate(partials))
+
+
+def select_best_entries(analysis: str, columns: dict) -> np.ndarray:
+    """Select the best candidate of each event for the given analysis.
+
+    If the columns include the slot of the thread that processed each entry ("slot"),
+    the candidates of each slot are reduced on their own, as the partial result of
+    that thread, and the partials are combined with merge_candidates().
+
+    Parameters
+    ----------
+    analysis : str
+        The analysis of the candidates (e.g. ZZ4l).
+    columns : dict
+        A dict mapping each selector input and "entry" (and optionally "slot") to its
+        values, as returned by get_columns().
+
+    Returns
+    -------
+    numpy.ndarray
+        The entry numbers of the best candidates, in increasing order.
+
+    """
+    if "slot" not in columns:
+        return np.sort(choose_best_candidates(get_candidates(analysis, columns))["entry"])
+
+    partials = [np.empty(0, dtype=CANDIDATE_DTYPE)]
+    for slot in np.unique(columns["slot"]):
+        in_slot = columns["slot"] == slot
+        slot_columns = {name: values[in_slot] for name, values in columns.items()}
+        partials.append(reduce_candidates(get_candidates(analysis, slot_columns)))
+    return np.sort(choose_best_candidates(merge_candidates(*partials))["entry"])
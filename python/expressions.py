@@ -0,0 +1,458 @@
+import math
+import re
+
+# Binary operators of TTreeFormula expressions and their precedence, from lowest to highest
+PRECEDENCE = {
+    "||": 0,
+    "&&": 1,
+    "==": 2,
+    "!=": 2,
+    "<": 3,
+    "<=": 3,
+    ">": 3,
+    ">=": 3,
+    "+": 4,
+    "-": 4,
+    "*": 5,
+    "/": 5,
+    "%": 5,
+}
+
+# Operators that are flattened into a single node with any number of operands (e.g. a && b && c)
+LOGICAL_OPERATORS = ("||", "&&")
+
+# Estimated cost of evaluating a function call, relative to a single operator or value
+CALL_COST = 4
+
+# Operators that compare their operands, giving 0 or 1
+COMPARISON_OPERATORS = ("==", "!=", "<", "<=", ">", ">=")
+
+# Bounds of a value that is unknown or may not be a number (e.g. the square root of a negative number)
+UNBOUNDED = (-math.inf, math.inf)
+
+# Bounds of a condition that is never true, always true, or may be either
+NEVER, ALWAYS, MAYBE = (0.0, 0.0), (1.0, 1.0), (0.0, 1.0)
+
+# Numbers, names (including namespaces like TMath::), and operators
+TOKEN_PATTERN = re.compile(
+    r"\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|([A-Za-z_]\w*(?:::\w+)*)|(\|\||&&|[=!<>]=|[-+*/%<>!(),]))"
+)
+
+# Expressions are parsed into nested tuples of (kind, value, operands), where the kind is
+# one of "number", "name", "unary", "binary", or "call", the value is the number, name,
+# operator, or function, and the operands are a tuple of nodes (empty for numbers and names).
+
+
+def tokenize(expression: str) -> list:
+    """Split a TTreeFormula expression into its numbers, names, and operators.
+
+    Parameters
+    ----------
+    expression : str
+        The expression to split (e.g. 'abs(Z1Mass-91.1876) < 10').
+
+    Returns
+    -------
+    list of str
+        The tokens of the expression, in order.
+
+    Raises
+    ------
+    ValueError
+        If the expression contains anything else.
+
+    """
+    tokens = []
+    expression = expression.rstrip()
+    position = 0
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if match is None:
+            raise ValueError(f"cannot parse '{expression[position:].strip()}' in expression: {expression}")
+        tokens.append(next(group for group in match.groups() if group is not None))
+        position = match.end()
+    return tokens
+
+
+def parse(expression: str) -> tuple:
+    """Parse a TTreeFormula expression into a tree of nodes.
+
+    Operators follow the precedence and associativity of C++, and chains of && or ||
+    are flattened into a single node, including parenthesized ones (e.g. a && (b && c)
+    gives the same node as a && b && c).
+
+    Parameters
+    ----------
+    expression : str
+        The expression to parse (e.g. 'abs(Z1Mass-91.1876) < 10').
+
+    Returns
+    -------
+    tuple
+        The root node of the expression, as described at the top of this module.
+
+    Raises
+    ------
+    ValueError
+        If the expression cannot be parsed.
+
+    """
+    tokens = tokenize(expression)
+    try:
+        node = parse_binary(tokens)
+        if tokens:
+            raise ValueError(f"unexpected '{tokens[0]}' in expression")
+    except ValueError as err:
+        raise ValueError(f"{err}: {expression}") from err
+    return node
+
+
+def parse_binary(tokens: list, precedence: int = 0) -> tuple:
+    """Parse the binary operators of the given precedence (and higher) from a list of tokens.
+
+    Parameters
+    ----------
+    tokens : list of str
+        The remaining tokens of the expression, as returned by tokenize(). The tokens
+        parsed are removed.
+    precedence : int, optional
+        The lowest precedence of the operators to parse (default is 0).
+
+    Returns
+    -------
+    tuple
+        The parsed node.
+
+    """
+    if precedence > max(PRECEDENCE.values()):
+        return parse_unary(tokens)
+
+    # Operators of the same precedence are applied from left to right, as in C++
+    node = parse_binary(tokens, precedence + 1)
+    while tokens and PRECEDENCE.get(tokens[0]) == precedence:
+        operator = tokens.pop(0)
+        node = make_binary(operator, node, parse_binary(tokens, precedence + 1))
+    return node
+
+
+def parse_unary(tokens: list) -> tuple:
+    """Parse a unary operator, number, name, function call, or parenthesized expression from a list of tokens."""
+    if not tokens:
+        raise ValueError("unexpected end of expression")
+    token = tokens.pop(0)
+
+    if token in ("!", "-", "+"):
+        return ("unary", token, (parse_unary(tokens),))
+    if token == "(":
+        node = parse_binary(tokens)
+        expect_token(tokens, ")")
+        return node
+    if token[0].isdigit() or token[0] == ".":
+        return ("number", token, ())
+    if not (token[0].isalpha() or token[0] == "_"):
+        raise ValueError(f"unexpected '{token}' in expression")
+
+    # Function calls
+    if tokens and tokens[0] == "(":
+        tokens.pop(0)
+        arguments = [parse_binary(tokens)]
+        while tokens and tokens[0] == ",":
+            tokens.pop(0)
+            arguments.append(parse_binary(tokens))
+        expect_token(tokens, ")")
+        return ("call", token, tuple(arguments))
+    return ("name", token, ())
+
+
+def expect_token(tokens: list, expected: str):
+    """Remove the next token, checking that it is the expected one (e.g. a closing parenthesis)."""
+    if not tokens or tokens[0] != expected:
+        raise ValueError(f"expected '{expected}' in expression, found '{tokens[0] if tokens else 'end'}'")
+    tokens.pop(0)
+
+
+def make_binary(operator: str, *operands: tuple) -> tuple:
+    """Build a binary node, flattening the operands of && and || chains into a single node."""
+    if operator in LOGICAL_OPERATORS:
+        flattened = []
+        for operand in operands:
+            if operand[0] == "binary" and operand[1] == operator:
+                flattened += operand[2]
+            else:
+                flattened.append(operand)
+        operands = flattened
+    return ("binary", operator, tuple(operands))
+
+
+def to_string(node: tuple) -> str:
+    """Write a node as a TTreeFormula (and C++) expression, with only the parentheses needed.
+
+    Parameters
+    ----------
+    node : tuple
+        The node to write, as returned by parse().
+
+    Returns
+    -------
+    str
+        The expression, which parses back into the same node.
+
+    """
+    kind, value, operands = node
+    if kind in ("number", "name"):
+        return value
+    if kind == "call":
+        return f"{value}({', '.join(to_string(operand) for operand in operands)})"
+    if kind == "unary":
+        operand = to_string(operands[0])
+        return f"{value}({operand})" if operands[0][0] in ("unary", "binary") else f"{value}{operand}"
+
+    # Operands of lower precedence need parentheses, as do right operands of the same precedence
+    terms = []
+    for i, operand in enumerate(operands):
+        term = to_string(operand)
+        if operand[0] == "binary":
+            operand_precedence = PRECEDENCE[operand[1]]
+            if operand_precedence < PRECEDENCE[value] or (i > 0 and operand_precedence == PRECEDENCE[value]):
+                term = f"({term})"
+        terms.append(term)
+    return f" {value} ".join(terms)
+
+
+def get_names(node: tuple) -> set:
+    """Determine the names used by a node (e.g. branches and aliases), excluding functions."""
+    kind, value, operands = node
+    names = {value} if kind == "name" else set()
+    for operand in operands:
+        names |= get_names(operand)
+    return names
+
+
+def get_cost(node: tuple) -> int:
+    """Estimate the cost of evaluating a node as its number of operators and values, with calls costing CALL_COST."""
+    kind, _, operands = node
+    return (CALL_COST if kind == "call" else 1) + sum(get_cost(operand) for operand in operands)
+
+
+def simplify(node: tuple) -> tuple:
+    """Remove duplicate operands of && and || nodes, which do not change their result.
+
+    Parameters
+    ----------
+    node : tuple
+        The node to simplify, as returned by parse().
+
+    Returns
+    -------
+    tuple
+        The simplified node, keeping the first of any duplicate operands.
+
+    """
+    kind, value, operands = node
+    operands = tuple(simplify(operand) for operand in operands)
+    if kind == "binary" and value in LOGICAL_OPERATORS:
+        operands = tuple(dict.fromkeys(operands))
+        if len(operands) == 1:
+            return operands[0]
+        return make_binary(value, *operands)
+    return (kind, value, operands)
+
+
+def build_conjunction(cuts: list) -> str:
+    """Combine cuts into a single expression that is smaller and cheaper to evaluate than joining them.
+
+    Each cut is parsed and split into its terms (e.g. 'a && b' into a and b), duplicate
+    terms are removed, and the terms are ordered from the cheapest to the most
+    expensive to evaluate, keeping the given order between terms of the same cost.
+    Since TTreeFormula and C++ both stop evaluating a conjunction at its first failing
+    term, entries failing a cheap term skip the expensive ones. None of these change
+    which entries pass.
+
+    Parameters
+    ----------
+    cuts : list of str
+        The cuts to combine, all of which must pass.
+
+    Returns
+    -------
+    str
+        The combined expression.
+
+    Raises
+    ------
+    ValueError
+        If any cut cannot be parsed.
+
+    """
+    node = simplify(make_binary("&&", *(parse(cut) for cut in cuts)))
+    if node[0] != "binary" or node[1] != "&&":
+        return to_string(node)
+    return to_string(make_binary("&&", *sorted(node[2], key=get_cost)))
+
+
+def expand_aliases(node: tuple, aliases: dict) -> tuple:
+    """Replace the aliases used by a node with their parsed expressions, so the result only uses branches.
+
+    Parameters
+    ----------
+    node : tuple
+        The node to expand, as returned by parse().
+    aliases : dict
+        A dict containing all the aliases that can be used by the node. Aliases are
+        expanded without the alias itself, so an alias cannot refer to itself.
+
+    Returns
+    -------
+    tuple
+        The expanded node.
+
+    Raises
+    ------
+    ValueError
+        If an alias cannot be parsed.
+
+    """
+    kind, value, operands = node
+    if kind == "name" and value in aliases:
+        other_aliases = {key: val for key, val in aliases.items() if key != value}
+        return expand_aliases(parse(aliases[value]), other_aliases)
+    return (kind, value, tuple(expand_aliases(operand, aliases) for operand in operands))
+
+
+def get_bounds(node: tuple, bounds: dict) -> tuple:
+    """Determine the lowest and highest values a node can take, given the bounds of the names it uses.
+
+    The bounds are conservative: every value the node can take is within them, but
+    not every value within them is necessarily taken. Conditions (i.e. comparisons,
+    &&, ||, and !) are bounded by NEVER, ALWAYS, or MAYBE. Since a comparison with
+    NaN is never true but its negation always is, UNBOUNDED also stands for values
+    that may be NaN, and no comparison with it is ever decided.
+
+    Parameters
+    ----------
+    node : tuple
+        The node, as returned by expand_aliases(), so it only uses branches.
+    bounds : dict
+        A dict mapping names to their (lowest, highest) values. Names that are
+        missing (e.g. those that may be NaN) are UNBOUNDED.
+
+    Returns
+    -------
+    tuple of (float, float)
+        The lowest and highest values of the node.
+
+    """
+    kind, value, operands = node
+    if kind == "number":
+        return (float(value), float(value))
+    if kind == "name" and value in ("true", "false"):
+        return ALWAYS if value == "true" else NEVER
+    if kind == "name":
+        return tuple(bounds.get(value, UNBOUNDED))
+
+    operand_bounds = [get_bounds(operand, bounds) for operand in operands]
+    if kind == "call":
+        return get_call_bounds(value, operand_bounds)
+    if kind == "unary":
+        lowest, highest = operand_bounds[0]
+        if value == "!":
+            lowest, highest = get_truth_bounds(operand_bounds[0])
+            return (1.0 - highest, 1.0 - lowest)
+        return (-highest, -lowest) if value == "-" else (lowest, highest)
+
+    # Conditions joined by && can only be true if all of them can, and by || if any of them can
+    if value in LOGICAL_OPERATORS:
+        truth_bounds = [get_truth_bounds(operand) for operand in operand_bounds]
+        combine = min if value == "&&" else max
+        return (combine(lowest for lowest, _ in truth_bounds), combine(highest for _, highest in truth_bounds))
+    return get_binary_bounds(value, *operand_bounds)
+
+
+def get_truth_bounds(bounds: tuple) -> tuple:
+    """Determine whether a value with the given bounds is true, where any nonzero value (including NaN) is true."""
+    lowest, highest = bounds
+    if lowest == highest == 0:
+        return NEVER
+    if lowest > 0 or highest < 0:
+        return ALWAYS
+    return MAYBE
+
+
+def get_binary_bounds(operator: str, bounds1: tuple, bounds2: tuple) -> tuple:
+    """Determine the bounds of a binary operator (other than && and ||) applied to values with the given bounds."""
+    (lowest1, highest1), (lowest2, highest2) = bounds1, bounds2
+    if operator in COMPARISON_OPERATORS:
+        if UNBOUNDED in (bounds1, bounds2):
+            return MAYBE
+        if operator in ("==", "!="):
+            if lowest1 == highest1 == lowest2 == highest2:
+                equal = ALWAYS
+            elif highest1 < lowest2 or highest2 < lowest1:
+                equal = NEVER
+            else:
+                equal = MAYBE
+            return equal if operator == "==" else (1.0 - equal[1], 1.0 - equal[0])
+
+        # Compare as (a < b) or (a <= b), swapping the operands of > and >=
+        if operator in (">", ">="):
+            (lowest1, highest1), (lowest2, highest2) = bounds2, bounds1
+        if highest1 < lowest2 or (operator.endswith("=") and highest1 == lowest2):
+            return ALWAYS
+        if lowest1 > highest2 or (not operator.endswith("=") and lowest1 == highest2):
+            return NEVER
+        return MAYBE
+
+    if operator == "+":
+        values = (lowest1 + lowest2, highest1 + highest2)
+    elif operator == "-":
+        values = (lowest1 - highest2, highest1 - lowest2)
+    elif operator == "*":
+        values = (lowest1 * lowest2, lowest1 * highest2, highest1 * lowest2, highest1 * highest2)
+    elif operator == "/" and (lowest2 > 0 or highest2 < 0):
+        values = (lowest1 / lowest2, lowest1 / highest2, highest1 / lowest2, highest1 / highest2)
+    else:
+        # Division by a value that may be zero, and %, are not bounded
+        return UNBOUNDED
+
+    # Infinities that cancel (e.g. inf - inf) may give NaN
+    if any(math.isnan(value) for value in values):
+        return UNBOUNDED
+    return (min(values), max(values))
+
+
+def get_call_bounds(function: str, arguments: list) -> tuple:
+    """Determine the bounds of a function applied to values with the given bounds, which are UNBOUNDED if unknown."""
+    if UNBOUNDED in arguments:
+        return UNBOUNDED
+    if function in ("abs", "fabs", "TMath::Abs"):
+        lowest, highest = arguments[0]
+        if lowest >= 0:
+            return (lowest, highest)
+        if highest <= 0:
+            return (-highest, -lowest)
+        return (0.0, max(-lowest, highest))
+    if function in ("sqrt", "TMath::Sqrt") and arguments[0][0] >= 0:
+        return (math.sqrt(arguments[0][0]), math.sqrt(arguments[0][1]))
+    if function in ("min", "max") and len(arguments) == 2:
+        combine = min if function == "min" else max
+        return (combine(lowest for lowest, _ in arguments), combine(highest for _, highest in arguments))
+    return UNBOUNDED
+
+
+def may_pass(node: tuple, bounds: dict) -> bool:
+    """Check whether a cut can pass for any value of the names it uses within the given bounds.
+
+    Parameters
+    ----------
+    node : tuple
+        The cut, as returned by expand_aliases().
+    bounds : dict
+        A dict mapping names to their (lowest, highest) values, as in get_bounds().
+
+    Returns
+    -------
+    bool
+        False if the cut never passes within the bounds, and True otherwise.
+
+    """
+    return get_truth_bounds(get_bounds(node, bounds))[1] > 0
@@ -0,0 +1,111 @@
+import ROOT
+from UWVV.VVAnalysis import helpers
+
+
+def get_fake_rate_inputs(channel: str) -> dict:
+    """Get the branches read by ZplusLFakeRateSelector for the given channel.
+
+    The first two leptons form the Z candidate and the third lepton is the one whose
+    fake rate is measured (e.g. the electron in emm).
+
+    Parameters
+    ----------
+    channel : str
+        The ZplusL channel to measure (e.g. eee or emm).
+
+    Returns
+    -------
+    dict
+        A dict mapping each input of the selector to the branch it reads.
+
+    """
+    # Build the object names in the same way as get_selector_inputs()
+    # i.e. "emm" -> ["e", "m1", "m2"]
+    object_counts = {obj: channel.count(obj) for obj in dict.fromkeys(channel)}
+    object_names = [
+        f"{obj}{i}" if count != 1 else obj for obj, count in object_counts.items() for i in range(1, count + 1)
+    ]
+
+    # Put the pair of same-flavour leptons first
+    if object_counts[channel[0]] == 1:
+        object_names = object_names[1:] + object_names[:1]
+    l1, l2, l3 = object_names
+    return {
+        "Z1Mass": f"{l1}_{l2}_Mass",
+        "l1Tight": f"{l1}ZZTightID",
+        "l2Tight": f"{l2}ZZTightID",
+        "l3Tight": f"{l3}ZZTightID",
+        "l1Iso": f"{l1}ZZIsoPass",
+        "l2Iso": f"{l2}ZZIsoPass",
+        "l3Iso": f"{l3}ZZIsoPass",
+        "l3Pt": f"{l3}Pt",
+        "l3Eta": f"{l3}Eta",
+        "l3MtToMET": f"{l3}MtToMET",
+    }
+
+
+def get_fake_rate_selector(sample: str, channel: str) -> ROOT.TSelector:
+    """Get a ZplusLFakeRateSelector loaded with the inputs of the given sample and channel.
+
+    Parameters
+    ----------
+    sample : str
+        The name of the sample, used to determine whether it is data or MC.
+    channel : str
+        The ZplusL channel to measure (e.g. eee or emm).
+
+    Returns
+    -------
+    ROOT.TSelector
+        The selector, which fills its histograms into its output list.
+
+    """
+    input_list = ROOT.TList()
+    input_list.Add(ROOT.TNamed("name", sample))
+    input_list.Add(ROOT.TNamed("channel", channel))
+    for name, branch in get_fake_rate_inputs(channel).items():
+        input_list.Add(ROOT.TNamed(name, branch))
+
+    selector = ROOT.ZplusLFakeRateSelector()
+    selector.SetInputList(input_list)
+    return selector
+
+
+def fill_histograms(sample: str, infile: str, outfile: str) -> int:
+    """Fill the fake-rate histograms of every ZplusL channel of a skimmed file.
+
+    The histograms are written to <sample>/<channel>/ in the output file, so the
+    outputs of several files (or samples) can be merged with hadd or
+    mergetools.merge_files().
+
+    Parameters
+    ----------
+    sample : str
+        The name of the sample of the input file.
+    infile : str
+        The path of the skimmed input file.
+    outfile : str
+        The path of the output file.
+
+    Returns
+    -------
+    int
+        The number of entries processed over all channels.
+
+    """
+    num_entries = 0
+    with ROOT.TFile.Open(infile) as input_file, ROOT.TFile.Open(outfile, "RECREATE") as output_file:
+        sample_dir = output_file.mkdir(sample)
+        for channel in helpers.get_channels("ZplusL"):
+            tree = input_file.Get(f"{channel}/ntuple")
+            if not tree:
+                continue
+
+            selector = get_fake_rate_selector(sample, channel)
+            tree.Process(selector)
+            num_entries += tree.GetEntries()
+
+            channel_dir = sample_dir.mkdir(channel)
+            for hist in selector.GetOutputList():
+                channel_dir.WriteObject(hist, hist.GetName())
+    return num_entries
@@ -1,4 +1,5 @@
 import argparse
+import hashlib
 import json
 import os
 
@@ -128,3 +129,81 @@ def merge_dicts(dict1: dict, dict2: dict):
     for key, val in dict2.items():
         if key not in dict1:
             dict1[key] = val
+
+
+def get_config_hash(*configs) -> str:
+    """Determine a hash of the given configuration.
+
+    Parameters
+    ----------
+    *configs
+        Any JSON-serializable objects (e.g. the dicts loaded from cuts.json,
+        aliases.json, and triggers.json).
+
+    Returns
+    -------
+    str
+        The SHA-256 hash of the configuration, independent of dict ordering.
+
+    """
+    return hashlib.sha256(json.dumps(configs, sort_keys=True).encode()).hexdigest()
+
+
+def get_file_signature(path: str) -> dict:
+    """Determine the size and modification time of a file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+
+    Returns
+    -------
+    dict
+        A dict containing the size ("size") and modification time ("mtime") of the file.
+
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def load_manifest(path: str) -> dict:
+    """Load a manifest of processed files, if it exists.
+
+    Parameters
+    ----------
+    path : str
+        The path of the manifest JSON file.
+
+    Returns
+    -------
+    dict
+        The manifest, mapping input files to information about how they were
+        processed. If the file does not exist, the manifest is empty.
+
+    """
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as infile:
+        return json.load(infile)
+
+
+def save_manifest(path: str, manifest: dict):
+    """Save a manifest of processed files.
+
+    The manifest is written to a temporary file first, so an interrupted job
+    never leaves a partially written manifest behind.
+
+    Parameters
+    ----------
+    path : str
+        The path of the manifest JSON file.
+    manifest : dict
+        The manifest to save.
+
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as outfile:
+        json.dump(manifest, outfile, indent=2)
+        outfile.write("\n")
+    os.replace(temp_path, path)
@@ -0,0 +1,246 @@
+import hashlib
+import multiprocessing
+import os
+from typing import Optional
+
+import numpy as np
+import uproot
+from UWVV.VVAnalysis import expressions, helpers
+
+# Version of the index format, so indexes written by older versions are rebuilt
+INDEX_VERSION = 1
+
+# Memory read from a tree at once while indexing it
+STEP_SIZE = "100 MB"
+
+NUM_WORKERS = 16
+
+
+def get_index_path(path: str, index_dir: Optional[str] = None) -> str:
+    """Determine the path of the cluster index of an input file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the input ROOT file.
+    index_dir : str, optional
+        The directory of the indexes. The name of each index includes a hash of the
+        full path of its input file, so files with the same name in different
+        directories do not collide. If None, the index is saved next to the input
+        file (e.g. ntuple.index.json for ntuple.root) (default is None).
+
+    Returns
+    -------
+    str
+        The path of the index JSON file.
+
+    """
+    if index_dir is None:
+        return os.path.splitext(path)[0] + ".index.json"
+    path_hash = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+    return os.path.join(index_dir, f"{os.path.splitext(os.path.basename(path))[0]}_{path_hash}.index.json")
+
+
+def get_cut_branches(cutstring: str, aliases: dict) -> set:
+    """Determine the branches used by a cutstring, expanding any aliases."""
+    return expressions.get_names(expressions.expand_aliases(expressions.parse(cutstring), aliases)) - {"true", "false"}
+
+
+def get_index_branches(channel_config: dict) -> dict:
+    """Determine the branches to index for each channel, as returned by skimconfig.resolve_channels()."""
+    return {channel: get_cut_branches(info["cutstring"], info["aliases"]) for channel, info in channel_config.items()}
+
+
+def is_indexable(tree: uproot.TTree, branch: str) -> bool:
+    """Check whether a branch of a tree holds a single number per entry, so it has a minimum and maximum."""
+    if branch not in tree.keys(recursive=False):
+        return False
+    interpretation = tree[branch].interpretation
+    return isinstance(interpretation, uproot.AsDtype) and interpretation.inner_shape == ()
+
+
+def index_tree(tree: uproot.TTree, offsets: list, branches: list) -> dict:
+    """Find the minimum and maximum of the given branches within each cluster of a tree.
+
+    Parameters
+    ----------
+    tree : uproot.TTree
+        The tree to index.
+    offsets : list of int
+        The first entry of each cluster, followed by the number of entries.
+    branches : list of str
+        The branches to index.
+
+    Returns
+    -------
+    dict
+        A dict mapping each branch to the minimum ("min") and maximum ("max") of each
+        cluster, which are None for clusters with any NaN. Branches that are missing
+        or not indexable (e.g. arrays) are mapped to None.
+
+    """
+    columns = dict.fromkeys(branches)
+    indexable = [branch for branch in branches if is_indexable(tree, branch)]
+    if not indexable:
+        return columns
+
+    # Read whole clusters at a time, in chunks of about STEP_SIZE
+    step = max(tree.num_entries_for(STEP_SIZE, filter_name=indexable), 1)
+    chunk_clusters = [0]
+    for cluster in range(1, len(offsets) - 1):
+        if offsets[cluster] - offsets[chunk_clusters[-1]] >= step:
+            chunk_clusters.append(cluster)
+    chunk_clusters.append(len(offsets) - 1)
+
+    columns |= {branch: {"min": [], "max": []} for branch in indexable}
+    for first, last in zip(chunk_clusters[:-1], chunk_clusters[1:]):
+        start, stop = offsets[first], offsets[last]
+        chunk = tree.arrays(filter_name=indexable, entry_start=start, entry_stop=stop, library="np")
+        cluster_starts = np.asarray(offsets[first:last]) - start
+        for branch in indexable:
+            # NaN propagates through the minimum and maximum, so clusters with NaN are not bounded
+            values = chunk[branch].astype(np.float64)
+            for key, function in (("min", np.minimum), ("max", np.maximum)):
+                extremes = function.reduceat(values, cluster_starts)
+                columns[branch][key] += [None if np.isnan(value) else float(value) for value in extremes]
+    return columns
+
+
+def get_index(path: str, branches: dict, index_dir: Optional[str] = None, verbose: bool = False) -> dict:
+    """Load the cluster index of an input file, indexing any branches that are not indexed yet.
+
+    The index holds the minimum and maximum of each branch within each cluster of
+    each channel tree, so clusters that cannot pass a cut are skipped without reading
+    them (see get_cluster_ranges()). It is built the first time it is needed (e.g. by
+    the first skim of a file or by make_json.py --cluster-index), extended when a cut
+    uses new branches, and rebuilt if the input file is rewritten, since it is tied
+    to the UUID of the file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the input ROOT file.
+    branches : dict
+        A dict mapping each channel to the branches to index, as returned by
+        get_index_branches().
+    index_dir : str, optional
+        The directory of the indexes, as in get_index_path() (default is None).
+    verbose : bool, optional
+        Whether to print when the index is updated (default is False).
+
+    Returns
+    -------
+    dict
+        The index, containing the version of the format ("version"), the UUID of the
+        input file ("uuid"), and a dict ("trees") mapping each channel to the first
+        entry of each of its clusters followed by its number of entries ("offsets")
+        and the minima and maxima of its branches ("columns"), as returned by
+        index_tree().
+
+    """
+    index_path = get_index_path(path, index_dir)
+    index = helpers.load_manifest(index_path)
+    updated = False
+    with uproot.open(path) as infile:
+        uuid = str(infile.file.uuid)
+        if index.get("version") != INDEX_VERSION or index.get("uuid") != uuid:
+            index = {"version": INDEX_VERSION, "uuid": uuid, "trees": {}}
+            updated = True
+
+        for channel, channel_branches in branches.items():
+            if f"{channel}/ntuple" not in infile:
+                continue
+            tree = infile[f"{channel}/ntuple"]
+            if channel not in index["trees"]:
+                # Clusters are the entry ranges where the baskets of all branches start together
+                offsets = sorted({int(offset) for offset in tree.common_entry_offsets()})
+                index["trees"][channel] = {"offsets": offsets, "columns": {}}
+            tree_index = index["trees"][channel]
+            missing = sorted(set(channel_branches) - set(tree_index["columns"]))
+            if missing:
+                tree_index["columns"] |= index_tree(tree, tree_index["offsets"], missing)
+                updated = True
+
+    # The index is only an optimization, so failing to save it (e.g. next to read-only input) is not an error
+    if updated:
+        try:
+            if index_dir is not None:
+                os.makedirs(index_dir, exist_ok=True)
+            helpers.save_manifest(index_path, index)
+        except OSError as err:
+            print(f"WARNING: cannot save cluster index {index_path}: {err}")
+        else:
+            if verbose:
+                print(f"Cluster index written to {index_path}")
+    return index
+
+
+def build_indexes(
+    paths: list, branches: dict, index_dir: Optional[str] = None, num_workers: int = NUM_WORKERS, verbose: bool = False
+):
+    """Build or extend the cluster indexes of several input files with a pool of processes.
+
+    Parameters
+    ----------
+    paths : list of str
+        The paths of the input files.
+    branches : dict
+        A dict mapping each channel to the branches to index.
+    index_dir : str, optional
+        The directory of the indexes, as in get_index_path() (default is None).
+    num_workers : int, optional
+        The number of processes to use (default is NUM_WORKERS).
+    verbose : bool, optional
+        Whether to print the progress of the indexing (default is False).
+
+    """
+    if verbose:
+        print(f"Indexing the clusters of {len(paths)} file(s)")
+    with multiprocessing.Pool(processes=num_workers) as pool:
+        pool.starmap(get_index, [(path, branches, index_dir) for path in paths])
+
+
+def get_cluster_ranges(index: dict, channel: str, cutstring: str, aliases: dict) -> Optional[list]:
+    """Determine the entry ranges of the clusters of a channel tree that may pass a cutstring.
+
+    Parameters
+    ----------
+    index : dict
+        The index of the input file, as returned by get_index().
+    channel : str
+        The channel of the tree (e.g. eeee).
+    cutstring : str
+        The cutstring built from build_cutstring() and the trigger selection.
+    aliases : dict
+        A dict containing all the aliases that can be used by the cutstring.
+
+    Returns
+    -------
+    list of tuple of (int, int) or None
+        The (start, stop) entries of each range of consecutive clusters that may pass,
+        in increasing order, or None if the tree is not indexed. Clusters are only
+        skipped if no entry within the minima and maxima of the branches they contain
+        can pass, so the entries passing the cutstring are always within these ranges.
+
+    """
+    if channel not in index["trees"]:
+        return None
+    tree_index = index["trees"][channel]
+    offsets, columns = tree_index["offsets"], tree_index["columns"]
+    node = expressions.expand_aliases(expressions.parse(cutstring), aliases)
+    names = [name for name in expressions.get_names(node) if columns.get(name)]
+
+    ranges = []
+    for cluster, (start, stop) in enumerate(zip(offsets[:-1], offsets[1:])):
+        bounds = {
+            name: (columns[name]["min"][cluster], columns[name]["max"][cluster])
+            for name in names
+            if columns[name]["min"][cluster] is not None
+        }
+        if not expressions.may_pass(node, bounds):
+            continue
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], stop)
+        else:
+            ranges.append((start, stop))
+    return ranges
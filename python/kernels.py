@@ -0,0 +1,170 @@
+import fcntl
+import glob
+import hashlib
+import os
+import re
+import string
+from typing import Optional
+
+import ROOT
+
+MAX_CACHE_SIZE = 200 * 1024**2  # bytes
+KERNEL_PREFIX = "uwvv_cut_"
+
+
+def build_kernel_source(expression: str, aliases: dict, column_types: dict) -> str:
+    """Build the C++ source of a function that evaluates an expression.
+
+    Parameters
+    ----------
+    expression : str
+        The C++ expression to evaluate (e.g. a cutstring translated by
+        skimtools.to_cpp_expression()).
+    aliases : dict
+        A dict containing the C++ expressions of every alias used by the expression,
+        ordered such that each alias only uses aliases defined before it.
+    column_types : dict
+        A dict mapping each branch used by the expression (or its aliases) to its type.
+
+    Returns
+    -------
+    str
+        The C++ source defining the function, which takes the branches as arguments
+        in the order of column_types. The source is a string.Template with the
+        function named ${kernel_name}, which is substituted by load_kernel().
+
+    """
+    arguments = ", ".join(f"{column_type} {column}" for column, column_type in column_types.items())
+    body = "".join(f"  const auto {key} = ({val});\n" for key, val in aliases.items())
+    body += f"  return {expression};\n"
+    source = "#include <cmath>\n\n"
+    # Escape any $ of the arguments and body, so only the function name is substituted
+    source += "bool ${kernel_name}(" + arguments.replace("$", "$$") + ") {\n"
+    source += body.replace("$", "$$")
+    source += "}\n"
+    return source
+
+
+def sort_aliases(expression: str, aliases: dict) -> dict:
+    """Order the aliases used by an expression so each is defined after its dependencies.
+
+    Parameters
+    ----------
+    expression : str
+        The expression to check (e.g. a cutstring).
+    aliases : dict
+        A dict containing all the aliases that can be used.
+
+    Returns
+    -------
+    dict
+        The aliases used (directly or through other aliases) by the expression.
+
+    """
+    result = {}
+
+    def visit(key):
+        if key in result:
+            return
+        for name in re.findall(r"\b[A-Za-z_]\w*\b", aliases[key]):
+            if name in aliases and name != key:
+                visit(name)
+        result[key] = aliases[key]
+
+    for name in re.findall(r"\b[A-Za-z_]\w*\b", expression):
+        if name in aliases:
+            visit(name)
+    return result
+
+
+def load_kernel(source: str, cache_dir: str, max_size: int = MAX_CACHE_SIZE) -> Optional[str]:
+    """Load a compiled kernel from the cache, compiling it if needed.
+
+    Kernels are stored in the cache directory by the hash of their source and the
+    ROOT version, so a kernel is only compiled once for a given expression. Any
+    kernel that fails to compile or load (e.g. if the cached library is stale) is
+    removed from the cache so that it can be rebuilt.
+
+    Parameters
+    ----------
+    source : str
+        The C++ source template from build_kernel_source().
+    cache_dir : str
+        The directory storing the compiled kernels.
+    max_size : int, optional
+        The maximum size of the cache directory in bytes (default is MAX_CACHE_SIZE).
+
+    Returns
+    -------
+    str or None
+        The name of the compiled function, or None if it cannot be loaded.
+
+    """
+    digest = hashlib.sha256((ROOT.gROOT.GetVersion() + source).encode()).hexdigest()[:16]
+    name = f"{KERNEL_PREFIX}{digest}"
+    source_path = os.path.join(cache_dir, f"{name}.C")
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, ".lock"), "w") as lockfile:
+        # Avoid compiling the same kernel from multiple processes at once
+        fcntl.flock(lockfile, fcntl.LOCK_EX)
+        if not os.path.isfile(source_path):
+            with open(source_path, "w") as outfile:
+                outfile.write(string.Template(source).substitute(kernel_name=name))
+
+        # ACLiC only recompiles if the library is older than the source
+        if ROOT.gSystem.CompileMacro(source_path, "kO", "", cache_dir) != 1:
+            remove_kernel(cache_dir, name)
+            return None
+
+        # Mark kernel as recently used (for eviction), without touching the source
+        for library in glob.glob(os.path.join(cache_dir, f"{name}_C*.so")):
+            os.utime(library)
+        evict_kernels(cache_dir, max_size, keep=name)
+    return name
+
+
+def remove_kernel(cache_dir: str, name: str):
+    """Remove all files for a kernel from the cache.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory storing the compiled kernels.
+    name : str
+        The name of the kernel to remove.
+
+    """
+    for path in glob.glob(os.path.join(cache_dir, f"{name}*")):
+        os.remove(path)
+
+
+def evict_kernels(cache_dir: str, max_size: int = MAX_CACHE_SIZE, keep: Optional[str] = None):
+    """Remove the least recently used kernels until the cache fits within a maximum size.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory storing the compiled kernels.
+    max_size : int, optional
+        The maximum size of the cache directory in bytes (default is MAX_CACHE_SIZE).
+    keep : str, optional
+        The name of a kernel that is never removed (e.g. the kernel just loaded), even
+        if the cache still exceeds the maximum size without it (default is None).
+
+    """
+    # Group files by kernel, using the latest modification time as the last use
+    kernel_sizes, kernel_times = {}, {}
+    for path in glob.glob(os.path.join(cache_dir, f"{KERNEL_PREFIX}*")):
+        name = os.path.basename(path)[: len(KERNEL_PREFIX) + 16]
+        kernel_sizes[name] = kernel_sizes.get(name, 0) + os.path.getsize(path)
+        kernel_times[name] = max(kernel_times.get(name, 0), os.path.getmtime(path))
+
+    total_size = sum(kernel_sizes.values())
+    for name in sorted(kernel_times, key=kernel_times.get):
+        if total_size <= max_size:
+            break
+        if name == keep:
+            continue
+        remove_kernel(cache_dir, name)
+        total_size -= kernel_sizes[name]
@@ -0,0 +1,88 @@
+import os
+from typing import Optional
+
+import ROOT
+
+MAX_OPEN_FILES = 64
+
+
+def group_files(paths: list, max_size: Optional[int] = None, sizes: Optional[dict] = None) -> list:
+    """Group input files so the total size of each group stays within a target size.
+
+    Parameters
+    ----------
+    paths : list
+        The paths of the files to group, in the order they should be merged.
+    max_size : int, optional
+        The target size of each group, in bytes unless other sizes are given. A file
+        larger than the target is placed in a group on its own. If None, all files
+        are placed in a single group (default is None).
+    sizes : dict, optional
+        A dict mapping paths to their sizes (e.g. bytes from a catalog, or entries
+        to group by number of entries). Files not in the dict are checked on disk
+        (default is None).
+
+    Returns
+    -------
+    list
+        A list of groups, each being a list of file paths.
+
+    """
+    if max_size is None:
+        return [list(paths)] if paths else []
+
+    groups = []
+    group, group_size = [], 0
+    for path in paths:
+        size = sizes[path] if sizes and path in sizes else os.path.getsize(path)
+        if group and group_size + size > max_size:
+            groups.append(group)
+            group, group_size = [], 0
+        group.append(path)
+        group_size += size
+    if group:
+        groups.append(group)
+    return groups
+
+
+def merge_files(infiles: list, outfile: str, max_open_files: int = MAX_OPEN_FILES, verbose: bool = False) -> bool:
+    """Merge skimmed files into a single output file, keeping their directory layout.
+
+    Trees are merged with a basket-level fast copy, so the compressed baskets of the
+    inputs are written to the output without being decompressed. The output uses the
+    compression settings of the first input file, matching the default skim output.
+
+    Parameters
+    ----------
+    infiles : list
+        The paths of the files to merge.
+    outfile : str
+        The path of the merged output file.
+    max_open_files : int, optional
+        The maximum number of input files to keep open at once. If there are more
+        input files, they are merged into the output in batches (default is
+        MAX_OPEN_FILES).
+    verbose : bool, optional
+        Whether to print the progress of the merge (default is False).
+
+    Returns
+    -------
+    bool
+        Whether the merge was successful.
+
+    """
+    # Keep the compression of the inputs, so baskets can be copied as they are
+    with ROOT.TFile.Open(infiles[0]) as infile:
+        compression = infile.GetCompressionSettings()
+
+    merger = ROOT.TFileMerger(False, False)
+    merger.SetMsgPrefix("merge.py")
+    merger.SetPrintLevel(1 if verbose else 0)
+    merger.SetFastMethod(True)
+    merger.SetMaxOpenedFiles(max_open_files)
+    if not merger.OutputFile(outfile, "RECREATE", compression):
+        return False
+    for path in infiles:
+        if not merger.AddFile(path, False):
+            return False
+    return merger.Merge()
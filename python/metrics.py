@@ -0,0 +1,140 @@
+import contextlib
+import json
+import os
+import resource
+import time
+from typing import Optional
+
+# Stages of a skim, in the order they are applied to each input file
+STAGES = ["open", "index", "cutflow", "cuts", "selector", "copy", "gen", "meta", "write"]
+
+# Name of the metrics saved in each output file
+METRICS_NAME = "skimMetrics"
+
+
+def get_max_rss() -> int:
+    """Get the peak resident set size of this process since it started (or since reset_max_rss()), in bytes.
+
+    The peak is read from /proc/self/status where it exists (i.e. on Linux), so that
+    reset_max_rss() applies. Elsewhere, it is the peak over the lifetime of the process.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def reset_max_rss() -> bool:
+    """Reset the peak resident set size of this process to its current RSS.
+
+    Long-lived processes (e.g. the workers of multi_skim.py and skim_server.py) call
+    this at the start of each job, so the peak RSS of a job does not include that of
+    the jobs before it. This is only supported on Linux, and elsewhere the peak RSS
+    of each job is the peak over the lifetime of the process.
+
+    Returns
+    -------
+    bool
+        Whether the peak RSS was reset.
+
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return False
+    return True
+
+
+@contextlib.contextmanager
+def measure(stages: Optional[dict], name: str):
+    """Add the wall time, CPU time, and peak RSS of the enclosed code to a stage.
+
+    Since the peak RSS of a process only increases (until reset by reset_max_rss()),
+    the peak RSS of a stage is that of the process at the end of the stage.
+
+    Parameters
+    ----------
+    stages : dict or None
+        A dict mapping each stage to its wall time ("wall_time"), CPU time
+        ("cpu_time"), peak RSS ("max_rss"), and number of times measured ("calls").
+        This will be updated. If None, nothing is measured.
+    name : str
+        The stage to add to (e.g. cuts).
+
+    """
+    if stages is None:
+        yield
+        return
+
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        stage = stages.setdefault(name, {"wall_time": 0.0, "cpu_time": 0.0, "max_rss": 0, "calls": 0})
+        stage["wall_time"] += time.perf_counter() - start_wall
+        stage["cpu_time"] += time.process_time() - start_cpu
+        stage["max_rss"] = max(stage["max_rss"], get_max_rss())
+        stage["calls"] += 1
+
+
+def merge_metrics(metrics1: dict, metrics2: dict):
+    """Merge metrics by adding their numbers, except for peak RSS, which takes the largest.
+
+    Parameters
+    ----------
+    metrics1 : dict
+        The metrics to merge into. This will be overwritten.
+    metrics2 : dict
+        The metrics to merge from. Values that are not numbers (e.g. the output file)
+        are only copied if missing from metrics1.
+
+    """
+    for key, val in metrics2.items():
+        if key not in metrics1:
+            metrics1[key] = json.loads(json.dumps(val))
+        elif type(val) is dict:
+            merge_metrics(metrics1[key], val)
+        elif key == "max_rss":
+            metrics1[key] = max(metrics1[key], val)
+        elif type(val) in (int, float):
+            metrics1[key] += val
+
+
+def get_metrics_path(outfile: str) -> str:
+    """Determine the path of the metrics JSON file for a given output file (e.g. output.metrics.json)."""
+    return os.path.splitext(outfile)[0] + ".metrics.json"
+
+
+def load_metrics(path: str) -> dict:
+    """Load the metrics of a skim from its metrics JSON file, or from the output file itself.
+
+    Parameters
+    ----------
+    path : str
+        The path of the metrics JSON file or of the output ROOT file.
+
+    Returns
+    -------
+    dict
+        The metrics, or an empty dict if the output file does not contain any.
+
+    """
+    if not path.endswith(".root"):
+        with open(path) as infile:
+            return json.load(infile)
+
+    # Imported here, so the numpy engine and metrics JSON files don't need ROOT
+    import ROOT  # noqa: PLC0415
+
+    with ROOT.TFile.Open(path) as infile:
+        named = infile.Get(METRICS_NAME)
+        if not named:
+            return {}
+
+        # Files written by the numpy engine store the metrics as a TObjString instead
+        return json.loads(named.GetString().Data() if named.InheritsFrom("TObjString") else named.GetTitle())
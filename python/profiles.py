@@ -0,0 +1,111 @@
+import ROOT
+
+# Reads every entry of a tree in C++, since calling TTree::GetEntry from Python for each entry dominates the read time
+READ_TREE_SOURCE = """
+Long64_t uwvv_read_tree(TTree *tree) {
+  Long64_t nbytes = 0;
+  const Long64_t entries = tree->GetEntries();
+  for (Long64_t entry = 0; entry < entries; ++entry) {
+    nbytes += tree->GetEntry(entry);
+  }
+  return nbytes;
+}
+"""
+
+
+def get_compression_settings(profile: dict) -> int:
+    """Determine the ROOT compression settings of an output profile.
+
+    Parameters
+    ----------
+    profile : dict
+        A dict containing the output profile, as defined in profiles.json.
+
+    Returns
+    -------
+    int
+        The compression settings to use for the output file (algorithm * 100 + level).
+        If the profile doesn't specify an algorithm, ROOT's default settings are used.
+
+    """
+    if "algorithm" not in profile:
+        return ROOT.RCompressionSetting.EDefaults.kUseGeneralPurpose
+    algorithm = getattr(ROOT.RCompressionSetting.EAlgorithm, f"k{profile['algorithm']}")
+    return ROOT.CompressionSettings(algorithm, profile.get("level", 5))
+
+
+def apply_profile(tree: ROOT.TTree, profile: dict):
+    """Apply the compression and clustering of an output profile to a tree.
+
+    Trees copied from this tree (e.g. with CopyTree or CloneTree) inherit these
+    settings, so this can be applied to the input trees before skimming. Reading the
+    input tree is not affected, since each basket stores its own compression.
+
+    Parameters
+    ----------
+    tree : ROOT.TTree
+        The tree to update.
+    profile : dict
+        A dict containing the output profile, as defined in profiles.json.
+
+    """
+    if "algorithm" in profile:
+        compression = get_compression_settings(profile)
+        for branch in tree.GetListOfBranches():
+            branch.SetCompressionSettings(compression)
+    if "auto_flush" in profile:
+        tree.SetAutoFlush(profile["auto_flush"])
+    if "basket_size" in profile:
+        tree.SetBasketSize("*", profile["basket_size"])
+
+
+def copy_file(infile: str, outfile: str, profile: dict):
+    """Copy every tree of a skimmed file to a new file, recompressing it with an output profile.
+
+    Parameters
+    ----------
+    infile : str
+        The path of the skimmed file to copy.
+    outfile : str
+        The path of the output file.
+    profile : dict
+        A dict containing the output profile, as defined in profiles.json.
+
+    """
+    compression = get_compression_settings(profile)
+    with ROOT.TFile.Open(infile) as source, ROOT.TFile.Open(outfile, "RECREATE", "", compression) as target:
+        for dirkey in source.GetListOfKeys():
+            subdir = target.mkdir(dirkey.GetName())
+            for key in dirkey.ReadObj().GetListOfKeys():
+                tree = key.ReadObj()
+                apply_profile(tree, profile)
+                subdir.cd()
+                tree.CloneTree(-1).Write()
+
+
+def read_file(path: str) -> int:
+    """Read and decompress every entry of every tree in a skimmed file.
+
+    The entries are read by a loop compiled with the ROOT interpreter, so the read
+    time measures the decompression of the file rather than the Python overhead.
+
+    Parameters
+    ----------
+    path : str
+        The path of the skimmed file to read.
+
+    Returns
+    -------
+    int
+        The number of uncompressed bytes read.
+
+    """
+    if not hasattr(ROOT, "uwvv_read_tree"):
+        ROOT.gInterpreter.Declare(READ_TREE_SOURCE)
+
+    nbytes = 0
+    with ROOT.TFile.Open(path) as infile:
+        for dirkey in infile.GetListOfKeys():
+            for key in dirkey.ReadObj().GetListOfKeys():
+                nbytes += ROOT.uwvv_read_tree(key.ReadObj())
+    return nbytes
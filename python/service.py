@@ -0,0 +1,61 @@
+import getpass
+import os
+import tempfile
+from multiprocessing.connection import Client
+
+# This module is imported by the client mode of skim.py, so it must not import ROOT
+
+
+def get_default_address() -> str:
+    """Determine the default socket of the skim server, which is unique to each user."""
+    return os.path.join(tempfile.gettempdir(), f"uwvv_skim_{getpass.getuser()}.sock")
+
+
+def is_running(address: str) -> bool:
+    """Check whether a skim server is accepting requests at the given socket."""
+    try:
+        Client(address, family="AF_UNIX").close()
+    except (ConnectionRefusedError, FileNotFoundError):
+        return False
+    return True
+
+
+def build_request(options: dict) -> dict:
+    """Build a skim request from the options of skim.py.
+
+    Parameters
+    ----------
+    options : dict
+        The parsed options of skim.py (e.g. vars(args)), including the input files.
+
+    Returns
+    -------
+    dict
+        The request, containing the options and the working directory of the client
+        ("cwd"), so the server resolves relative paths the same way.
+
+    """
+    return {"cwd": os.getcwd(), "options": options}
+
+
+def submit(address: str, request: dict) -> dict:
+    """Submit a skim request to a running server and wait for it to finish.
+
+    Parameters
+    ----------
+    address : str
+        The socket of the server.
+    request : dict
+        The request, as returned by build_request().
+
+    Returns
+    -------
+    dict
+        The result of the request, containing its status ("status", which is "done"
+        or "failed"), the output files written ("outfiles"), and for failed requests,
+        the error ("error") and the traceback on the server ("traceback").
+
+    """
+    with Client(address, family="AF_UNIX") as connection:
+        connection.send(request)
+        return connection.recv()
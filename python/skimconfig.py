@@ -0,0 +1,387 @@
+import copy
+import fnmatch
+import itertools
+import os
+import re
+from typing import Optional
+
+from UWVV.VVAnalysis import expressions, helpers
+
+# This module is imported by the numpy engine, so it must not import ROOT
+
+# Output profile (see profiles.json) used when none is given
+DEFAULT_PROFILE = "default"
+
+
+def resolve_channels(analysis: str, trigger: str, cutinfo: dict, aliases: dict, triggers: dict) -> dict:
+    """Resolve the cutstring, aliases, and required branches of each channel.
+
+    Parameters
+    ----------
+    analysis : str
+        The analysis to resolve the channels for (e.g. ZZ4l).
+    trigger : str
+        The trigger selection to include in the cutstrings (e.g. MonteCarlo).
+    cutinfo : dict
+        A dict containing all the relevant cuts to be applied.
+    aliases : dict
+        A dict containing all the aliases to be set for the input trees.
+    triggers : dict
+        A dict containing the trigger selections for MonteCarlo and each data stream.
+
+    Returns
+    -------
+    dict
+        A dict containing, for each channel, the full cutstring ("cutstring"), the
+        aliases to set ("aliases"), the branches needed by the cuts, aliases,
+        trigger, and selector ("required_branches"), and the inputs of the selector
+        ("selector_inputs"), as returned by get_selector_inputs().
+
+    """
+    channel_config = {}
+    for channel in helpers.get_channels(analysis):
+        cutstring = build_cutstring(cutinfo, channel) + f" && ({triggers[trigger]})"
+        channel_aliases = aliases["Event"] | aliases["Channel"][channel]
+        required_branches = get_expression_branches(cutstring, channel_aliases)
+        selector_inputs = get_selector_inputs(analysis, channel)
+        if selector_inputs is not None:
+            required_branches |= set(selector_inputs.values())
+        channel_config[channel] = {
+            "cutstring": cutstring,
+            "aliases": channel_aliases,
+            "required_branches": required_branches,
+            "selector_inputs": selector_inputs,
+        }
+    return channel_config
+
+
+def get_cutflow_path(outfile: str) -> str:
+    """Determine the path of the cutflow JSON file for a given output file.
+
+    Parameters
+    ----------
+    outfile : str
+        The path of the output ROOT file.
+
+    Returns
+    -------
+    str
+        The path of the cutflow JSON file (e.g. output.cutflow.json for output.root).
+
+    """
+    return os.path.splitext(outfile)[0] + ".cutflow.json"
+
+
+def get_analysis_outfile(outfile: str, analysis: str, num_analyses: int = 1) -> str:
+    """Determine the output file of an analysis, suffixed with _<ANALYSIS> if skimming several at once.
+
+    Parameters
+    ----------
+    outfile : str
+        The path of the output file given for the job (e.g. output.root).
+    analysis : str
+        The analysis to write.
+    num_analyses : int, optional
+        The number of analyses skimmed by the job (default is 1).
+
+    Returns
+    -------
+    str
+        The path of the output file of the analysis (e.g. output_ZZ4l.root).
+
+    """
+    if num_analyses == 1:
+        return outfile
+    root, ext = os.path.splitext(outfile)
+    return f"{root}_{analysis}{ext}"
+
+
+def get_expression_branches(expression: str, aliases: dict) -> set:
+    """Determine the names used by an expression, expanding any aliases.
+
+    Parameters
+    ----------
+    expression : str
+        The expression to check (e.g. a cutstring).
+    aliases : dict
+        A dict containing all the aliases that can be used by the expression.
+
+    Returns
+    -------
+    set of str
+        The names used by the expression and the aliases it uses, excluding
+        the aliases themselves. Names that are not branches (e.g. abs) are
+        included and should be filtered against the branches of a tree.
+
+    """
+    names = set()
+    unchecked = re.findall(r"\b[A-Za-z_]\w*\b", expression)
+    while unchecked:
+        name = unchecked.pop()
+        if name in names:
+            continue
+        names.add(name)
+        if name in aliases:
+            unchecked += re.findall(r"\b[A-Za-z_]\w*\b", aliases[name])
+    return names - set(aliases)
+
+
+def get_active_branches(branch_names: list, branchinfo: dict, required_branches: set) -> list:
+    """Determine the branches to keep from the branch information.
+
+    A branch is kept if it matches any pattern in the "Keep" list (or the list
+    is missing or empty) and does not match any pattern in the "Drop" list.
+    Required branches are always kept. Patterns can use wildcards (e.g. '*Pt').
+
+    Parameters
+    ----------
+    branch_names : list of str
+        The names of all branches in the tree.
+    branchinfo : dict
+        A dict containing the "Keep" and "Drop" lists of branch patterns.
+    required_branches : set of str
+        The names of branches that must be kept (e.g. those used by the cuts).
+
+    Returns
+    -------
+    list of str
+        The names of branches to keep, in the order of the tree.
+
+    """
+    keep_patterns = branchinfo.get("Keep", [])
+    drop_patterns = branchinfo.get("Drop", [])
+
+    active_branches = []
+    for branch_name in branch_names:
+        keep = not keep_patterns or any(fnmatch.fnmatchcase(branch_name, pattern) for pattern in keep_patterns)
+        drop = any(fnmatch.fnmatchcase(branch_name, pattern) for pattern in drop_patterns)
+        if branch_name in required_branches or (keep and not drop):
+            active_branches.append(branch_name)
+    return active_branches
+
+
+def build_cutstring(cutinfo: dict, channel: str, optimize: bool = True) -> str:
+    """Build a cutstring to apply to a tree to skim unwanted events.
+
+    If optimized, the cuts are combined with expressions.build_conjunction(), which
+    removes duplicate terms and orders the terms from cheapest to most expensive, and
+    the leading pt cut is built in its cheaper form (see build_cut_groups()). The
+    same entries pass either way, which scripts/check_cuts.py checks on synthetic
+    ntuples.
+
+    Parameters
+    ----------
+    cutinfo : dict
+        A dict containing all the relevant cuts to be applied.
+    channel : str
+        The channel where the skimming is applied (e.g. eeee or eemm).
+    optimize : bool, optional
+        Whether to optimize the cutstring, rather than joining the cuts as given
+        (default is True).
+
+    Returns
+    -------
+    str
+        The cutstring built from the given cut information depending on
+        the channel provided.
+
+    """
+    cuts = [cut for group in build_cut_groups(cutinfo, channel, optimize).values() for cut in group]
+    if optimize:
+        return expressions.build_conjunction(cuts)
+    return " && ".join(f"({cut})" for cut in cuts)
+
+
+def build_cut_groups(cutinfo: dict, channel: str, optimize: bool = True) -> dict:
+    """Build the cuts to apply to a tree, grouped by their type.
+
+    Parameters
+    ----------
+    cutinfo : dict
+        A dict containing all the relevant cuts to be applied.
+    channel : str
+        The channel where the skimming is applied (e.g. eeee or eemm).
+    optimize : bool, optional
+        Whether to build the leading pt cut as one object passing the leading pt
+        and two passing the subleading pt, which is the same selection as one
+        object passing the leading pt and another passing the subleading pt
+        whenever the leading pt is at least the subleading pt, but grows linearly
+        rather than quadratically with the number of objects (default is True).
+
+    Returns
+    -------
+    dict
+        A dict mapping each type of cut (Event, Channel, Object, ObjectPair,
+        and LeadingPt) to the list of cuts of that type, in the order they
+        are applied by build_cutstring().
+
+    """
+    # Begin with event cuts and channel-dependent cuts
+    cut_groups = {
+        "Event": list(cutinfo["Event"]),
+        "Channel": list(cutinfo["Channel"][channel]),
+        "Object": [],
+        "ObjectPair": [],
+        "LeadingPt": [],
+    }
+
+    # Build counts of objects and object names
+    # i.e. eemm: {"e": 2, "m": 2} -> {"e": ["e1", "e2"], "m": ["m1", "m2"]}
+    object_counts = {}
+    for obj in channel:
+        if obj in object_counts:
+            object_counts[obj] += 1
+        else:
+            object_counts[obj] = 1
+
+    object_names = {}
+    for obj, count in object_counts.items():
+        object_names[obj] = [f"{obj}{i}" if count != 1 else obj for i in range(1, count + 1)]
+
+    # Add cuts on each object in the event (e.g. on e1, e2, m1, m2)
+    for obj, obj_cuts in cutinfo["Object"].items():
+        if obj in object_names:
+            cut_groups["Object"] += [cut.format(name) for cut in obj_cuts for name in object_names[obj]]
+
+    # Add cuts on each object pair in the event (e.g. e1_e2, e1_m1, e1_m2, ...)
+    all_object_names = [name for names in object_names.values() for name in names]
+    for cut in cutinfo["ObjectPair"]:
+        for obj1, obj2 in itertools.combinations(all_object_names, 2):
+            cut_groups["ObjectPair"].append(cut.format(obj1, obj2))
+
+    # Add cuts on leading (+ subleading) pt leptons
+    if cutinfo["LeadingPt"] is not None:
+        if cutinfo["SubleadingPt"] is not None and optimize and cutinfo["LeadingPt"] >= cutinfo["SubleadingPt"]:
+            # Any object passing the leading pt also passes the subleading pt, so count the objects passing it
+            leading = " || ".join(f"{obj}Pt >= {cutinfo['LeadingPt']}" for obj in all_object_names)
+            subleading = " + ".join(f"({obj}Pt >= {cutinfo['SubleadingPt']})" for obj in all_object_names)
+            cut_groups["LeadingPt"].append(f"({leading}) && {subleading} >= 2")
+        elif cutinfo["SubleadingPt"] is not None:
+            ptcuts = [
+                f"{obj1}Pt >= {cutinfo['LeadingPt']} && ("
+                + " || ".join(f"{obj2}Pt >= {cutinfo['SubleadingPt']}" for obj2 in all_object_names if obj2 != obj1)
+                + ")"
+                for obj1 in all_object_names
+            ]
+            cut_groups["LeadingPt"].append(" || ".join(f"({cut})" for cut in ptcuts))
+        else:
+            cut_groups["LeadingPt"].append(
+                " || ".join(f"{obj}Pt >= {cutinfo['LeadingPt']}" for obj in all_object_names)
+            )
+
+    return cut_groups
+
+
+def merge_cutflows(cutflow1: dict, cutflow2: dict):
+    """Merge cutflows by adding the entries and CPU times of each step.
+
+    Parameters
+    ----------
+    cutflow1 : dict
+        The cutflow to merge into. This will be overwritten.
+    cutflow2 : dict
+        The cutflow to merge from.
+
+    """
+    for key, val in cutflow2.items():
+        if key not in cutflow1:
+            cutflow1[key] = copy.deepcopy(val)
+        elif type(val) is dict:
+            merge_cutflows(cutflow1[key], val)
+        else:
+            cutflow1[key] += val
+
+
+def get_selector_inputs(analysis: str, channel: str) -> Optional[dict]:
+    """Get the inputs of the selector appropriate for the given analysis.
+
+    Parameters
+    ----------
+    analysis : str
+        The analysis to check for a selector (e.g. ZZ4l).
+    channel : str
+        The channel where the skimming is applied (e.g. eeee or eemm).
+
+    Returns
+    -------
+    dict or None
+        A dict mapping each input of the selector to the branch it reads, depending
+        on the given analysis and channel. If no selector is specified for an
+        analysis, returns None.
+
+    """
+    inputs = None
+
+    # Build counts of objects and the list of object names
+    # i.e. {"e": 2, "m": 2} -> ["e1", "e2", "m1", "m2"]
+    # (These are built slightly differently than in build_cutstring())
+    object_counts = {}
+    for obj in channel:
+        if obj in object_counts:
+            object_counts[obj] += 1
+        else:
+            object_counts[obj] = 1
+
+    object_names = []
+    for obj, count in object_counts.items():
+        object_names += [f"{obj}{i}" if count != 1 else obj for i in range(1, count + 1)]
+
+    # Build inputs depending on analysis
+    if analysis == "ZZ4l":
+        # For a given event, choose the best ZZ candidate
+        inputs = {
+            "run": "run",
+            "evt": "evt",
+            "Z1Mass": f"{object_names[0]}_{object_names[1]}_Mass",
+            "Z2Mass": f"{object_names[2]}_{object_names[3]}_Mass",
+            "l1Pt": f"{object_names[0]}Pt",
+            "l2Pt": f"{object_names[1]}Pt",
+            "l3Pt": f"{object_names[2]}Pt",
+            "l4Pt": f"{object_names[3]}Pt",
+            "l1Tight": f"{object_names[0]}ZZTightID",
+            "l2Tight": f"{object_names[1]}ZZTightID",
+            "l3Tight": f"{object_names[2]}ZZTightID",
+            "l4Tight": f"{object_names[3]}ZZTightID",
+            "l1Iso": f"{object_names[0]}ZZIsoPass",
+            "l2Iso": f"{object_names[1]}ZZIsoPass",
+            "l3Iso": f"{object_names[2]}ZZIsoPass",
+            "l4Iso": f"{object_names[3]}ZZIsoPass",
+        }
+    elif analysis == "ZplusL":
+        # For a given event, choose the best Z candidate
+        inputs = {"run": "run", "evt": "evt"}
+        for obj, count in object_counts.items():
+            if count >= 2:
+                inputs["Z1Mass"] = f"{obj}1_{obj}2_Mass"
+    else:
+        pass  # No selector is built, will return None
+
+    return inputs
+
+
+def get_trigger(triggers: list, sample: str) -> str:
+    """Return appropriate trigger to use for given sample.
+
+    This function searches the sample name for '_TRIGGER_' for
+    each trigger in the provided list. Data samples follow this
+    convention so that the triggers can be determined on-the-fly.
+    If no match is found, 'MonteCarlo' is chosen.
+
+    Parameters
+    ----------
+    triggers : list of str
+        A list of trigger names to check.
+    sample: str
+        The name of a sample to check.
+
+    Returns
+    -------
+    str
+        The trigger name to apply.
+
+    """
+    # Determine trigger (i.e. Primary Dataset for data) for given sample
+    for trigger in triggers:
+        if f"_{trigger}_" in sample:
+            return trigger
+    return "MonteCarlo"
@@ -1,12 +1,25 @@
 import argparse
-import itertools
+import contextlib
+import json
+import re
+import time
+import uuid
 from typing import Optional
 
+import numpy as np
 import ROOT
-from UWVV.VVAnalysis import helpers
+from UWVV.VVAnalysis import columnar, helpers, kernels, mergetools, metrics, profiles, skimconfig
 
 
-def skim(args: argparse.Namespace, cutinfo: dict, aliases: dict, triggers: dict):
+def skim(
+    args: argparse.Namespace,
+    cutinfo: dict,
+    aliases: dict,
+    triggers: dict,
+    branchinfo: Optional[dict] = None,
+    channel_config: Optional[dict] = None,
+    profile: Optional[dict] = None,
+):
     """Apply cuts and optional selector to input file.
 
     Parameters
@@ -21,139 +34,871 @@ def skim(args: argparse.Namespace, cutinfo: dict, aliases: dict, triggers: dict)
         A dict containing all the aliases to be set for the input trees.
     triggers : dict
         A dict containing the trigger selections for MonteCarlo and each data stream.
+    branchinfo : dict, optional
+        A dict containing the branches to keep and drop in the output trees. If None
+        or empty, all branches are kept (default is None).
+    channel_config : dict, optional
+        A dict containing the resolved configuration of each channel for the trigger,
+        as returned by skimconfig.resolve_channels(). If None, it is resolved from the other
+        inputs (default is None).
+    profile : dict, optional
+        A dict containing the compression and clustering of the output file, as
+        defined in profiles.json. If None, ROOT's defaults are used (default is None).
 
     """
-    # Create output ROOT file
-    with ROOT.TFile.Open(args.outfile, "RECREATE") as outfile:
-        if args.verbose:
-            print(f"Writing to {args.outfile}")
-        outfile.cd()
+    analysis_config = {
+        "outfile": args.outfile,
+        "trigger": args.trigger,
+        "cutinfo": cutinfo,
+        "aliases": aliases,
+        "triggers": triggers,
+        "branchinfo": branchinfo,
+        "channels": channel_config,
+        "profile": profile,
+    }
+    skim_analyses(args, {args.analysis: analysis_config})
 
-        # Skim tree for each channel
-        for channel in helpers.get_channels(args.analysis):
-            cutstring = build_cutstring(cutinfo, channel)
-            cutstring += f" && ({triggers[args.trigger]})"
 
-            # Initialize tree
-            tree = ROOT.TChain(f"{channel}/ntuple")
-            for infile in args.infiles:
-                tree.Add(infile)
+def skim_analyses(args: argparse.Namespace, analyses: dict):
+    """Apply the cuts and optional selectors of several analyses, reading each input file once.
 
-            # Set aliases
-            for key, val in (aliases["Event"] | aliases["Channel"][channel]).items():
-                tree.SetAlias(key, val)
+    Each input file is opened once, and the channels of every analysis are skimmed
+    from it into the output file of that analysis. The metaInfo tree shared by all
+    analyses is only read once per input file.
+
+    If metrics are requested, the wall time, CPU time, and peak RSS of each stage,
+    the bytes read and written, and the entries in and out of each channel are saved
+    to <OUTFILE>.metrics.json and as skimMetrics in the output file of each analysis.
+    The metrics shared by all analyses (the stages they share, e.g. opening the input
+    files, and the bytes read from each input file) are saved under "shared" in the
+    metrics of each analysis, with an ID of the job, so they can be counted once per
+    job. The peak RSS is reset at the start of the job (see metrics.reset_max_rss()),
+    so it does not include earlier jobs of the same process.
+
+    If a cluster index is requested, the clusters of each channel tree that cannot
+    pass its cutstring are skipped, using the minimum and maximum of each branch of
+    the cutstring within each cluster. The index of each input file is built the first
+    time it is needed, as described in indexes.get_index().
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        A dict-like object parsed from the command-line containing information about
+        the job. Contains year, infiles, engine, etc. Check skim.py to see full list.
+        The analysis, trigger, and outfile are taken from each analysis instead. With
+        the numpy engine, the skim is done by vectorized.skim_analyses().
+    analyses : dict
+        A dict mapping each analysis to its configuration, containing its output file
+        ("outfile"), trigger ("trigger"), and the dicts loaded from its JSON files
+        ("cutinfo", "aliases", "triggers", "branchinfo", and "profile"). It may also
+        contain the resolved configuration of each channel ("channels"), as returned
+        by skimconfig.resolve_channels(), and the hash of the config bundle it came from
+        ("config_hash"), which is saved in the output file as configHash. Missing or
+        None values are handled as in skim().
+
+    """
+    # Skim with uproot and NumPy instead, if specified (imported here, so the other engines don't need uproot)
+    if args.engine == "numpy":
+        from UWVV.VVAnalysis import vectorized  # noqa: PLC0415
+
+        vectorized.skim_analyses(args, analyses)
+        return
+
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    if args.metrics:
+        metrics.reset_max_rss()
+
+    # Enable implicit multithreading for the RDataFrame engine
+    if args.engine == "rdf" and args.num_threads != 1 and not ROOT.IsImplicitMTEnabled():
+        ROOT.EnableImplicitMT(args.num_threads)
+
+    # Index input files with uproot, if specified (imported here, so skims without an index don't need uproot)
+    if args.cluster_index:
+        from UWVV.VVAnalysis import indexes  # noqa: PLC0415
+
+    # Build cutstrings, aliases, and required branches for each channel of each analysis
+    analyses = {analysis: dict(config) for analysis, config in analyses.items()}
+    analysis_args = {}
+    for analysis, config in analyses.items():
+        if config.get("channels") is None:
+            config["channels"] = skimconfig.resolve_channels(
+                analysis, config["trigger"], config["cutinfo"], config["aliases"], config["triggers"]
+            )
+        if config.get("profile") is None:
+            config["profile"] = {}
+        analysis_args[analysis] = argparse.Namespace(
+            **{**vars(args), "analysis": analysis, "trigger": config["trigger"], "outfile": config["outfile"]}
+        )
+
+    # Index the branches of the cutstrings of every analysis, so one index serves them all
+    index_branches = {}
+    if args.cluster_index:
+        for config in analyses.values():
+            for channel, branches in indexes.get_index_branches(config["channels"]).items():
+                index_branches[channel] = index_branches.get(channel, set()) | branches
+
+    # Create output ROOT files
+    with contextlib.ExitStack() as stack:
+        outfiles = {}
+        for analysis, config in analyses.items():
+            compression = profiles.get_compression_settings(config["profile"])
+            outfiles[analysis] = stack.enter_context(ROOT.TFile.Open(config["outfile"], "RECREATE", "", compression))
+            if args.verbose:
+                print(f"Writing {analysis} to {config['outfile']}")
+
+        # Output trees are filled from each input file in turn, keyed by output directory
+        output_trees = {analysis: {} for analysis in analyses}
+        cutflows = {analysis: {} for analysis in analyses}
+        job_metrics = {analysis: {"stages": {}, "channels": {}} for analysis in analyses}
+
+        # Metrics shared by every analysis of the job, which are only counted once per job by summarize_metrics.py
+        shared_metrics = {"job": uuid.uuid4().hex, "analyses": list(analyses), "stages": {}, "files": {}}
+        shared_stages = shared_metrics["stages"]
+        for path in args.infiles:
+            file_wall, file_cpu = time.perf_counter(), time.process_time()
+
+            # Open each input file once and share the handle across all trees
+            with metrics.measure(shared_stages, "open"):
+                infile = ROOT.TFile.Open(path)
+            if args.verbose:
+                print(f"Reading {path}")
+
+            # Find the clusters of each channel that may pass the cuts of each analysis, if specified
+            cluster_ranges = dict.fromkeys(analyses)
+            if args.cluster_index:
+                with metrics.measure(shared_stages, "index"):
+                    file_index = indexes.get_index(path, index_branches, args.index_dir, args.verbose)
+                    for analysis, config in analyses.items():
+                        cluster_ranges[analysis] = {
+                            channel: indexes.get_cluster_ranges(file_index, channel, info["cutstring"], info["aliases"])
+                            for channel, info in config["channels"].items()
+                        }
+
+            # Read the shared metaInfo tree into memory once, rather than once per analysis
+            meta_tree = infile.Get("metaInfo/metaInfo")
+            if len(analyses) > 1:
+                with metrics.measure(shared_stages, "meta"):
+                    ROOT.gROOT.cd()
+                    meta_tree = meta_tree.CloneTree()
+                    ROOT.SetOwnership(meta_tree, True)
+
+            for analysis, config in analyses.items():
+                outfiles[analysis].cd()
+                skim_file(
+                    analysis_args[analysis],
+                    config,
+                    infile,
+                    output_trees[analysis],
+                    cutflows[analysis],
+                    job_metrics[analysis],
+                    cluster_ranges[analysis],
+                )
+
+                # Copy metaInfo tree
+                with metrics.measure(job_metrics[analysis]["stages"], "meta"):
+                    profiles.apply_profile(meta_tree, config["profile"])
+                    add_output_tree(output_trees[analysis], "metaInfo", meta_tree, copy=True)
+
+            file_metrics = {
+                "wall_time": time.perf_counter() - file_wall,
+                "cpu_time": time.process_time() - file_cpu,
+                "bytes_read": infile.GetBytesRead(),
+            }
+            shared_metrics["files"][path] = file_metrics
+            infile.Close()
+
+        shared_metrics["bytes_read"] = sum(info["bytes_read"] for info in shared_metrics["files"].values())
+
+        # Save output trees, one directory at a time
+        for analysis, outfile in outfiles.items():
+            with metrics.measure(job_metrics[analysis]["stages"], "write"):
+                for dirname, tree in output_trees[analysis].items():
+                    subdir = outfile.mkdir(dirname)
+                    subdir.cd()
+                    tree.Write()
 
-            # Apply cuts
-            skimmed_tree = tree.CopyTree(cutstring) if tree.GetEntries() > 0 else tree
+            # Record the config bundle used, if any
+            config_hash = analyses[analysis].get("config_hash")
+            if config_hash is not None:
+                outfile.WriteObject(ROOT.TNamed("configHash", config_hash), "configHash")
 
-            # Apply additional selector, if needed for analysis
-            selector = get_selector(args.analysis, channel)
-            if selector is not None:
-                skimmed_tree.Process(selector)
-                entry_list = selector.GetOutputList().FindObject("bestCandidates")
-                skimmed_tree.SetEntryList(entry_list)
-                # To create a tree with only the entries in the list above, copy
-                skimmed_tree = skimmed_tree.CopyTree("")
+            # Record the metrics of the job, if specified
+            if args.metrics:
+                analysis_metrics = job_metrics[analysis]
+                analysis_metrics.update(
+                    {
+                        "analysis": analysis,
+                        "wall_time": time.perf_counter() - start_wall,
+                        "cpu_time": time.process_time() - start_cpu,
+                        "max_rss": metrics.get_max_rss(),
+                        "bytes_written": outfile.GetBytesWritten(),
+                        "shared": shared_metrics,
+                    }
+                )
+                outfile.WriteObject(
+                    ROOT.TNamed(metrics.METRICS_NAME, json.dumps(analysis_metrics)), metrics.METRICS_NAME
+                )
 
-            # Print out information regarding skim
+    # Save cutflows next to output files
+    if args.cutflow:
+        for analysis, config in analyses.items():
+            cutflow_path = skimconfig.get_cutflow_path(config["outfile"])
+            with open(cutflow_path, "w") as outfile:
+                json.dump(cutflows[analysis], outfile, indent=2)
+                outfile.write("\n")
             if args.verbose:
-                print(f"{channel}:")
-                print(f"  {cutstring}")
-                for key, val in (aliases["Event"] | aliases["Channel"][channel]).items():
-                    print(f"  Set alias: {key} -> {val}")
-                print(f"  Entries pre-skim: {tree.GetEntries()}")
-                print(f"  Entries post-skim: {skimmed_tree.GetEntries()}")
-                if selector is None:
-                    print(f"  No selector available for {args.analysis}")
-                else:
-                    print("  Selector status:", selector.GetStatus())
-
-            # Save skimmed tree
-            subdir = outfile.mkdir(channel)
-            subdir.cd()
-            skimmed_tree.Write()
-
-            # Save gen tree, if specified
-            if args.save_gen:
-                tree = ROOT.TChain(f"{channel}Gen/ntuple")
-                for infile in args.infiles:
-                    tree.Add(infile)
-                subdir = outfile.mkdir(f"{channel}Gen")
-                subdir.cd()
-                tree_copy = tree.CopyTree("")
-                tree_copy.Write()
-
-        # Save metaInfo tree
-        tree = ROOT.TChain("metaInfo/metaInfo")
-        for infile in args.infiles:
-            tree.Add(infile)
-        subdir = outfile.mkdir("metaInfo")
-        subdir.cd()
-        tree_copy = tree.CopyTree("")
-        tree_copy.Write()
+                print(f"Cutflow written to {cutflow_path}")
+
+    # Save metrics next to output files
+    if args.metrics:
+        for analysis, config in analyses.items():
+            metrics_path = metrics.get_metrics_path(config["outfile"])
+            with open(metrics_path, "w") as outfile:
+                json.dump(job_metrics[analysis], outfile, indent=2)
+                outfile.write("\n")
+            if args.verbose:
+                print(f"Metrics written to {metrics_path}")
 
     if args.verbose:
-        print(f"Written to {args.outfile}")
+        for config in analyses.values():
+            print(f"Written to {config['outfile']}")
 
 
-def build_cutstring(cutinfo: dict, channel: str) -> str:
-    """Build a cutstring to apply to a tree to skim unwanted events.
+def skim_file(
+    args: argparse.Namespace,
+    config: dict,
+    infile: ROOT.TFile,
+    output_trees: dict,
+    cutflows: dict,
+    job_metrics: Optional[dict] = None,
+    cluster_ranges: Optional[dict] = None,
+):
+    """Skim the channels of a single analysis from an open input file.
 
     Parameters
     ----------
-    cutinfo : dict
-        A dict containing all the relevant cuts to be applied.
+    args : argparse.Namespace
+        A dict-like object containing information about the job, with the analysis,
+        trigger, and outfile of the given analysis. Check skim() for more information.
+    config : dict
+        The configuration of the analysis, as described in skim_analyses(), with the
+        channels already resolved.
+    infile : ROOT.TFile
+        The open input file.
+    output_trees : dict
+        A dict of output trees keyed by the name of their output directory. This will
+        be updated.
+    cutflows : dict
+        A dict containing the cutflow of each channel. This will be updated if the
+        cutflow is requested.
+    job_metrics : dict, optional
+        A dict containing the metrics of each stage ("stages"), as measured by
+        metrics.measure(), and the entries in and out of each channel ("channels").
+        This will be updated. If None, nothing is measured (default is None).
+    cluster_ranges : dict, optional
+        A dict mapping each channel to the entry ranges of its clusters that may pass
+        its cutstring, as returned by indexes.get_cluster_ranges(). If None, or None
+        for a channel, all entries of the channel are read (default is None).
+
+    """
+    stages = job_metrics["stages"] if job_metrics is not None else None
+    channel_config = config["channels"]
+    channels = list(channel_config)
+    cutstrings = {channel: channel_config[channel]["cutstring"] for channel in channels}
+    channel_aliases = {channel: channel_config[channel]["aliases"] for channel in channels}
+    required_branches = {channel: channel_config[channel]["required_branches"] for channel in channels}
+    branchinfo = config["branchinfo"]
+    profile = config["profile"]
+
+    # Initialize trees and set aliases
+    with metrics.measure(stages, "open"):
+        trees = {channel: infile.Get(f"{channel}/ntuple") for channel in channels}
+        for channel, tree in trees.items():
+            for key, val in channel_aliases[channel].items():
+                tree.SetAlias(key, val)
+            profiles.apply_profile(tree, profile)
+
+        # Only read and write the requested branches, if specified
+        if branchinfo:
+            for channel, tree in trees.items():
+                branch_names = [branch.GetName() for branch in tree.GetListOfBranches()]
+                active_branches = skimconfig.get_active_branches(branch_names, branchinfo, required_branches[channel])
+                tree.SetBranchStatus("*", 0)
+                for branch_name in active_branches:
+                    tree.SetBranchStatus(branch_name, 1)
+                if args.verbose:
+                    print(f"{channel}: keeping {len(active_branches)}/{len(branch_names)} branches")
+
+    # Book cuts (or the selector columns, if selecting columnar) for all channels at once,
+    # so the event loops run concurrently
+    entry_lists = {}
+    if args.engine == "rdf":
+        results = {}
+        for channel, tree in trees.items():
+            if tree.GetEntries() == 0:
+                continue
+            dataframe = filter_rdf(tree, cutstrings[channel], channel_aliases[channel], args.kernel_cache)
+            inputs = channel_config[channel]["selector_inputs"] if args.columnar else None
+            if inputs is not None:
+                results[channel] = book_columns(dataframe, tree, inputs)
+            else:
+                results[channel] = {"entry": dataframe.Take["ULong64_t"]("rdfentry_")}
+        with metrics.measure(stages, "cuts"):
+            ROOT.RDF.RunGraphs([result for channel in results.values() for result in channel.values()])
+
+        for channel, result in results.items():
+            if len(result) > 1:
+                with metrics.measure(stages, "selector"):
+                    entries = columnar.select_best_entries(args.analysis, columnar.get_columns(result))
+                    entry_lists[channel] = build_candidate_list(trees[channel], entries)
+            else:
+                with metrics.measure(stages, "cuts"):
+                    entry_lists[channel] = build_entry_list(trees[channel], result["entry"])
+
+    for channel, tree in trees.items():
+        # Determine cutflow, if specified
+        if args.cutflow:
+            with metrics.measure(stages, "cutflow"):
+                cutflow = get_cutflow(
+                    tree, skimconfig.build_cut_groups(config["cutinfo"], channel), config["triggers"][args.trigger]
+                )
+
+        # Only read the clusters that may pass the cuts, if indexed
+        cluster_list = None
+        ranges = cluster_ranges.get(channel) if cluster_ranges is not None else None
+        if ranges is not None and ranges != [(0, tree.GetEntries())]:
+            with metrics.measure(stages, "index"):
+                cluster_list = build_cluster_list(tree, ranges)
+            if args.verbose:
+                print(f"{channel}: reading {cluster_list.GetN()}/{tree.GetEntries()} entries of clusters that may pass")
+
+        # Skim tree for each channel
+        start = time.process_time()
+        skimmed_tree = skim_tree(
+            args,
+            tree,
+            channel,
+            cutstrings[channel],
+            channel_aliases[channel],
+            entry_lists.get(channel),
+            stages,
+            cluster_list,
+        )
+        with metrics.measure(stages, "copy"):
+            add_output_tree(output_trees, channel, skimmed_tree)
+        if job_metrics is not None:
+            metrics.merge_metrics(
+                job_metrics["channels"],
+                {channel: {"entries_in": tree.GetEntries(), "entries_out": skimmed_tree.GetEntries()}},
+            )
+
+        if args.cutflow:
+            cutflow["Skim"] = {"entries": skimmed_tree.GetEntries(), "cpu_time": time.process_time() - start}
+            skimconfig.merge_cutflows(cutflows, {channel: cutflow})
+
+        # Copy gen tree, if specified
+        if args.save_gen:
+            with metrics.measure(stages, "gen"):
+                gen_tree = infile.Get(f"{channel}Gen/ntuple")
+                profiles.apply_profile(gen_tree, profile)
+                add_output_tree(output_trees, f"{channel}Gen", gen_tree, copy=True)
+
+
+def skim_tree(
+    args: argparse.Namespace,
+    tree: ROOT.TTree,
+    channel: str,
+    cutstring: str,
+    aliases: dict,
+    entry_list: Optional[ROOT.TEntryList] = None,
+    stages: Optional[dict] = None,
+    cluster_list: Optional[ROOT.TEntryList] = None,
+) -> ROOT.TTree:
+    """Apply cuts and optional selector to the tree of a single channel.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        A dict-like object parsed from the command-line containing information about
+        the job. Check skim() for more information.
+    tree : ROOT.TTree
+        The input tree for the given channel, with aliases already set.
     channel : str
         The channel where the skimming is applied (e.g. eeee or eemm).
+    cutstring : str
+        The cutstring built from skimconfig.build_cutstring() and the trigger selection.
+    aliases : dict
+        A dict containing all the aliases set for the input tree.
+    entry_list : ROOT.TEntryList, optional
+        The entries passing the cutstring, if already determined. If selecting the
+        best candidates with columnar passes, this is instead the entries of the best
+        candidates (default is None).
+    stages : dict, optional
+        A dict containing the metrics of each stage (cuts, selector, and copy), as
+        measured by metrics.measure(). This will be updated. If None, nothing is
+        measured (default is None).
+    cluster_list : ROOT.TEntryList, optional
+        The entries of the clusters that may pass the cutstring, as returned by
+        build_cluster_list(). If given, the tree engine only reads these entries,
+        unless selecting with columnar passes. If None, all entries are read
+        (default is None).
 
     Returns
     -------
-    str
-        The cutstring built from the given cut information depending on
-        the channel provided.
+    ROOT.TTree
+        A new tree containing the skimmed entries.
 
     """
-    # Begin cutstring with event cuts and channel-dependent cuts
-    cuts = cutinfo["Event"] + cutinfo["Channel"][channel]
-
-    # Build counts of objects and object names
-    # i.e. eemm: {"e": 2, "m": 2} -> {"e": ["e1", "e2"], "m": ["m1", "m2"]}
-    object_counts = {}
-    for obj in channel:
-        if obj in object_counts:
-            object_counts[obj] += 1
+    # Get additional selector, if needed for analysis
+    selector = get_selector(args.analysis, channel)
+    use_columnar = args.columnar and selector is not None
+    single_pass = (args.single_pass or use_columnar) and selector is not None
+
+    # Apply cuts
+    if tree.GetEntries() == 0:
+        skimmed_tree = tree.CloneTree(0)
+    elif use_columnar:
+        # Select the best candidates passing the cuts directly from the columns of the input tree
+        if entry_list is None:
+            with metrics.measure(stages, "selector"):
+                entry_list = select_best_columnar(args, tree, channel, cutstring, aliases)
+        with metrics.measure(stages, "copy"):
+            skimmed_tree = copy_entries(tree, entry_list)
+    elif single_pass:
+        # Apply cuts within the selector, so only the best candidates are copied
+        if args.engine == "rdf":
+            if entry_list is None:
+                with metrics.measure(stages, "cuts"):
+                    entry_list = apply_cuts_rdf(tree, cutstring, aliases, args.kernel_cache)
+            tree.SetEntryList(entry_list)
+        else:
+            selector.GetInputList().Add(ROOT.TNamed("cut", cutstring))
+            if cluster_list is not None:
+                tree.SetEntryList(cluster_list)
+        with metrics.measure(stages, "selector"):
+            tree.Process(selector)
+        with metrics.measure(stages, "copy"):
+            skimmed_tree = copy_entries(tree, selector.GetOutputList().FindObject("bestCandidates"))
+    elif args.engine == "rdf":
+        if entry_list is None:
+            with metrics.measure(stages, "cuts"):
+                entry_list = apply_cuts_rdf(tree, cutstring, aliases, args.kernel_cache)
+        with metrics.measure(stages, "copy"):
+            skimmed_tree = copy_entries(tree, entry_list)
+    elif cluster_list is not None:
+        with metrics.measure(stages, "cuts"):
+            skimmed_tree = copy_entries(tree, cluster_list, cutstring)
+    else:
+        with metrics.measure(stages, "cuts"):
+            skimmed_tree = tree.CopyTree(cutstring)
+
+    # Apply additional selector to skimmed tree, if not already applied
+    if selector is not None and not single_pass and skimmed_tree.GetEntries() > 0:
+        with metrics.measure(stages, "selector"):
+            skimmed_tree.Process(selector)
+        with metrics.measure(stages, "copy"):
+            skimmed_tree = copy_entries(skimmed_tree, selector.GetOutputList().FindObject("bestCandidates"))
+
+    # Print out information regarding skim
+    if args.verbose:
+        print(f"{channel}:")
+        print(f"  {cutstring}")
+        for key, val in aliases.items():
+            print(f"  Set alias: {key} -> {val}")
+        print(f"  Entries pre-skim: {tree.GetEntries()}")
+        print(f"  Entries post-skim: {skimmed_tree.GetEntries()}")
+        if selector is None:
+            print(f"  No selector available for {args.analysis}")
+        elif use_columnar:
+            print("  Best candidates selected with columnar passes in the same pass as the cuts")
         else:
-            object_counts[obj] = 1
-
-    object_names = {}
-    for obj, count in object_counts.items():
-        object_names[obj] = [f"{obj}{i}" if count != 1 else obj for i in range(1, count + 1)]
-
-    # Add cuts on each object in the event (e.g. on e1, e2, m1, m2)
-    for obj, obj_cuts in cutinfo["Object"].items():
-        if obj in object_names:
-            cuts += [cut.format(name) for cut in obj_cuts for name in object_names[obj]]
-
-    # Add cuts on each object pair in the event (e.g. e1_e2, e1_m1, e1_m2, ...)
-    all_object_names = [name for names in object_names.values() for name in names]
-    for cut in cutinfo["ObjectPair"]:
-        for obj1, obj2 in itertools.combinations(all_object_names, 2):
-            cuts.append(cut.format(obj1, obj2))
-
-    # Add cuts on leading (+ subleading) pt leptons
-    if cutinfo["LeadingPt"] is not None:
-        if cutinfo["SubleadingPt"] is not None:
-            ptcuts = [
-                f"{obj1}Pt >= {cutinfo['LeadingPt']} && ("
-                + " || ".join(f"{obj2}Pt >= {cutinfo['SubleadingPt']}" for obj2 in all_object_names if obj2 != obj1)
-                + ")"
-                for obj1 in all_object_names
-            ]
-            cuts.append(" || ".join(f"({cut})" for cut in ptcuts))
+            print("  Selector status:", selector.GetStatus())
+            if single_pass:
+                print("  Cuts applied in the same pass as the selector")
+
+    return skimmed_tree
+
+
+def select_best_columnar(
+    args: argparse.Namespace, tree: ROOT.TTree, channel: str, cutstring: str, aliases: dict
+) -> ROOT.TEntryList:
+    """Select the best candidates passing a cutstring with columnar passes.
+
+    The columns read by the selector are read in bulk for the entries passing the
+    cutstring, and the best candidate of each event is selected with vectorized
+    passes over these columns. This gives the same entries as the C++ selector.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        A dict-like object parsed from the command-line containing information about
+        the job. Check skim() for more information.
+    tree : ROOT.TTree
+        The input tree for the given channel.
+    channel : str
+        The channel where the skimming is applied (e.g. eeee or eemm).
+    cutstring : str
+        The cutstring built from skimconfig.build_cutstring() and the trigger selection.
+    aliases : dict
+        A dict containing all the aliases set for the input tree.
+
+    Returns
+    -------
+    ROOT.TEntryList
+        The entry list of the best candidates.
+
+    """
+    dataframe = filter_rdf(tree, cutstring, aliases, args.kernel_cache)
+    results = book_columns(dataframe, tree, skimconfig.get_selector_inputs(args.analysis, channel))
+    entries = columnar.select_best_entries(args.analysis, columnar.get_columns(results))
+    return build_candidate_list(tree, entries)
+
+
+def book_columns(dataframe: ROOT.RDF.RNode, tree: ROOT.TTree, inputs: dict) -> dict:
+    """Book the columns read by a best-candidate selector on a dataframe, for columnar.get_columns().
+
+    Parameters
+    ----------
+    dataframe : ROOT.RDF.RNode
+        The dataframe (e.g. with the cuts already applied) to read the columns from.
+    tree : ROOT.TTree
+        The tree (or chain) of the dataframe, used to determine branch types.
+    inputs : dict
+        A dict mapping each selector input to its branch, as returned by
+        skimconfig.get_selector_inputs().
+
+    Returns
+    -------
+    dict
+        A dict mapping each selector input, "entry" (the entry numbers), and "slot"
+        (the slot of the thread that processed each entry) to the lazy result
+        containing its values.
+
+    """
+    results = {"entry": dataframe.Take["ULong64_t"]("rdfentry_"), "slot": dataframe.Take["unsigned int"]("rdfslot_")}
+    for name, branch in inputs.items():
+        column_type = tree.GetLeaf(branch).GetTypeName()
+        if column_type == "Bool_t":
+            # A std::vector<bool> cannot be viewed as an array, so take booleans as bytes
+            dataframe = dataframe.Define(f"columnar_{name}", f"static_cast<UChar_t>({branch})")
+            results[name] = dataframe.Take["UChar_t"](f"columnar_{name}")
         else:
-            cuts.append(" || ".join(f"{obj1}Pt >= {cutinfo['LeadingPt']}"))
+            results[name] = dataframe.Take[column_type](branch)
+    return results
+
+
+def build_candidate_list(tree: ROOT.TTree, entries: np.ndarray) -> ROOT.TEntryList:
+    """Build the entry list of the best candidates, matching the output of the selectors.
+
+    Parameters
+    ----------
+    tree : ROOT.TTree
+        The tree (or chain) the candidates were selected from.
+    entries : numpy.ndarray
+        The entry numbers of the best candidates.
+
+    Returns
+    -------
+    ROOT.TEntryList
+        The entry list of the best candidates.
+
+    """
+    entry_list = ROOT.TEntryList(
+        "bestCandidates", "Entry list of disambiguated combinatoric candidates after leptons pass tight ID"
+    )
+    for entry in entries:
+        entry_list.Enter(int(entry), tree)
+    entry_list.OptimizeStorage()
+    return entry_list
+
+
+def add_output_tree(output_trees: dict, name: str, tree: ROOT.TTree, copy: bool = False):
+    """Add the entries of a tree to the output tree with the given name.
+
+    The first tree added for a given name becomes the output tree, and the
+    entries of any trees added afterwards (i.e. from other input files) are
+    appended to it.
+
+    Parameters
+    ----------
+    output_trees : dict
+        A dict of output trees keyed by the name of their output directory.
+        This will be updated.
+    name : str
+        The name of the output directory (e.g. eeee or metaInfo).
+    tree : ROOT.TTree
+        The tree to add.
+    copy : bool, optional
+        Whether the tree belongs to an input file, in which case it will be
+        copied before becoming the output tree (default is False).
+
+    """
+    if name in output_trees:
+        output_trees[name].CopyEntries(tree, -1, "", True)
+    elif copy:
+        output_trees[name] = tree.CopyTree("")
+    else:
+        output_trees[name] = tree
+
+
+def get_cutflow(tree: ROOT.TTree, cut_groups: dict, trigger: str) -> dict:
+    """Determine the number of entries passing each type of cut and the CPU time taken.
+
+    Each type of cut is applied in turn to the entries passing all previous
+    types of cuts, followed by the trigger selection.
+
+    Parameters
+    ----------
+    tree : ROOT.TTree
+        The tree to apply the cuts to, with aliases already set.
+    cut_groups : dict
+        A dict containing the cuts of each type, built by skimconfig.build_cut_groups().
+    trigger : str
+        The trigger selection to apply.
+
+    Returns
+    -------
+    dict
+        A dict mapping each step of the cutflow to the number of entries ("entries")
+        passing it and the CPU time in seconds ("cpu_time") spent applying it.
+
+    """
+    cutflow = {"Total": {"entries": tree.GetEntries(), "cpu_time": 0.0}}
+    steps = {name: " && ".join(f"({cut})" for cut in cuts) for name, cuts in cut_groups.items() if cuts}
+    steps["Trigger"] = trigger
+
+    # Keep entry lists out of the output file
+    with ROOT.TDirectory.TContext(ROOT.gROOT):
+        entry_list = ROOT.nullptr
+        for name, cut in steps.items():
+            tree.SetEntryList(entry_list)
+            start = time.process_time()
+            tree.Draw(f">>cutflow_{name}", cut, "entrylist")
+            cpu_time = time.process_time() - start
+            entry_list = ROOT.gROOT.Get(f"cutflow_{name}")
+            cutflow[name] = {"entries": entry_list.GetN(), "cpu_time": cpu_time}
+        tree.SetEntryList(ROOT.nullptr)
+    return cutflow
+
+
+def copy_entries(tree: ROOT.TTree, entry_list: ROOT.TEntryList, selection: str = "") -> ROOT.TTree:
+    """Copy only the entries of a tree that are in the given entry list.
+
+    Parameters
+    ----------
+    tree : ROOT.TTree
+        The tree (or chain) to copy entries from.
+    entry_list : ROOT.TEntryList
+        The entry list with the entries to copy.
+    selection : str, optional
+        A cutstring the copied entries must also pass. Only the entries in the list
+        are read to evaluate it (default is "", which copies every entry in the list).
+
+    Returns
+    -------
+    ROOT.TTree
+        A new tree containing only the entries in the list.
+
+    """
+    tree.SetEntryList(entry_list)
+    tree_copy = tree.CopyTree(selection)
+    tree.SetEntryList(ROOT.nullptr)
+    return tree_copy
+
+
+def build_cluster_list(tree: ROOT.TTree, ranges: list) -> ROOT.TEntryList:
+    """Build the entry list of the clusters of a tree that may pass its cutstring.
+
+    Parameters
+    ----------
+    tree : ROOT.TTree
+        The tree the clusters belong to.
+    ranges : list of tuple of (int, int)
+        The (start, stop) entries of the clusters, as returned by
+        indexes.get_cluster_ranges().
+
+    Returns
+    -------
+    ROOT.TEntryList
+        The entry list of every entry in the clusters.
+
+    """
+    entry_list = ROOT.TEntryList("clusters", "Entries of clusters that may pass the cuts")
+    for start, stop in ranges:
+        entry_list.EnterRange(start, stop, tree)
+    entry_list.OptimizeStorage()
+    return entry_list
+
+
+def to_cpp_expression(expression: str) -> str:
+    """Translate a TTreeFormula expression into an equivalent C++ expression.
+
+    Cuts, aliases, and triggers in the JSON files are written for TTreeFormula,
+    which maps functions like abs() onto TMath. RDataFrame instead compiles
+    expressions as C++, so these functions need to be mapped explicitly.
+
+    Parameters
+    ----------
+    expression : str
+        The TTreeFormula expression (e.g. 'abs(Z1Mass-91.1876) < 10').
+
+    Returns
+    -------
+    str
+        The expression that can be passed to RDataFrame Define/Filter nodes.
+
+    """
+    return re.sub(r"(?<![\w:.])abs\(", "std::abs(", expression)
+
+
+def filter_rdf(tree: ROOT.TTree, cutstring: str, aliases: dict, kernel_cache: Optional[str] = None) -> ROOT.RDF.RNode:
+    """Apply a cutstring to a tree using RDataFrame.
+
+    The aliases are converted to Define nodes and the cutstring to a Filter
+    node, so the cuts are compiled once and evaluated in parallel if implicit
+    multithreading is enabled.
+
+    If a kernel cache is given, the cutstring and aliases are instead compiled
+    into a single function that is stored in the cache, so later jobs can load
+    it without compiling the expression again.
+
+    Parameters
+    ----------
+    tree : ROOT.TTree
+        The tree (or chain) to apply the cuts to.
+    cutstring : str
+        The cutstring built from skimconfig.build_cutstring() and the trigger selection.
+    aliases : dict
+        A dict containing all the aliases needed by the cutstring.
+    kernel_cache : str, optional
+        The directory storing compiled cut kernels (default is None).
+
+    Returns
+    -------
+    ROOT.RDF.RNode
+        The dataframe of the entries passing the cutstring.
+
+    """
+    dataframe = ROOT.RDataFrame(tree)
+
+    # Use compiled kernel, if available (otherwise, the expressions are compiled just-in-time)
+    kernel = get_cut_kernel(tree, cutstring, aliases, kernel_cache) if kernel_cache is not None else None
+    if kernel is not None:
+        name, columns = kernel
+        return dataframe.Filter(f"{name}({', '.join(columns)})")
+
+    for key, val in aliases.items():
+        dataframe = dataframe.Define(key, to_cpp_expression(val))
+    return dataframe.Filter(to_cpp_expression(cutstring))
+
+
+def book_cuts_rdf(
+    tree: ROOT.TTree, cutstring: str, aliases: dict, kernel_cache: Optional[str] = None
+) -> ROOT.RDF.RResultPtr:
+    """Book the entries of a tree passing a cutstring using RDataFrame.
+
+    The cuts are applied with filter_rdf(). The event loop is not run until the
+    result is accessed (or by ROOT.RDF.RunGraphs() along with other booked results).
+
+    Parameters
+    ----------
+    tree : ROOT.TTree
+        The tree (or chain) to apply the cuts to.
+    cutstring : str
+        The cutstring built from skimconfig.build_cutstring() and the trigger selection.
+    aliases : dict
+        A dict containing all the aliases needed by the cutstring.
+    kernel_cache : str, optional
+        The directory storing compiled cut kernels (default is None).
+
+    Returns
+    -------
+    ROOT.RDF.RResultPtr
+        The lazy result containing the entry numbers passing the cutstring.
+
+    """
+    return filter_rdf(tree, cutstring, aliases, kernel_cache).Take["ULong64_t"]("rdfentry_")
+
+
+def get_cut_kernel(tree: ROOT.TTree, cutstring: str, aliases: dict, kernel_cache: str) -> Optional[tuple]:
+    """Get the compiled kernel evaluating a cutstring from the kernel cache.
+
+    Parameters
+    ----------
+    tree : ROOT.TTree
+        The tree (or chain) to apply the cuts to, used to determine branch types.
+    cutstring : str
+        The cutstring built from skimconfig.build_cutstring() and the trigger selection.
+    aliases : dict
+        A dict containing all the aliases needed by the cutstring.
+    kernel_cache : str
+        The directory storing compiled cut kernels.
+
+    Returns
+    -------
+    tuple of (str, list of str) or None
+        The name of the compiled function and the branches to pass as arguments,
+        or None if the kernel cannot be compiled or loaded.
+
+    """
+    columns = sorted(name for name in skimconfig.get_expression_branches(cutstring, aliases) if tree.GetBranch(name))
+    column_types = {column: tree.GetLeaf(column).GetTypeName() for column in columns}
+    used_aliases = {key: to_cpp_expression(val) for key, val in kernels.sort_aliases(cutstring, aliases).items()}
+    source = kernels.build_kernel_source(to_cpp_expression(cutstring), used_aliases, column_types)
+
+    name = kernels.load_kernel(source, kernel_cache)
+    if name is None:
+        return None
+    return name, columns
+
+
+def build_entry_list(tree: ROOT.TTree, result: ROOT.RDF.RResultPtr) -> ROOT.TEntryList:
+    """Build an entry list from the result of book_cuts_rdf().
+
+    Parameters
+    ----------
+    tree : ROOT.TTree
+        The tree (or chain) the cuts were applied to.
+    result : ROOT.RDF.RResultPtr
+        The result containing the entry numbers passing the cutstring.
+
+    Returns
+    -------
+    ROOT.TEntryList
+        The entry list of all entries passing the cutstring.
+
+    """
+    # Entries are not processed in order with multiple threads, so sort before filling
+    # (This keeps the output matching TTree::CopyTree())
+    entry_list = ROOT.TEntryList("passingCandidates", "Entry list of candidates passing the cutstring")
+    for entry in sorted(result.GetValue()):
+        entry_list.Enter(entry, tree)
+    return entry_list
+
+
+def apply_cuts_rdf(
+    tree: ROOT.TTree, cutstring: str, aliases: dict, kernel_cache: Optional[str] = None
+) -> ROOT.TEntryList:
+    """Find the entries of a tree passing a cutstring using RDataFrame.
+
+    Parameters
+    ----------
+    tree : ROOT.TTree
+        The tree (or chain) to apply the cuts to.
+    cutstring : str
+        The cutstring built from skimconfig.build_cutstring() and the trigger selection.
+    aliases : dict
+        A dict containing all the aliases needed by the cutstring.
+    kernel_cache : str, optional
+        The directory storing compiled cut kernels (default is None).
+
+    Returns
+    -------
+    ROOT.TEntryList
+        The entry list of all entries passing the cutstring.
 
-    return " && ".join(f"({cut})" for cut in cuts)
+    """
+    return build_entry_list(tree, book_cuts_rdf(tree, cutstring, aliases, kernel_cache))
 
 
 def get_selector(analysis: str, channel: str) -> Optional[ROOT.TSelector]:
@@ -174,89 +919,111 @@ def get_selector(analysis: str, channel: str) -> Optional[ROOT.TSelector]:
         an analysis, returns None.
 
     """
-    selector = None
-
-    # Build counts of objects and the list of object names
-    # i.e. {"e": 2, "m": 2} -> ["e1", "e2", "m1", "m2"]
-    # (These are built slightly differently than in build_cutstring())
-    object_counts = {}
-    for obj in channel:
-        if obj in object_counts:
-            object_counts[obj] += 1
-        else:
-            object_counts[obj] = 1
-
-    object_names = []
-    for obj, count in object_counts.items():
-        object_names += [f"{obj}{i}" if count != 1 else obj for i in range(1, count + 1)]
+    inputs = skimconfig.get_selector_inputs(analysis, channel)
+    if inputs is None:
+        return None
 
     # Build selector depending on analysis
     if analysis == "ZZ4l":
-        # For a given event, choose the best ZZ candidate
         selector = ROOT.BestZZCandSelector()
-        inputs = ROOT.TList()
-        inputs.Add(ROOT.TNamed("run", "run"))
-        inputs.Add(ROOT.TNamed("evt", "evt"))
-        inputs.Add(ROOT.TNamed("Z1Mass", f"{object_names[0]}_{object_names[1]}_Mass"))
-        inputs.Add(ROOT.TNamed("Z2Mass", f"{object_names[2]}_{object_names[3]}_Mass"))
-        inputs.Add(ROOT.TNamed("l1Pt", f"{object_names[0]}Pt"))
-        inputs.Add(ROOT.TNamed("l2Pt", f"{object_names[1]}Pt"))
-        inputs.Add(ROOT.TNamed("l3Pt", f"{object_names[2]}Pt"))
-        inputs.Add(ROOT.TNamed("l4Pt", f"{object_names[3]}Pt"))
-        inputs.Add(ROOT.TNamed("l1Tight", f"{object_names[0]}ZZTightID"))
-        inputs.Add(ROOT.TNamed("l2Tight", f"{object_names[1]}ZZTightID"))
-        inputs.Add(ROOT.TNamed("l3Tight", f"{object_names[2]}ZZTightID"))
-        inputs.Add(ROOT.TNamed("l4Tight", f"{object_names[3]}ZZTightID"))
-        inputs.Add(ROOT.TNamed("l1Iso", f"{object_names[0]}ZZIsoPass"))
-        inputs.Add(ROOT.TNamed("l2Iso", f"{object_names[1]}ZZIsoPass"))
-        inputs.Add(ROOT.TNamed("l3Iso", f"{object_names[2]}ZZIsoPass"))
-        inputs.Add(ROOT.TNamed("l4Iso", f"{object_names[3]}ZZIsoPass"))
-        selector.SetInputList(inputs)
-    elif analysis == "ZplusL":
-        # For a given event, choose the best Z candidate
-        selector = ROOT.BestZplusLCandSelector()
-        inputs = ROOT.TList()
-        inputs.Add(ROOT.TNamed("run", "run"))
-        inputs.Add(ROOT.TNamed("evt", "evt"))
-        for obj, count in object_counts.items():
-            if count >= 2:
-                inputs.Add(ROOT.TNamed("Z1Mass", f"{obj}1_{obj}2_Mass"))
-        selector.SetInputList(inputs)
     else:
-        pass  # No selector is built, will return None
+        selector = ROOT.BestZplusLCandSelector()
 
+    input_list = ROOT.TList()
+    for name, branch in inputs.items():
+        input_list.Add(ROOT.TNamed(name, branch))
+    selector.SetInputList(input_list)
     return selector
 
 
-def get_trigger(triggers: list, sample: str) -> str:
-    """Return appropriate trigger to use for given sample.
+def load_selectors(analysis: str):
+    """Build the selector of each channel of an analysis once, which loads the selector dictionaries.
+
+    Calling this once per process (e.g. in a worker process) prepares it for skimming,
+    so the first skim does not pay for loading the dictionaries.
+
+    Parameters
+    ----------
+    analysis : str
+        The analysis to load the selectors of (e.g. ZZ4l).
+
+    """
+    for channel in helpers.get_channels(analysis):
+        get_selector(analysis, channel)
+
+
+def pack_jobs(
+    paths: list,
+    files_per_job: int = 1,
+    max_size: Optional[int] = None,
+    max_entries: Optional[int] = None,
+    sizes: Optional[dict] = None,
+    entries: Optional[dict] = None,
+) -> list:
+    """Pack input files into jobs with a target number of files, bytes, or entries per job.
 
-    This function searches the sample name for '_TRIGGER_' for
-    each trigger in the provided list. Data samples follow this
-    convention so that the triggers can be determined on-the-fly.
-    If no match is found, 'MonteCarlo' is chosen.
+    Consecutive files are added to a job until the next file would exceed the target,
+    so small files share a job while a file larger than the target runs on its own.
 
     Parameters
     ----------
-    triggers : list of str
-        A list of trigger names to check.
-    sample: str
-        The name of a sample to check.
+    paths : list of str
+        The input files, in the order they should be processed.
+    files_per_job : int, optional
+        The number of files per job, if neither max_size nor max_entries is given
+        (default is 1).
+    max_size : int, optional
+        The target number of bytes per job (default is None).
+    max_entries : int, optional
+        The target number of entries per job, taking precedence over max_size
+        (default is None).
+    sizes : dict, optional
+        A dict mapping paths to their sizes in bytes. Files not in the dict are
+        checked on disk (default is None).
+    entries : dict, optional
+        A dict mapping paths to their number of entries, needed for max_entries
+        (default is None).
 
     Returns
     -------
-    str
-        The trigger name to apply.
+    list
+        A list of jobs, each being a list of file paths.
 
     """
-    # Determine trigger (i.e. Primary Dataset for data) for given sample
-    for trigger in triggers:
-        if f"_{trigger}_" in sample:
-            return trigger
-    return "MonteCarlo"
+    if max_entries is not None:
+        return mergetools.group_files(paths, max_entries, entries)
+    if max_size is not None:
+        return mergetools.group_files(paths, max_size, sizes)
+    return [paths[i : i + files_per_job] for i in range(0, len(paths), files_per_job)]
+
+
+def get_job_buckets(jobs: list) -> dict:
+    """Group packed jobs by their number of files.
 
+    Each farmoutAnalysisJobs call uses a fixed number of input files per job, so jobs
+    with the same number of files are submitted together.
 
-def build_farmout_command(paths: list) -> str:
+    Parameters
+    ----------
+    jobs : list
+        A list of jobs, each being a list of file paths, as returned by pack_jobs().
+
+    Returns
+    -------
+    dict
+        A dict mapping each number of files per job to the input files of those jobs,
+        in order.
+
+    """
+    buckets = {}
+    for job in jobs:
+        buckets.setdefault(len(job), []).extend(job)
+    return dict(sorted(buckets.items()))
+
+
+def build_farmout_command(
+    paths: list, extra_inputs: Optional[list] = None, files_per_job: Optional[list] = None
+) -> str:
     """Build script to execute skimming jobs through HTCondor.
 
     Parameters
@@ -264,6 +1031,14 @@ def build_farmout_command(paths: list) -> str:
     paths: list of str
         List of file paths (may be globbable) to make the input
         file list.
+    extra_inputs: list of str, optional
+        List of additional files to ship with each job (default is None).
+    files_per_job: list of int, optional
+        The numbers of input files per job of packed jobs, with the input files of
+        the jobs with N files listed in inputs_<N>.txt by the caller. One
+        farmoutAnalysisJobs call is made for each. If None, one job is made per
+        file listed in inputs.txt, which is created from the paths if it does not
+        exist (default is None).
 
     Returns
     -------
@@ -276,24 +1051,33 @@ def build_farmout_command(paths: list) -> str:
     command += "set -e\n"
 
     # Create input file list
-    command += "# Create input file list\n"
-    command += "if [ ! -f ${{job_dir}}/inputs.txt ]; then\n"
-    command += "  touch ${{job_dir}}/inputs.txt\n"
-    for path in paths:
-        command += f"  hdfs dfs -ls {path.replace('/hdfs', '')}"
-        command += " | awk '{{print $8}}' >> ${{job_dir}}/inputs.txt\n"
-    command += "fi\n\n"
-
-    # Farmout command
+    if files_per_job is None:
+        command += "# Create input file list\n"
+        command += "if [ ! -f ${{job_dir}}/inputs.txt ]; then\n"
+        command += "  touch ${{job_dir}}/inputs.txt\n"
+        for path in paths:
+            command += f"  hdfs dfs -ls {path.replace('/hdfs', '')}"
+            command += " | awk '{{print $8}}' >> ${{job_dir}}/inputs.txt\n"
+        command += "fi\n\n"
+
+    # Farmout command for each number of files per job
     command += "# Farmout command\n"
-    farmout_command = []
-    farmout_command.append("farmoutAnalysisJobs --fwklite --input-basenames-not-unique --assume-input-files-exist")
-    farmout_command.append("--opsys {opsys}")
-    farmout_command.append("--submit-dir=${{job_dir}}/submit")
-    farmout_command.append("--output-dir={output_dir}/{job_name}")
-    farmout_command.append("--input-file-list=${{job_dir}}/inputs.txt")
-    farmout_command.append("--input-files-per-job=1")
-    farmout_command.append("--input-dir=root://cmsxrootd.hep.wisc.edu/")
-    farmout_command.append("{job_name} $CMSSW_BASE ${{job_dir}}/skim.sh")
-
-    return command + " \\\n\t\t".join(farmout_command) + "\n"
+    submissions = [("", "inputs.txt", 1)]
+    if files_per_job is not None:
+        submissions = [(f"_{num_files}", f"inputs_{num_files}.txt", num_files) for num_files in files_per_job]
+    farmout_commands = []
+    for suffix, input_list, num_files in submissions:
+        farmout_command = []
+        farmout_command.append("farmoutAnalysisJobs --fwklite --input-basenames-not-unique --assume-input-files-exist")
+        farmout_command.append("--opsys {opsys}")
+        farmout_command.append(f"--submit-dir=${{{{job_dir}}}}/submit{suffix}")
+        farmout_command.append("--output-dir={output_dir}/{job_name}")
+        farmout_command.append(f"--input-file-list=${{{{job_dir}}}}/{input_list}")
+        farmout_command.append(f"--input-files-per-job={num_files}")
+        farmout_command.append("--input-dir=root://cmsxrootd.hep.wisc.edu/")
+        if extra_inputs:
+            farmout_command.append(f"--extra-inputs={','.join(extra_inputs)}")
+        farmout_command.append(f"{{job_name}}{suffix} $CMSSW_BASE ${{{{job_dir}}}}/skim.sh")
+        farmout_commands.append(" \\\n\t\t".join(farmout_command) + "\n")
+
+    return command + "".join(farmout_commands)
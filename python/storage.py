@@ -0,0 +1,155 @@
+import concurrent.futures
+import os
+import subprocess
+from typing import Callable, Optional, Union
+
+NUM_WORKERS = 4
+BATCH_SIZE = 100  # directories per listing call
+LOCAL_ROOT = "/hdfs"
+
+# Listings of each backend, kept for the life of the process
+_listings = {}
+
+
+def get_storage_path(path: str) -> Optional[str]:
+    """Get the /store path of a remote input file (e.g. root://cmsxrootd.hep.wisc.edu//store/...).
+
+    Returns None for local files, which are checked directly on disk.
+    """
+    if not path.startswith("root:") or "/store" not in path:
+        return None
+    return path[path.find("/store") :]
+
+
+def list_hdfs(directories: list) -> dict:
+    """List the files of several /store directories with a single hdfs call.
+
+    Parameters
+    ----------
+    directories : list of str
+        The /store directories to list.
+
+    Returns
+    -------
+    dict
+        A dict mapping each directory that exists to the set of names of its files.
+
+    """
+    result = subprocess.run(
+        ["hdfs", "dfs", "-ls", *directories], check=False, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+
+    # Missing directories only make the call fail after the others are listed, so parse the output regardless
+    listings = {}
+    for line in result.stdout.splitlines():
+        fields = line.split()
+        if len(fields) < 8 or not fields[-1].startswith("/"):
+            continue
+        directory, name = os.path.split(fields[-1])
+        listings.setdefault(directory, set()).add(name)
+    return listings
+
+
+def list_local(directories: list, root: str = LOCAL_ROOT) -> dict:
+    """List the files of several /store directories through a local mount.
+
+    Parameters
+    ----------
+    directories : list of str
+        The /store directories to list.
+    root : str, optional
+        The directory the /store directories are mounted under (default is LOCAL_ROOT).
+
+    Returns
+    -------
+    dict
+        A dict mapping each directory that exists to the set of names of its files.
+
+    """
+    listings = {}
+    for directory in directories:
+        local_dir = os.path.join(root, directory.lstrip("/"))
+        if os.path.isdir(local_dir):
+            listings[directory] = set(os.listdir(local_dir))
+    return listings
+
+
+BACKENDS = {"hdfs": list_hdfs, "local": list_local}
+
+
+def list_directories(directories: list, backend: Union[str, Callable] = "hdfs", num_workers: int = NUM_WORKERS) -> dict:
+    """List the files of /store directories, reusing earlier listings of the same backend.
+
+    Directories are listed in batches of BATCH_SIZE, with batches run concurrently.
+
+    Parameters
+    ----------
+    directories : list of str
+        The /store directories to list.
+    backend : str or callable, optional
+        The name of a backend in BACKENDS, or a function that takes a list of
+        directories and returns a dict mapping each existing directory to the set of
+        names of its files (default is "hdfs").
+    num_workers : int, optional
+        The maximum number of concurrent listing calls (default is NUM_WORKERS).
+
+    Returns
+    -------
+    dict
+        A dict mapping each directory to the set of names of its files, which is empty
+        for directories that do not exist.
+
+    """
+    list_function = BACKENDS[backend] if isinstance(backend, str) else backend
+    cache = _listings.setdefault(list_function, {})
+
+    missing = sorted(set(directories) - set(cache))
+    batches = [missing[i : i + BATCH_SIZE] for i in range(0, len(missing), BATCH_SIZE)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
+        for batch, listings in zip(batches, executor.map(list_function, batches)):
+            for directory in batch:
+                cache[directory] = listings.get(directory, set())
+    return {directory: cache[directory] for directory in directories}
+
+
+def find_missing_files(paths: list, backend: Union[str, Callable] = "hdfs", num_workers: int = NUM_WORKERS) -> list:
+    """Find the input files that do not exist.
+
+    Remote files (root://...) are checked by listing their directories with the given
+    backend, so each directory is listed once rather than each file. Local files
+    (optionally prefixed with file:) are checked on disk.
+
+    Parameters
+    ----------
+    paths : list of str
+        The input files to check.
+    backend : str or callable, optional
+        The backend used to list remote directories, as in list_directories()
+        (default is "hdfs").
+    num_workers : int, optional
+        The maximum number of concurrent listing calls (default is NUM_WORKERS).
+
+    Returns
+    -------
+    list of str
+        The input files that do not exist, in the given order.
+
+    """
+    storage_paths = {path: get_storage_path(path) for path in paths}
+    directories = {os.path.dirname(path) for path in storage_paths.values() if path is not None}
+    listings = list_directories(sorted(directories), backend, num_workers) if directories else {}
+
+    missing = []
+    for path, storage_path in storage_paths.items():
+        if storage_path is None:
+            exists = os.path.isfile(path.replace("file:", ""))
+        else:
+            exists = os.path.basename(storage_path) in listings[os.path.dirname(storage_path)]
+        if not exists:
+            missing.append(path)
+    return missing
+
+
+def clear_cache():
+    """Forget the listings of every backend, e.g. after files were written."""
+    _listings.clear()
@@ -0,0 +1,370 @@
+import json
+import os
+import re
+
+import numpy as np
+from UWVV.VVAnalysis import helpers, skimconfig
+
+Z_MASS = 91.1876
+
+# Names used by expressions that are not branches
+NON_BRANCHES = {"abs", "fabs", "max", "min", "sqrt", "std", "true", "false"}
+
+# Branches filled once per event rather than once per candidate
+EVENT_BRANCHES = {"run", "lumi", "evt", "type1_pfMETEt", "genWeight"}
+
+
+def get_object_names(channel: str) -> list:
+    """List the object names of a channel, in the same way as build_cutstring() (e.g. eem -> e1, e2, m)."""
+    object_counts = {obj: channel.count(obj) for obj in dict.fromkeys(channel)}
+    return [f"{obj}{i}" if count != 1 else obj for obj, count in object_counts.items() for i in range(1, count + 1)]
+
+
+def get_branch_names(analysis: str, cutinfo: dict, aliases: dict, triggers: dict) -> dict:
+    """Determine the branches to generate for each channel of an analysis.
+
+    Parameters
+    ----------
+    analysis : str
+        The analysis to generate ntuples for (e.g. ZZ4l).
+    cutinfo : dict
+        A dict containing all the relevant cuts to be applied.
+    aliases : dict
+        A dict containing all the aliases to be set for the input trees.
+    triggers : dict
+        A dict containing the trigger selections for MonteCarlo and each data stream.
+
+    Returns
+    -------
+    dict
+        A dict mapping each channel to the sorted list of branches used by its cuts,
+        aliases, and triggers, as well as the branches read by the selectors.
+
+    """
+    branch_names = {}
+    for trigger in triggers:
+        for channel, config in skimconfig.resolve_channels(analysis, trigger, cutinfo, aliases, triggers).items():
+            branch_names.setdefault(channel, set()).update(config["required_branches"])
+
+    # Add event branches and the kinematics of each object
+    result = {}
+    for channel, names in branch_names.items():
+        object_branches = {
+            f"{name}{var}" for name in get_object_names(channel) for var in ("Pt", "Eta", "Phi", "MtToMET")
+        }
+        result[channel] = sorted((names | EVENT_BRANCHES | object_branches) - NON_BRANCHES)
+    return result
+
+
+def get_branch_type(name: str) -> str:
+    """Determine the type of a UWVV branch from its name (e.g. Bool_t for ID flags)."""
+    if name in ("run", "lumi") or re.match(r"n[A-Z]", name):
+        return "UInt_t"
+    if name == "evt":
+        return "ULong64_t"
+    if name.endswith(("Pass", "ID", "_SS")):
+        return "Bool_t"
+    return "Float_t"
+
+
+def generate_branch(
+    rng: np.random.Generator, name: str, channel: str, size: int, composition: np.ndarray
+) -> np.ndarray:
+    """Generate realistic values of a UWVV branch, based on its name.
+
+    Parameters
+    ----------
+    rng : numpy.random.Generator
+        The random number generator to use.
+    name : str
+        The name of the branch.
+    channel : str
+        The channel of the tree (e.g. eemm).
+    size : int
+        The number of values to generate.
+    composition : numpy.ndarray
+        Whether the lepton counts of each value match the channel, used by the
+        lepton count branches (e.g. nZZLooseElec).
+
+    Returns
+    -------
+    numpy.ndarray
+        The generated values.
+
+    """
+    if name.endswith("Pass"):
+        values = rng.random(size) < (0.4 if name.startswith("HLT_") else 0.9)
+    elif name.endswith("TightID"):
+        values = rng.random(size) < 0.85
+    elif name.endswith("ID"):
+        values = rng.random(size) < 0.97
+    elif name.endswith("_SS"):
+        values = rng.random(size) < 0.1
+    elif name.endswith(("Mass", "MassNoFSR")) and name != "Mass":
+        # Most pairs come from an on-shell Z, with a continuum of off-shell pairs
+        on_shell = rng.random(size) < 0.7
+        values = np.where(on_shell, rng.normal(Z_MASS, 3, size), rng.uniform(4, 150, size))
+    elif name == "Mass":
+        values = 2 * Z_MASS + rng.exponential(80, size) - rng.exponential(40, size)
+    elif name.endswith("_DR"):
+        values = rng.uniform(0, 4, size)
+    elif name.endswith("Pt"):
+        values = 5 + rng.exponential(25, size)
+    elif name.endswith("Eta"):
+        values = rng.uniform(-2.5, 2.5, size)
+    elif name.endswith("Phi"):
+        values = rng.uniform(-np.pi, np.pi, size)
+    elif name.endswith("MtToMET"):
+        values = rng.exponential(40, size)
+    elif name == "type1_pfMETEt":
+        values = rng.exponential(30, size)
+    elif name == "genWeight":
+        values = np.where(rng.random(size) < 0.05, -1.0, 1.0)
+    elif re.match(r"n[A-Z]", name):
+        # Count the leptons of the flavour in the name (e.g. nZZLooseElec), with extra leptons in some events
+        values = channel.count("e" if "Ele" in name else "m") + (~composition).astype(int)
+    else:
+        values = rng.normal(0, 1, size)
+
+    dtypes = {"UInt_t": np.uint32, "ULong64_t": np.uint64, "Bool_t": np.bool_, "Float_t": np.float32}
+    return np.ascontiguousarray(values, dtype=dtypes[get_branch_type(name)])
+
+
+def get_event_columns(num_events: int, first_event: int = 1) -> dict:
+    """Generate the run, lumi, and evt of each event, starting from the given event number."""
+    return {
+        "run": np.ones(num_events, dtype=np.uint32),
+        "lumi": np.ascontiguousarray(1 + np.arange(num_events) // 1000, dtype=np.uint32),
+        "evt": np.arange(first_event, first_event + num_events, dtype=np.uint64),
+    }
+
+
+def generate_columns(
+    rng: np.random.Generator,
+    channel: str,
+    branch_names: list,
+    num_events: int,
+    mean_candidates: float = 2.0,
+    extra_branches: int = 0,
+    first_event: int = 1,
+) -> dict:
+    """Generate the columns of a channel tree, with several combinatoric candidates per (run, evt).
+
+    Candidates of an event are stored next to each other as in UWVV ntuples. This
+    only needs numpy, so the columns can also be checked without ROOT (e.g. by
+    scripts/check_cuts.py -e numpy).
+
+    Parameters
+    ----------
+    rng : numpy.random.Generator
+        The random number generator to use.
+    channel : str
+        The channel of the tree (e.g. eemm).
+    branch_names : list of str
+        The branches to generate, as returned by get_branch_names() for the channel.
+    num_events : int
+        The number of events to generate.
+    mean_candidates : float, optional
+        The mean number of candidates per event, with at least one candidate per
+        event (default is 2.0).
+    extra_branches : int, optional
+        The number of unused float branches to add, to mimic the size of real ntuples
+        (default is 0).
+    first_event : int, optional
+        The event number of the first event (default is 1).
+
+    Returns
+    -------
+    dict
+        A dict mapping each branch to a numpy array of its values.
+
+    """
+    # Determine the number of candidates for each event
+    num_candidates = 1 + rng.poisson(mean_candidates - 1, num_events)
+    num_entries = int(num_candidates.sum())
+
+    # Generate event branches once per event and repeat them for each candidate
+    composition = rng.random(num_events) < 0.9
+    event_columns = get_event_columns(num_events, first_event)
+    columns = {}
+    for name in branch_names:
+        if name in event_columns:
+            values = event_columns[name]
+        elif name in EVENT_BRANCHES or name.startswith("HLT_") or re.match(r"n[A-Z]", name):
+            values = generate_branch(rng, name, channel, num_events, composition)
+        else:
+            columns[name] = generate_branch(rng, name, channel, num_entries, np.repeat(composition, num_candidates))
+            continue
+        columns[name] = np.ascontiguousarray(np.repeat(values, num_candidates))
+    for i in range(extra_branches):
+        columns[f"extra{i}"] = rng.normal(0, 1, num_entries).astype(np.float32)
+    return columns
+
+
+def write_tree(path: str, treename: str, columns: dict, update: bool):
+    """Write numpy arrays to a tree, storing boolean arrays as Bool_t branches."""
+    # Imported here, so columns can be generated without ROOT
+    import ROOT  # noqa: PLC0415
+
+    # RDF.FromNumpy reads booleans as UChar_t, so they are passed as bytes and defined as bool before the snapshot
+    bool_names = [name for name, values in columns.items() if values.dtype == np.bool_]
+    inputs = {name: values for name, values in columns.items() if name not in bool_names}
+    inputs |= {f"{name}_uint8": columns[name].view(np.uint8) for name in bool_names}
+    rdf = ROOT.RDF.FromNumpy(inputs)
+    for name in bool_names:
+        rdf = rdf.Define(name, f"static_cast<bool>({name}_uint8)")
+    options = ROOT.RDF.RSnapshotOptions()
+    options.fMode = "UPDATE" if update else "RECREATE"
+    rdf.Snapshot(treename, path, list(columns), options)
+
+
+def generate_file(
+    path: str,
+    analysis: str,
+    branch_names: dict,
+    num_events: int,
+    mean_candidates: float = 2.0,
+    extra_branches: int = 0,
+    first_event: int = 1,
+    seed: int = 0,
+) -> dict:
+    """Write a synthetic UWVV ntuple with the trees of every channel of an analysis.
+
+    Each channel tree contains several combinatoric candidates per (run, evt), with
+    candidates of an event stored next to each other as in UWVV ntuples. The file
+    also contains a <channel>Gen tree per channel and a metaInfo tree.
+
+    Parameters
+    ----------
+    path : str
+        The path of the output file.
+    analysis : str
+        The analysis to generate ntuples for (e.g. ZZ4l).
+    branch_names : dict
+        A dict mapping each channel to the branches to generate, as returned by
+        get_branch_names().
+    num_events : int
+        The number of events to generate for each channel.
+    mean_candidates : float, optional
+        The mean number of candidates per event, with at least one candidate per
+        event (default is 2.0).
+    extra_branches : int, optional
+        The number of unused float branches to add to each channel tree, to mimic the
+        size of real ntuples (default is 0).
+    first_event : int, optional
+        The event number of the first event, so several files can be generated
+        without repeating events (default is 1).
+    seed : int, optional
+        The seed of the random number generator (default is 0).
+
+    Returns
+    -------
+    dict
+        A dict mapping each channel to its number of events and entries.
+
+    """
+    rng = np.random.default_rng(seed)
+    counts = {}
+    update = False
+    for channel in helpers.get_channels(analysis):
+        columns = generate_columns(
+            rng, channel, branch_names[channel], num_events, mean_candidates, extra_branches, first_event
+        )
+        counts[channel] = {"events": num_events, "entries": len(columns["evt"])}
+        write_tree(path, f"{channel}/ntuple", columns, update)
+        update = True
+
+        # Generate one gen-level entry per event (the lepton composition only matters for lepton counts)
+        composition = np.ones(num_events, dtype=bool)
+        gen_columns = get_event_columns(num_events, first_event)
+        gen_columns["genWeight"] = generate_branch(rng, "genWeight", channel, num_events, composition)
+        for name in get_object_names(channel):
+            for var in ("Pt", "Eta", "Phi"):
+                gen_columns[f"{name}{var}"] = generate_branch(rng, f"{name}{var}", channel, num_events, composition)
+        write_tree(path, f"{channel}Gen/ntuple", gen_columns, update)
+
+    # Summarize the generated events
+    meta_columns = {
+        "run": np.ones(1, dtype=np.uint32),
+        "nevents": np.array([num_events], dtype=np.uint64),
+        "summedWeights": np.array([num_events], dtype=np.float32),
+    }
+    write_tree(path, "metaInfo/metaInfo", meta_columns, update)
+    return counts
+
+
+def generate_ntuples(
+    output_dir: str,
+    analysis: str,
+    year: str,
+    sample: str,
+    num_files: int,
+    num_events: int,
+    mean_candidates: float = 2.0,
+    extra_branches: int = 0,
+    seed: int = 0,
+    json_dir: str = helpers.JSON_DIR,
+) -> dict:
+    """Write a sample of synthetic UWVV ntuples and the matching ntuples.json file.
+
+    The files are written to <output_dir>/<sample>/, and <output_dir>/ntuples.json
+    lists them in the format used by multi_skim.py and farmout_skim.py.
+
+    Parameters
+    ----------
+    output_dir : str
+        The directory to write the sample and ntuples.json file to.
+    analysis : str
+        The analysis to generate ntuples for (e.g. ZZ4l).
+    year : str
+        The year of the analysis, used to load the JSON files.
+    sample : str
+        The name of the sample (e.g. data_EGamma_Run2022C to use a data trigger).
+    num_files : int
+        The number of files to generate.
+    num_events : int
+        The number of events to generate for each channel in each file.
+    mean_candidates : float, optional
+        The mean number of candidates per event (default is 2.0).
+    extra_branches : int, optional
+        The number of unused float branches to add to each channel tree (default is 0).
+    seed : int, optional
+        The seed of the random number generator of the first file (default is 0).
+    json_dir : str, optional
+        The directory of the JSON files (default is JSON_DIR).
+
+    Returns
+    -------
+    dict
+        A dict containing the paths of the generated files ("files") and the total
+        number of events ("events") and entries ("entries") over all channels.
+
+    """
+    cutinfo = helpers.load_json(analysis, year, "cuts.json", json_dir=json_dir)
+    aliases = helpers.load_json(analysis, year, "aliases.json", json_dir=json_dir)
+    triggers = helpers.load_json(analysis, year, "triggers.json", json_dir=json_dir)
+    branch_names = get_branch_names(analysis, cutinfo, aliases, triggers)
+
+    sample_dir = os.path.join(output_dir, sample)
+    os.makedirs(sample_dir, exist_ok=True)
+    result = {"files": [], "events": 0, "entries": 0}
+    for i in range(num_files):
+        path = os.path.join(sample_dir, f"ntuple_{i + 1}.root")
+        counts = generate_file(
+            path,
+            analysis,
+            branch_names,
+            num_events,
+            mean_candidates,
+            extra_branches,
+            first_event=1 + i * num_events,
+            seed=seed + i,
+        )
+        result["files"].append(path)
+        result["events"] += sum(count["events"] for count in counts.values())
+        result["entries"] += sum(count["entries"] for count in counts.values())
+
+    with open(os.path.join(output_dir, "ntuples.json"), "w") as outfile:
+        json.dump({sample: [os.path.join(os.path.abspath(sample_dir), "*.root")]}, outfile, indent=2)
+        outfile.write("\n")
+    return result
@@ -0,0 +1,667 @@
+import argparse
+import contextlib
+import json
+import os
+import time
+import uuid
+from typing import Optional
+
+import numpy as np
+import uproot
+from UWVV.VVAnalysis import columnar, expressions, indexes, metrics, skimconfig
+
+# Memory read from a tree at once, which bounds the memory used per tree regardless of its size
+STEP_SIZE = "100 MB"
+
+# Functions of TTreeFormula expressions, as NumPy functions
+FUNCTIONS = {
+    "abs": "np.abs",
+    "fabs": "np.abs",
+    "TMath::Abs": "np.abs",
+    "sqrt": "np.sqrt",
+    "TMath::Sqrt": "np.sqrt",
+    "exp": "np.exp",
+    "log": "np.log",
+    "pow": "np.power",
+    "min": "np.minimum",
+    "max": "np.maximum",
+}
+
+# Operators of TTreeFormula expressions, as NumPy functions
+OPERATORS = {
+    "||": "np.logical_or",
+    "&&": "np.logical_and",
+    "==": "np.equal",
+    "!=": "np.not_equal",
+    "<": "np.less",
+    "<=": "np.less_equal",
+    ">": "np.greater",
+    ">=": "np.greater_equal",
+    "+": "np.add",
+    "-": "np.subtract",
+    "*": "np.multiply",
+    "/": "np.divide",
+    "%": "np.fmod",
+}
+
+# Operators that TTreeFormula applies to the operands truncated to integers (e.g. 7.5 % 2 is 1, not 1.5)
+INTEGER_OPERATORS = {"%"}
+
+# Operators that TTreeFormula applies to numbers, even for the result of a comparison (e.g. (a > 1) + (b > 1))
+ARITHMETIC_OPERATORS = {"+", "-", "*", "/", "%"}
+
+# Compression algorithms of output profiles, as uproot compression classes
+COMPRESSION_ALGORITHMS = {"ZLIB": uproot.ZLIB, "LZMA": uproot.LZMA, "LZ4": uproot.LZ4, "ZSTD": uproot.ZSTD}
+
+
+def to_numpy_source(node: tuple, aliases: dict, branches: set) -> str:
+    """Translate a parsed TTreeFormula expression into a vectorized expression over NumPy arrays.
+
+    Parameters
+    ----------
+    node : tuple
+        The expression, as returned by expressions.parse().
+    aliases : dict
+        A dict containing all the aliases that can be used by the expression. Aliases
+        are translated in place, so the result only uses branches.
+    branches : set of str
+        The branches used by the expression. This will be updated.
+
+    Returns
+    -------
+    str
+        The Python expression, calling NumPy functions on columns[<BRANCH>].
+
+    Raises
+    ------
+    ValueError
+        If the expression uses an unsupported function or an alias cannot be parsed.
+
+    """
+    kind, value, operands = node
+    if kind == "number":
+        return repr(float(value))
+    if kind == "name" and value in ("true", "false"):
+        return str(value == "true")
+    if kind == "name" and value in aliases:
+        # Aliases are expanded without the alias itself, so an alias cannot refer to itself
+        other_aliases = {key: val for key, val in aliases.items() if key != value}
+        return to_numpy_source(expressions.parse(aliases[value]), other_aliases, branches)
+    if kind == "name":
+        branches.add(value)
+        return f"columns[{value!r}]"
+
+    arguments = [to_numpy_source(operand, aliases, branches) for operand in operands]
+    if kind == "call":
+        if value not in FUNCTIONS:
+            raise ValueError(f"unsupported function in expression: {value}")
+        return f"{FUNCTIONS[value]}({', '.join(arguments)})"
+    if kind == "unary":
+        if value == "!":
+            return f"np.logical_not({arguments[0]})"
+        return f"np.negative({arguments[0]}, dtype=np.float64)" if value == "-" else arguments[0]
+
+    # Chains of && and || are applied from left to right, and arithmetic is done in double precision
+    dtype = ", dtype=np.float64" if value in ARITHMETIC_OPERATORS else ""
+    if value in INTEGER_OPERATORS:
+        # Truncating in double precision gives the integer result exactly, and keeps NaN (e.g. for a % 0) as NaN
+        arguments = [f"np.trunc({argument}, dtype=np.float64)" for argument in arguments]
+    result = arguments[0]
+    for argument in arguments[1:]:
+        result = f"{OPERATORS[value]}({result}, {argument}{dtype})"
+    return result
+
+
+def to_numpy_expression(expression: str, aliases: dict) -> tuple:
+    """Translate a TTreeFormula expression into a vectorized expression over NumPy arrays.
+
+    Cuts, aliases, and triggers in the JSON files are written for TTreeFormula, which
+    evaluates them one entry at a time in double precision. The translated expression
+    instead evaluates them for a whole chunk of entries at once, with each branch as a
+    float64 array in a dict named columns.
+
+    Parameters
+    ----------
+    expression : str
+        The TTreeFormula expression (e.g. 'abs(Z1Mass-91.1876) < 10').
+    aliases : dict
+        A dict containing all the aliases that can be used by the expression.
+
+    Returns
+    -------
+    tuple of (str, set of str)
+        The Python expression, calling NumPy functions on columns[<BRANCH>], and the
+        branches it uses.
+
+    Raises
+    ------
+    ValueError
+        If the expression cannot be parsed or uses an unsupported function.
+
+    """
+    branches = set()
+    try:
+        source = to_numpy_source(expressions.parse(expression), aliases, branches)
+    except ValueError as err:
+        raise ValueError(f"{err}: {expression}") from err
+    return source, branches
+
+
+def compile_expression(expression: str, aliases: dict) -> tuple:
+    """Compile a TTreeFormula expression for evaluate(), as translated by to_numpy_expression()."""
+    source, branches = to_numpy_expression(expression, aliases)
+    return compile(source, "<expression>", "eval"), branches
+
+
+def evaluate(code, columns: dict, size: int) -> np.ndarray:
+    """Evaluate a compiled expression as a cut over a chunk of entries.
+
+    Parameters
+    ----------
+    code : code
+        The expression, as returned by compile_expression().
+    columns : dict
+        A dict mapping each branch used by the expression to its values, as float64.
+    size : int
+        The number of entries in the chunk.
+
+    Returns
+    -------
+    numpy.ndarray
+        Whether each entry passes, where any nonzero value passes as in TTreeFormula.
+
+    """
+    with np.errstate(all="ignore"):
+        result = eval(code, {"np": np, "columns": columns})
+    return np.broadcast_to(np.asarray(result, dtype=bool), size)
+
+
+def get_compression(profile: dict) -> Optional[uproot.compression.Compression]:
+    """Determine the uproot compression of an output profile, or None to use uproot's default settings."""
+    if "algorithm" not in profile:
+        return None
+    return COMPRESSION_ALGORITHMS[profile["algorithm"]](profile.get("level", 5))
+
+
+def get_entry_ranges(tree: uproot.TTree, branches: list, ranges: Optional[list] = None) -> list:
+    """Split the entries of a tree (or only the given (start, stop) ranges) into ranges of about STEP_SIZE."""
+    step = max(tree.num_entries_for(STEP_SIZE, filter_name=branches), 1)
+    if ranges is None:
+        ranges = [(0, tree.num_entries)]
+    return [(start, min(start + step, stop)) for first, stop in ranges for start in range(first, stop, step)]
+
+
+def get_branch_types(tree: uproot.TTree, branches: list) -> dict:
+    """Determine the NumPy types of the given branches of a tree, for writing them with uproot."""
+    return {branch: tree[branch].interpretation.numpy_dtype.newbyteorder("=") for branch in branches}
+
+
+def check_branches(tree: uproot.TTree, branches: set, channel: str):
+    """Check that a tree contains the given branches, raising a ValueError otherwise."""
+    missing = branches - set(tree.keys(recursive=False))
+    if missing:
+        raise ValueError(f"branch(es) not found in {channel}: {', '.join(sorted(missing))}")
+
+
+def select_entries(
+    analysis: str,
+    tree: uproot.TTree,
+    cut: tuple,
+    inputs: Optional[dict] = None,
+    steps: Optional[dict] = None,
+    ranges: Optional[list] = None,
+    stages: Optional[dict] = None,
+) -> tuple:
+    """Find the entries passing a cut, and optionally the best candidate of each event among them.
+
+    The branches used by the cut and the selector are read one chunk at a time. The
+    candidates of each chunk that can still be the best are kept with
+    columnar.reduce_candidates(), which gives the same result regardless of the
+    chunks, so at most two candidates of each event are kept in memory.
+
+    Parameters
+    ----------
+    analysis : str
+        The analysis of the candidates (e.g. ZZ4l).
+    tree : uproot.TTree
+        The tree to apply the cut to.
+    cut : tuple
+        The cut, as returned by compile_expression().
+    inputs : dict, optional
+        A dict mapping each selector input to its branch, as returned by
+        skimconfig.get_selector_inputs(). If None, all entries passing the cut are
+        selected (default is None).
+    steps : dict, optional
+        A dict mapping each step of the cutflow to its cut, as returned by
+        compile_expression(). If given, the entries passing each step and all previous
+        steps are counted (default is None).
+    ranges : list of tuple of (int, int), optional
+        The (start, stop) entries to read, as returned by indexes.get_cluster_ranges().
+        Entries outside of them are skipped, so they must not pass the cut or be
+        counted by the cutflow. If None, all entries are read (default is None).
+    stages : dict, optional
+        A dict containing the metrics of each stage (cuts, selector, and cutflow), as
+        measured by metrics.measure(). This will be updated. If None, nothing is
+        measured (default is None).
+
+    Returns
+    -------
+    tuple of (numpy.ndarray, dict)
+        The selected entry numbers, in increasing order, and the cutflow of the given
+        steps (empty if none are given), as described in skimtools.get_cutflow().
+
+    """
+    code, cut_branches = cut
+    step_branches = set().union(*(branches for _, branches in steps.values())) if steps else set()
+    read_branches = sorted(cut_branches | step_branches | set(inputs.values() if inputs is not None else []))
+
+    cutflow = {name: {"entries": 0, "cpu_time": 0.0} for name in steps} if steps else {}
+    passing = []
+    best = np.empty(0, dtype=columnar.CANDIDATE_DTYPE)
+    for start, stop in get_entry_ranges(tree, read_branches, ranges):
+        with metrics.measure(stages, "cuts"):
+            chunk = tree.arrays(filter_name=read_branches, entry_start=start, entry_stop=stop, library="np")
+
+            # Expressions are evaluated in double precision, as in TTreeFormula
+            columns = {branch: chunk[branch].astype(np.float64) for branch in cut_branches | step_branches}
+            entries = np.flatnonzero(evaluate(code, columns, stop - start)) + start
+
+        # Count the entries passing each step of the cutflow, if specified
+        if steps:
+            with metrics.measure(stages, "cutflow"):
+                mask = np.ones(stop - start, dtype=bool)
+                for name, (step_code, _) in steps.items():
+                    step_start = time.process_time()
+                    mask &= evaluate(step_code, columns, stop - start)
+                    cutflow[name]["entries"] += int(np.count_nonzero(mask))
+                    cutflow[name]["cpu_time"] += time.process_time() - step_start
+
+        if inputs is None:
+            passing.append(entries)
+            continue
+
+        # Keep the candidates of each event that can still be the best, using the original types as the C++ selectors do
+        with metrics.measure(stages, "selector"):
+            selector_columns = {name: chunk[branch][entries - start] for name, branch in inputs.items()}
+            selector_columns["entry"] = entries
+            best = columnar.merge_candidates(best, columnar.get_candidates(analysis, selector_columns))
+
+    if inputs is None:
+        return np.concatenate(passing) if passing else np.empty(0, dtype=np.int64), cutflow
+    return np.sort(columnar.choose_best_candidates(best)["entry"]), cutflow
+
+
+def read_entries(tree: uproot.TTree, branches: list, entries: Optional[np.ndarray] = None):
+    """Read the given branches of a tree one chunk at a time, optionally keeping only the given entries.
+
+    Parameters
+    ----------
+    tree : uproot.TTree
+        The tree to read.
+    branches : list of str
+        The branches to read.
+    entries : numpy.ndarray, optional
+        The entry numbers to keep, in increasing order. Chunks without any of these
+        entries are not read. If None, all entries are kept (default is None).
+
+    Yields
+    ------
+    dict
+        A dict mapping each branch to the values of a chunk.
+
+    """
+    for start, stop in get_entry_ranges(tree, branches):
+        if entries is None:
+            yield tree.arrays(filter_name=branches, entry_start=start, entry_stop=stop, library="np")
+            continue
+
+        # Only read from the first to the last entry kept in this chunk
+        chunk_entries = entries[np.searchsorted(entries, start) : np.searchsorted(entries, stop)]
+        if len(chunk_entries) == 0:
+            continue
+        first, last = int(chunk_entries[0]), int(chunk_entries[-1]) + 1
+        chunk = tree.arrays(filter_name=branches, entry_start=first, entry_stop=last, library="np")
+        yield {branch: values[chunk_entries - first] for branch, values in chunk.items()}
+
+
+def add_output_tree(output_trees: dict, outfile: uproot.WritableDirectory, name: str, tree_name: str, types: dict):
+    """Create the output tree with the given name, if not already created by an earlier input file.
+
+    Parameters
+    ----------
+    output_trees : dict
+        A dict of output trees keyed by the name of their output directory. This will
+        be updated.
+    outfile : uproot.WritableDirectory
+        The output file.
+    name : str
+        The name of the output directory (e.g. eeee or metaInfo).
+    tree_name : str
+        The name of the tree within its directory (e.g. ntuple).
+    types : dict
+        A dict mapping each branch of the tree to its NumPy type.
+
+    """
+    if name not in output_trees:
+        output_trees[name] = outfile.mktree(f"{name}/{tree_name}", types)
+
+
+def copy_tree(
+    output_trees: dict,
+    outfile: uproot.WritableDirectory,
+    name: str,
+    tree: uproot.TTree,
+    branches: Optional[list] = None,
+    entries: Optional[np.ndarray] = None,
+    stages: Optional[dict] = None,
+) -> int:
+    """Append the given entries of a tree to the output tree with the given name.
+
+    Parameters
+    ----------
+    output_trees : dict
+        A dict of output trees keyed by the name of their output directory. This will
+        be updated.
+    outfile : uproot.WritableDirectory
+        The output file.
+    name : str
+        The name of the output directory (e.g. eeee or metaInfo).
+    tree : uproot.TTree
+        The tree to copy entries from.
+    branches : list of str, optional
+        The branches to copy. If None, all branches are copied (default is None).
+    entries : numpy.ndarray, optional
+        The entry numbers to copy, in increasing order. If None, all entries are
+        copied (default is None).
+    stages : dict, optional
+        A dict containing the metrics of each stage (copy and write), as measured by
+        metrics.measure(). This will be updated. If None, nothing is measured
+        (default is None).
+
+    Returns
+    -------
+    int
+        The number of entries copied.
+
+    """
+    if branches is None:
+        branches = tree.keys(recursive=False)
+    add_output_tree(output_trees, outfile, name, tree.name, get_branch_types(tree, branches))
+
+    num_entries = 0
+    chunks = read_entries(tree, branches, entries)
+    while True:
+        with metrics.measure(stages, "copy"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        size = len(chunk[branches[0]])
+        if size > 0:
+            with metrics.measure(stages, "write"):
+                output_trees[name].extend(chunk)
+            num_entries += size
+    return num_entries
+
+
+def skim_analyses(args: argparse.Namespace, analyses: dict):
+    """Apply the cuts and optional selectors of several analyses with uproot and NumPy.
+
+    This is the numpy engine of skimtools.skim_analyses(), which takes the same
+    arguments and writes the same entries to the same output trees, without compiling
+    anything with cling or reading the input files with ROOT. Each input file is
+    opened once, and each tree is read in chunks of about STEP_SIZE, so the memory
+    used does not depend on the size of the input files. The cuts, aliases, and
+    triggers are translated into NumPy expressions, and the best candidate of each
+    event is chosen by sorting the candidates by (run, evt), as with --columnar.
+
+    The compression of the output profile is applied, but not its clustering: uproot
+    writes one basket per branch for each chunk.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        A dict-like object parsed from the command-line containing information about
+        the job. Check skimtools.skim_analyses() for more information.
+    analyses : dict
+        A dict mapping each analysis to its configuration, as described in
+        skimtools.skim_analyses().
+
+    """
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    if args.metrics:
+        metrics.reset_max_rss()
+
+    # Build cutstrings, aliases, and required branches for each channel of each analysis
+    analyses = {analysis: dict(config) for analysis, config in analyses.items()}
+    analysis_args = {}
+    index_branches = {}
+    for analysis, config in analyses.items():
+        if config.get("channels") is None:
+            config["channels"] = skimconfig.resolve_channels(
+                analysis, config["trigger"], config["cutinfo"], config["aliases"], config["triggers"]
+            )
+        if config.get("profile") is None:
+            config["profile"] = {}
+        analysis_args[analysis] = argparse.Namespace(
+            **{**vars(args), "analysis": analysis, "trigger": config["trigger"], "outfile": config["outfile"]}
+        )
+        for channel, branches in indexes.get_index_branches(config["channels"]).items():
+            index_branches[channel] = index_branches.get(channel, set()) | branches
+
+    # Create output ROOT files
+    with contextlib.ExitStack() as stack:
+        outfiles = {}
+        for analysis, config in analyses.items():
+            compression = get_compression(config["profile"])
+            if compression is not None:
+                outfiles[analysis] = stack.enter_context(uproot.recreate(config["outfile"], compression=compression))
+            else:
+                outfiles[analysis] = stack.enter_context(uproot.recreate(config["outfile"]))
+            if args.verbose:
+                print(f"Writing {analysis} to {config['outfile']}")
+
+        # Output trees are filled from each input file in turn, keyed by output directory
+        output_trees = {analysis: {} for analysis in analyses}
+        cutflows = {analysis: {} for analysis in analyses}
+        job_metrics = {analysis: {"stages": {}, "channels": {}} for analysis in analyses}
+
+        # Metrics shared by every analysis of the job, which are only counted once per job by summarize_metrics.py
+        shared_metrics = {"job": uuid.uuid4().hex, "analyses": list(analyses), "stages": {}, "files": {}}
+        shared_stages = shared_metrics["stages"]
+        for path in args.infiles:
+            file_wall, file_cpu = time.perf_counter(), time.process_time()
+
+            # Open each input file once and share the handle across all trees
+            with metrics.measure(shared_stages, "open"):
+                infile = uproot.open(path)
+            if args.verbose:
+                print(f"Reading {path}")
+
+            # Load the cluster index of the file, building it if needed, if specified
+            file_index = None
+            if args.cluster_index:
+                with metrics.measure(shared_stages, "index"):
+                    file_index = indexes.get_index(path, index_branches, args.index_dir, args.verbose)
+
+            with infile:
+                for analysis, config in analyses.items():
+                    skim_file(
+                        analysis_args[analysis],
+                        config,
+                        infile,
+                        outfiles[analysis],
+                        output_trees[analysis],
+                        cutflows[analysis],
+                        job_metrics[analysis],
+                        file_index,
+                    )
+
+                    # Copy metaInfo tree
+                    with metrics.measure(job_metrics[analysis]["stages"], "meta"):
+                        copy_tree(output_trees[analysis], outfiles[analysis], "metaInfo", infile["metaInfo/metaInfo"])
+
+                file_metrics = {
+                    "wall_time": time.perf_counter() - file_wall,
+                    "cpu_time": time.process_time() - file_cpu,
+                    "bytes_read": int(infile.file.source.num_requested_bytes),
+                }
+            shared_metrics["files"][path] = file_metrics
+
+        shared_metrics["bytes_read"] = sum(info["bytes_read"] for info in shared_metrics["files"].values())
+        for analysis, outfile in outfiles.items():
+            # Record the config bundle used, if any
+            config_hash = analyses[analysis].get("config_hash")
+            if config_hash is not None:
+                outfile["configHash"] = config_hash
+
+            # Record the metrics of the job, if specified
+            if args.metrics:
+                analysis_metrics = job_metrics[analysis]
+                analysis_metrics.update(
+                    {
+                        "analysis": analysis,
+                        "wall_time": time.perf_counter() - start_wall,
+                        "cpu_time": time.process_time() - start_cpu,
+                        "max_rss": metrics.get_max_rss(),
+                        "bytes_written": os.path.getsize(analyses[analysis]["outfile"]),
+                        "shared": shared_metrics,
+                    }
+                )
+                outfile[metrics.METRICS_NAME] = json.dumps(analysis_metrics)
+
+    # Save cutflows next to output files
+    if args.cutflow:
+        for analysis, config in analyses.items():
+            cutflow_path = skimconfig.get_cutflow_path(config["outfile"])
+            with open(cutflow_path, "w") as outfile:
+                json.dump(cutflows[analysis], outfile, indent=2)
+                outfile.write("\n")
+            if args.verbose:
+                print(f"Cutflow written to {cutflow_path}")
+
+    # Save metrics next to output files
+    if args.metrics:
+        for analysis, config in analyses.items():
+            metrics_path = metrics.get_metrics_path(config["outfile"])
+            with open(metrics_path, "w") as outfile:
+                json.dump(job_metrics[analysis], outfile, indent=2)
+                outfile.write("\n")
+            if args.verbose:
+                print(f"Metrics written to {metrics_path}")
+
+    if args.verbose:
+        for config in analyses.values():
+            print(f"Written to {config['outfile']}")
+
+
+def skim_file(
+    args: argparse.Namespace,
+    config: dict,
+    infile: uproot.ReadOnlyDirectory,
+    outfile: uproot.WritableDirectory,
+    output_trees: dict,
+    cutflows: dict,
+    job_metrics: Optional[dict] = None,
+    file_index: Optional[dict] = None,
+):
+    """Skim the channels of a single analysis from an open input file with uproot and NumPy.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        A dict-like object containing information about the job, with the analysis,
+        trigger, and outfile of the given analysis. Check skimtools.skim() for more
+        information.
+    config : dict
+        The configuration of the analysis, as described in skimtools.skim_analyses(),
+        with the channels already resolved.
+    infile : uproot.ReadOnlyDirectory
+        The open input file.
+    outfile : uproot.WritableDirectory
+        The output file of the analysis.
+    output_trees : dict
+        A dict of output trees keyed by the name of their output directory. This will
+        be updated.
+    cutflows : dict
+        A dict containing the cutflow of each channel. This will be updated if the
+        cutflow is requested.
+    job_metrics : dict, optional
+        A dict containing the metrics of each stage ("stages"), as measured by
+        metrics.measure(), and the entries in and out of each channel ("channels").
+        This will be updated. If None, nothing is measured (default is None).
+    file_index : dict, optional
+        The cluster index of the input file, as returned by indexes.get_index(). If
+        given, clusters that cannot pass the cuts are not read, unless the cutflow is
+        requested. If None, all entries are read (default is None).
+
+    """
+    stages = job_metrics["stages"] if job_metrics is not None else None
+    for channel, info in config["channels"].items():
+        with metrics.measure(stages, "open"):
+            tree = infile[f"{channel}/ntuple"]
+            channel_cut = compile_expression(info["cutstring"], info["aliases"])
+            check_branches(tree, channel_cut[1] | set((info["selector_inputs"] or {}).values()), channel)
+
+            # Build the cutflow steps, if specified
+            steps = None
+            if args.cutflow:
+                steps = {
+                    name: compile_expression(" && ".join(f"({cut})" for cut in cuts), info["aliases"])
+                    for name, cuts in skimconfig.build_cut_groups(config["cutinfo"], channel).items()
+                    if cuts
+                }
+                steps["Trigger"] = compile_expression(config["triggers"][args.trigger], info["aliases"])
+
+            # Only read and write the requested branches, if specified
+            branch_names = tree.keys(recursive=False)
+            active_branches = branch_names
+            if config["branchinfo"]:
+                active_branches = skimconfig.get_active_branches(
+                    branch_names, config["branchinfo"], info["required_branches"]
+                )
+                if args.verbose:
+                    print(f"{channel}: keeping {len(active_branches)}/{len(branch_names)} branches")
+
+        # Skip the clusters that cannot pass the cuts, if indexed (the cutflow counts entries in every cluster)
+        ranges = None
+        if file_index is not None and steps is None:
+            with metrics.measure(stages, "index"):
+                ranges = indexes.get_cluster_ranges(file_index, channel, info["cutstring"], info["aliases"])
+            if args.verbose and ranges is not None:
+                num_entries_read = sum(stop - start for start, stop in ranges)
+                print(f"{channel}: reading {num_entries_read}/{tree.num_entries} entries of clusters that may pass")
+
+        # Select entries and copy them to the output tree
+        num_entries_in = int(tree.num_entries)
+        start = time.process_time()
+        entries, cutflow = select_entries(
+            args.analysis, tree, channel_cut, info["selector_inputs"], steps, ranges, stages
+        )
+        num_entries = copy_tree(output_trees, outfile, channel, tree, active_branches, entries, stages)
+        if job_metrics is not None:
+            metrics.merge_metrics(
+                job_metrics["channels"], {channel: {"entries_in": num_entries_in, "entries_out": num_entries}}
+            )
+
+        if args.cutflow:
+            cutflow = {"Total": {"entries": num_entries_in, "cpu_time": 0.0}, **cutflow}
+            cutflow["Skim"] = {"entries": num_entries, "cpu_time": time.process_time() - start}
+            skimconfig.merge_cutflows(cutflows, {channel: cutflow})
+
+        # Copy gen tree, if specified
+        if args.save_gen:
+            with metrics.measure(stages, "gen"):
+                copy_tree(output_trees, outfile, f"{channel}Gen", infile[f"{channel}Gen/ntuple"])
+
+        # Print out information regarding skim
+        if args.verbose:
+            print(f"{channel}:")
+            print(f"  {info['cutstring']}")
+            for key, val in info["aliases"].items():
+                print(f"  Set alias: {key} -> {val}")
+            print(f"  Entries pre-skim: {num_entries_in}")
+            print(f"  Entries post-skim: {num_entries}")
+            if info["selector_inputs"] is None:
+                print(f"  No selector available for {args.analysis}")
+            else:
+                print("  Best candidates selected with NumPy in the same pass as the cuts")
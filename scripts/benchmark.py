@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from UWVV.VVAnalysis import benchmarks, helpers, synthetic
+
+BENCHMARKS = [
+    "skim",
+    "skim-single-pass",
+    "skim-columnar",
+    "skim-rdf",
+    "skim-rdf-single-pass",
+    "skim-rdf-columnar",
+    "skim-numpy",
+    "selectors",
+    "multi_skim",
+]
+
+
+def main():
+    """Benchmark skimming on synthetic UWVV ntuples, reporting events/s, peak memory, and output size.
+
+    Synthetic ntuples are generated in a work directory, then each benchmark is run
+    in its own process: skim.py with each engine (the tree and rdf engines alone, with
+    --single-pass, and with --columnar),
+    the best-candidate selectors on their own, and multi_skim.py (which requires the
+    usual user configuration file). Event rates count the generated events of every
+    channel, and peak memory is that of the largest process of each benchmark.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=helpers.CustomHelpFormatter)
+    parser.add_argument("-a", "--analysis", default="ZZ4l", help="name of analysis")
+    parser.add_argument("-y", "--year", default="2022", help="year for analysis")
+    parser.add_argument(
+        "-b", "--benchmarks", nargs="+", default=BENCHMARKS, choices=BENCHMARKS, help="benchmarks to run"
+    )
+    parser.add_argument("-f", "--num-files", type=int, default=4, help="number of synthetic files")
+    parser.add_argument("-n", "--num-events", type=int, default=20000, help="number of events per channel per file")
+    parser.add_argument("--candidates", type=float, default=2.0, help="mean number of candidates per event")
+    parser.add_argument("--extra-branches", type=int, default=100, help="number of unused branches per channel tree")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random number generator")
+    parser.add_argument("-j", "--num-cores", type=int, default=4, help="number of cores for multi_skim.py and rdf")
+    parser.add_argument("-w", "--work-dir", default=argparse.SUPPRESS, help="work directory (default: temporary)")
+    parser.add_argument("-o", "--outfile", help="JSON file to save the results to")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the output of each benchmark")
+    args = parser.parse_args()
+
+    # Error checking
+    if not os.path.isdir(os.path.join(helpers.JSON_DIR, args.analysis)):
+        parser.error(f"invalid analysis: {args.analysis}")
+    if not os.path.isdir(os.path.join(helpers.JSON_DIR, args.analysis, args.year)):
+        parser.error(f"invalid year for analysis {args.analysis}: {args.year}")
+    if args.num_files <= 0:
+        parser.error(f"invalid number of files: {args.num_files}")
+    if args.num_events <= 0:
+        parser.error(f"invalid number of events: {args.num_events}")
+    if args.num_cores <= 0:
+        parser.error(f"invalid number of cores: {args.num_cores}")
+
+    # Use a temporary work directory by default
+    if "work_dir" in args:
+        os.makedirs(args.work_dir, exist_ok=True)
+        work_dir = args.work_dir
+    else:
+        work_dir = tempfile.mkdtemp(prefix="uwvv_benchmark_")
+
+    try:
+        # Generate synthetic ntuples
+        print(f"Generating {args.num_files} file(s) with {args.num_events} events per channel in {work_dir}")
+        sample = synthetic.generate_ntuples(
+            os.path.join(work_dir, "ntuples"),
+            args.analysis,
+            args.year,
+            "synthetic",
+            args.num_files,
+            args.num_events,
+            args.candidates,
+            args.extra_branches,
+            args.seed,
+        )
+        input_size = sum(os.path.getsize(path) for path in sample["files"])
+        print(f"Generated {sample['events']} events ({sample['entries']} entries, {input_size / 1024**2:.1f} MB)\n")
+
+        results = {
+            "config": {key: val for key, val in vars(args).items() if key not in ("outfile", "verbose")},
+            "input": {"events": sample["events"], "entries": sample["entries"], "size": input_size},
+            "benchmarks": {},
+        }
+        print(f"{'Benchmark':<22} {'Events/s':>10} {'Wall (s)':>9} {'CPU (s)':>8} {'RSS (MB)':>9} {'Output (MB)':>12}")
+        for name in args.benchmarks:
+            command, output = get_benchmark(name, args, sample["files"], work_dir)
+            result = benchmarks.run_command(command, work_dir, args.verbose)
+            result["events_per_second"] = sample["events"] / result["wall_time"]
+            result["output_size"] = benchmarks.get_output_size(output) if output is not None else 0
+            results["benchmarks"][name] = result
+            print(
+                f"{name:<22} {result['events_per_second']:>10.0f} {result['wall_time']:>9.2f} "
+                f"{result['cpu_time']:>8.2f} {result['max_rss'] / 1024**2:>9.1f} {result['output_size'] / 1024**2:>12.2f}"
+            )
+    finally:
+        if "work_dir" not in args:
+            shutil.rmtree(work_dir)
+
+    # Save results for comparisons between changes
+    if args.outfile is not None:
+        with open(args.outfile, "w") as outfile:
+            json.dump(results, outfile, indent=2)
+            outfile.write("\n")
+
+
+def get_benchmark(name: str, args: argparse.Namespace, infiles: list, work_dir: str) -> tuple:
+    """Build the command of a benchmark, returning it with the path of its output."""
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    common = ["-a", args.analysis, "-y", args.year]
+    if name.startswith("skim"):
+        output = os.path.join(work_dir, f"{name}.root")
+        command = [sys.executable, os.path.join(scripts_dir, "skim.py"), *common, "-o", output, "-i", *infiles]
+        if "rdf" in name:
+            command += ["-e", "rdf", "--num-threads", str(args.num_cores)]
+        elif "numpy" in name:
+            command += ["-e", "numpy"]
+        else:
+            command += ["-e", "tree"]
+        if "single-pass" in name:
+            command.append("--single-pass")
+        if "columnar" in name:
+            command.append("--columnar")
+    elif name == "selectors":
+        output = None
+        command = [
+            sys.executable,
+            "-c",
+            f"from UWVV.VVAnalysis import benchmarks; benchmarks.run_selectors({infiles!r}, {args.analysis!r})",
+        ]
+    else:
+        output = helpers.get_unique_dirname(os.path.join(work_dir, name))
+        command = [
+            sys.executable,
+            os.path.join(scripts_dir, "multi_skim.py"),
+            *common,
+            "-q",
+            "-j",
+            str(args.num_cores),
+            "--ntuples",
+            os.path.join(work_dir, "ntuples", "ntuples.json"),
+            "-o",
+            output,
+        ]
+    return command, output
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from UWVV.VVAnalysis import helpers, skimconfig, synthetic
+
+
+def main():
+    """Check that the optimized cutstrings select the same entries as the cuts joined as given.
+
+    Synthetic ntuples are generated for each analysis. For each channel and trigger,
+    the cutstring of build_cutstring() is compared with the cuts of cuts.json joined
+    as given (i.e. without removing duplicate terms, reordering terms, or rewriting
+    the leading pt cut). The leading pt cut is only rewritten if the leading pt is at
+    least the subleading pt, so the cuts are also checked with the pt thresholds made
+    equal and swapped. With the tree engine, the ntuples are written to a work
+    directory and the entries passing each cutstring are found with TTreeFormula. With
+    the numpy engine, the columns are kept in memory and the cutstrings are evaluated
+    as by the numpy engine of skim.py, so neither ROOT nor any files are needed. The
+    length of each cutstring and the CPU time to apply it are printed. An error is
+    raised if any selection differs.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=helpers.CustomHelpFormatter)
+    parser.add_argument("-a", "--analysis", nargs="+", default=["ZZ4l", "ZplusL"], help="name of analyses to check")
+    parser.add_argument("-y", "--year", default="2022", help="year for analyses")
+    parser.add_argument(
+        "-e", "--engine", default="tree", choices=["tree", "numpy"], help="engine used to apply the cutstrings"
+    )
+    parser.add_argument("-n", "--num-events", type=int, default=20000, help="number of events per channel")
+    parser.add_argument("--candidates", type=float, default=2.0, help="mean number of candidates per event")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random number generator")
+    parser.add_argument("--json-dir", default=helpers.JSON_DIR, help="directory for JSON files")
+    parser.add_argument("-w", "--work-dir", default=argparse.SUPPRESS, help="work directory (default: temporary)")
+    args = parser.parse_args()
+
+    # Error checking
+    for analysis in args.analysis:
+        if not os.path.isdir(os.path.join(args.json_dir, analysis)):
+            parser.error(f"invalid analysis: {analysis}")
+        if not os.path.isdir(os.path.join(args.json_dir, analysis, args.year)):
+            parser.error(f"invalid year for analysis {analysis}: {args.year}")
+    if args.num_events <= 0:
+        parser.error(f"invalid number of events: {args.num_events}")
+    if args.engine == "numpy" and "work_dir" in args:
+        parser.error("--work-dir is only used by the tree engine")
+
+    # Use a temporary work directory by default
+    work_dir = None
+    if args.engine == "tree":
+        if "work_dir" in args:
+            os.makedirs(args.work_dir, exist_ok=True)
+            work_dir = args.work_dir
+        else:
+            work_dir = tempfile.mkdtemp(prefix="uwvv_check_cuts_")
+
+    mismatches = []
+    try:
+        print(
+            f"{'Channel':<8} {'Trigger':<16} {'Pt cuts':<8} {'Length':>14} {'CPU (s)':>14} {'Entries':>8} "
+            f"{'Passing':>8}  Result"
+        )
+        for analysis in args.analysis:
+            cutinfo = helpers.load_json(analysis, args.year, "cuts.json", json_dir=args.json_dir)
+            aliases = helpers.load_json(analysis, args.year, "aliases.json", json_dir=args.json_dir)
+            triggers = helpers.load_json(analysis, args.year, "triggers.json", json_dir=args.json_dir)
+            branch_names = synthetic.get_branch_names(analysis, cutinfo, aliases, triggers)
+            if args.engine == "tree":
+                get_passing = get_tree_checker(analysis, branch_names, work_dir, args)
+            else:
+                get_passing = get_numpy_checker(analysis, branch_names, args)
+
+            for channel in helpers.get_channels(analysis):
+                channel_aliases = aliases["Event"] | aliases["Channel"][channel]
+                for trigger, selection in triggers.items():
+                    for pt_cuts in get_pt_cuts(cutinfo):
+                        pt_cutinfo = cutinfo | pt_cuts
+                        given = skimconfig.build_cutstring(pt_cutinfo, channel, optimize=False) + f" && ({selection})"
+                        optimized = skimconfig.build_cutstring(pt_cutinfo, channel) + f" && ({selection})"
+                        given_entries, given_time, num_entries = get_passing(channel, given, channel_aliases)
+                        optimized_entries, optimized_time, _ = get_passing(channel, optimized, channel_aliases)
+
+                        label = "/".join(str(pt_cuts[key]) for key in ("LeadingPt", "SubleadingPt"))
+                        matches = given_entries == optimized_entries
+                        if not matches:
+                            mismatches.append(f"{analysis} {channel} {trigger} (pt cuts {label})")
+                        print(
+                            f"{channel:<8} {trigger:<16} {label:<8} {f'{len(given)} -> {len(optimized)}':>14} "
+                            f"{f'{given_time:.2f} -> {optimized_time:.2f}':>14} {num_entries:>8} "
+                            f"{len(given_entries):>8}  {'same' if matches else 'DIFFERENT'}"
+                        )
+    finally:
+        if work_dir is not None and "work_dir" not in args:
+            shutil.rmtree(work_dir)
+
+    if mismatches:
+        raise RuntimeError(f"optimized cutstrings select different entries for: {', '.join(mismatches)}")
+    print("All optimized cutstrings select the same entries")
+
+
+def get_pt_cuts(cutinfo: dict) -> list:
+    """List the leading and subleading pt cuts to check: as given, and if both are set, made equal and swapped."""
+    leading, subleading = cutinfo["LeadingPt"], cutinfo["SubleadingPt"]
+    pt_cuts = [{"LeadingPt": leading, "SubleadingPt": subleading}]
+    if leading is not None and subleading is not None and leading != subleading:
+        # The leading pt cut is rewritten when the thresholds are equal, but not when the leading pt is lower
+        pt_cuts.append({"LeadingPt": leading, "SubleadingPt": leading})
+        pt_cuts.append({"LeadingPt": subleading, "SubleadingPt": leading})
+    return pt_cuts
+
+
+def get_tree_checker(analysis: str, branch_names: dict, work_dir: str, args: argparse.Namespace):
+    """Write a synthetic ntuple for an analysis, returning a function finding the entries passing a cutstring."""
+    # Imported here, so the numpy engine doesn't need ROOT
+    import ROOT  # noqa: PLC0415
+
+    path = os.path.join(work_dir, f"{analysis}.root")
+    synthetic.generate_file(path, analysis, branch_names, args.num_events, args.candidates, seed=args.seed)
+    infile = ROOT.TFile.Open(path)
+
+    def get_passing(channel: str, cutstring: str, aliases: dict) -> tuple:
+        """Find the entries passing a cutstring with TTreeFormula, with the CPU time taken and number of entries."""
+        tree = infile.Get(f"{channel}/ntuple")
+        for key, val in aliases.items():
+            tree.SetAlias(key, val)
+
+        # Keep entry lists out of any output file
+        with ROOT.TDirectory.TContext(ROOT.gROOT):
+            start = time.process_time()
+            tree.Draw(">>check_cuts", cutstring, "entrylist")
+            cpu_time = time.process_time() - start
+            entry_list = ROOT.gROOT.Get("check_cuts")
+            entries = {entry_list.GetEntry(i) for i in range(entry_list.GetN())}
+        return entries, cpu_time, tree.GetEntries()
+
+    return get_passing
+
+
+def get_numpy_checker(analysis: str, branch_names: dict, args: argparse.Namespace):
+    """Generate synthetic columns for an analysis, returning a function finding the entries passing a cutstring."""
+    # Imported here, so the tree engine doesn't need uproot
+    from UWVV.VVAnalysis import vectorized  # noqa: PLC0415
+
+    rng = np.random.default_rng(args.seed)
+    columns = {
+        channel: synthetic.generate_columns(rng, channel, branch_names[channel], args.num_events, args.candidates)
+        for channel in helpers.get_channels(analysis)
+    }
+
+    def get_passing(channel: str, cutstring: str, aliases: dict) -> tuple:
+        """Find the entries passing a cutstring with NumPy, with the CPU time taken and number of entries."""
+        num_entries = len(columns[channel]["evt"])
+        start = time.process_time()
+        code, branches = vectorized.compile_expression(cutstring, aliases)
+        inputs = {branch: columns[channel][branch].astype(np.float64) for branch in branches}
+        passing = vectorized.evaluate(code, inputs, num_entries)
+        cpu_time = time.process_time() - start
+        return set(np.flatnonzero(passing).tolist()), cpu_time, num_entries
+
+    return get_passing
+
+
+if __name__ == "__main__":
+    main()
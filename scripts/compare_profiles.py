@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import tempfile
+import time
+
+from UWVV.VVAnalysis import helpers, profiles
+
+
+def main():
+    """Measure the output size and the write/read speed of each output profile for a skimmed file.
+
+    Each profile defined in profiles.json (or only the ones requested) is used to
+    rewrite the given file, recording the time to write it, the size of the output,
+    and the time to read back and decompress every entry.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=helpers.CustomHelpFormatter)
+    parser.add_argument("infile", help="skimmed file to rewrite with each profile")
+    parser.add_argument("-a", "--analysis", default="ZZ4l", help="name of analysis")
+    parser.add_argument("-y", "--year", default="2022", help="year for analysis")
+    parser.add_argument("-p", "--profiles", nargs="+", default=argparse.SUPPRESS, help="profiles (default: all)")
+    parser.add_argument("--json-dir", default=helpers.JSON_DIR, help="directory for JSON files")
+    args = parser.parse_args()
+
+    # Error checking
+    if not os.path.isfile(args.infile):
+        parser.error(f"invalid file: {args.infile}")
+    if not os.path.isdir(os.path.join(args.json_dir, args.analysis)):
+        parser.error(f"invalid analysis: {args.analysis}")
+    if not os.path.isdir(os.path.join(args.json_dir, args.analysis, args.year)):
+        parser.error(f"invalid year for analysis {args.analysis}: {args.year}")
+
+    # Load JSON information
+    output_profiles = helpers.load_json(args.analysis, args.year, "profiles.json", json_dir=args.json_dir)
+    if "profiles" not in args:
+        args.profiles = list(output_profiles.keys())
+    for name in args.profiles:
+        if name not in output_profiles:
+            parser.error(f"invalid profile: {name}")
+
+    # Rewrite and read back the file with each profile
+    input_size = os.path.getsize(args.infile)
+    print(f"{'Profile':<12} {'Size (MB)':>10} {'Ratio':>7} {'Write (s)':>10} {'Read (s)':>9} {'Read (MB/s)':>12}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name in args.profiles:
+            outfile = os.path.join(temp_dir, f"{name}.root")
+
+            start = time.perf_counter()
+            profiles.copy_file(args.infile, outfile, output_profiles[name])
+            write_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            nbytes = profiles.read_file(outfile)
+            read_time = time.perf_counter() - start
+
+            size = os.path.getsize(outfile)
+            print(
+                f"{name:<12} {size / 1024**2:>10.2f} {size / input_size:>7.3f} {write_time:>10.2f} {read_time:>9.2f} "
+                f"{nbytes / 1024**2 / read_time:>12.1f}"
+            )
+            os.remove(outfile)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,9 @@ import datetime
 import json
 import os
 import subprocess
+import tarfile
 
-from UWVV.VVAnalysis import helpers, skimtools
+from UWVV.VVAnalysis import bundles, catalogs, helpers, skimconfig, skimtools
 
 
 def main():
@@ -18,6 +19,36 @@ def main():
     parser.add_argument("-g", "--save-gen", action="store_true", help="save gen trees")
     parser.add_argument("-v", "--verbose", action="store_true", help="print more updates during skimming")
     parser.add_argument("-q", "--quiet", action="store_true", help="disable all print statements")
+    parser.add_argument(
+        "--single-pass", action="store_true", help="apply cuts and selector together, copying only the best candidates"
+    )
+    parser.add_argument(
+        "--columnar", action="store_true", help="select the best candidates with vectorized passes over columns"
+    )
+    parser.add_argument(
+        "-e", "--engine", default="tree", choices=["tree", "rdf", "numpy"], help="engine used to apply cuts"
+    )
+    parser.add_argument("--kernel-cache", help="directory of compiled cuts for the rdf engine to ship with each job")
+    parser.add_argument(
+        "--cluster-index",
+        action="store_true",
+        help="skip clusters that cannot pass the cuts, using the min/max index of each input file (built if missing)",
+    )
+    parser.add_argument(
+        "--index-dir", help="directory for cluster indexes readable by the jobs (default: next to each input file)"
+    )
+    parser.add_argument(
+        "-b", "--bundle", action="store_true", help="resolve the configuration once and ship it with each job"
+    )
+    parser.add_argument(
+        "--metrics", action="store_true", help="save timing, memory, and I/O of each stage in each output file"
+    )
+    parser.add_argument(
+        "-p",
+        "--profile",
+        default=skimconfig.DEFAULT_PROFILE,
+        help="compression and clustering profile of the output files",
+    )
     parser.add_argument(
         "--ntuples", default=argparse.SUPPRESS, help="ntuple JSON (default: json/<ANALYSIS>/<YEAR>/ntuples.json)"
     )
@@ -35,6 +66,22 @@ def main():
     )
     parser.add_argument("--opsys", default="AlmaLinux9", help="operating system for jobs to run")
     parser.add_argument("--test", action="store_true", help="create submission directory but do not execute")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="print the number of jobs and expected runtime of each sample and exit"
+    )
+    parser.add_argument(
+        "--throughput", type=float, default=5.0, help="expected input read per job in MB/s, for --dry-run"
+    )
+    parser.add_argument(
+        "--job-overhead", type=float, default=60.0, help="expected startup time per job in s, for --dry-run"
+    )
+
+    packing = parser.add_mutually_exclusive_group()
+    packing.add_argument("--files-per-job", type=int, default=1, help="number of input files per job")
+    packing.add_argument("--mb-per-job", type=float, help="target size of input files per job in MB")
+    packing.add_argument(
+        "--events-per-job", type=int, help="target number of entries per job, over all channels (requires a catalog)"
+    )
     args = parser.parse_args()
 
     # Error checking
@@ -44,6 +91,18 @@ def main():
         parser.error(f"invalid year for analysis {args.analysis}: {args.year}")
     if "ntuples" in args and not os.path.isfile(args.ntuples):
         parser.error(f"invalid ntuples JSON: {args.ntuples}")
+    if args.kernel_cache is not None and not os.path.isdir(args.kernel_cache):
+        parser.error(f"invalid kernel cache: {args.kernel_cache}")
+    if args.cluster_index and (args.engine == "rdf" or (args.engine == "tree" and args.columnar)):
+        parser.error("--cluster-index is not supported by the rdf engine or by --columnar with the tree engine")
+    if args.files_per_job <= 0:
+        parser.error(f"invalid number of files per job: {args.files_per_job}")
+    if args.mb_per_job is not None and args.mb_per_job <= 0:
+        parser.error(f"invalid target size per job: {args.mb_per_job}")
+    if args.events_per_job is not None and args.events_per_job <= 0:
+        parser.error(f"invalid target number of events per job: {args.events_per_job}")
+    if args.throughput <= 0:
+        parser.error(f"invalid throughput: {args.throughput}")
 
     config_path = os.path.join(helpers.BASE_DIR, "config", f"{os.getlogin()}.cfg")
     if not os.path.isfile(config_path):
@@ -68,11 +127,44 @@ def main():
 
     # Load JSON information
     triggers = list(helpers.load_json(args.analysis, args.year, "triggers.json").keys())
+    if args.profile not in helpers.load_json(args.analysis, args.year, "profiles.json"):
+        parser.error(f"invalid profile: {args.profile}")
     if args.ntuples is not None:
         with open(args.ntuples) as infile:
             ntuples = json.load(infile)
+        catalog = catalogs.load_catalog(args.ntuples)
     else:
         ntuples = helpers.load_json(args.analysis, args.year, "ntuples.json")
+        catalog = catalogs.remove_stale_samples(
+            helpers.load_json(args.analysis, args.year, catalogs.get_catalog_path("ntuples.json"))
+        )
+
+    # Pack the input files of each sample into jobs, unless submitting one job per file
+    jobs = {}
+    packed = args.files_per_job != 1 or args.mb_per_job is not None or args.events_per_job is not None
+    if packed or args.dry_run:
+        file_sizes = catalogs.get_file_sizes(catalog)
+        file_entries = catalogs.get_file_entries(catalog)
+        for sample in ntuples:
+            if args.events_per_job is not None and not catalogs.is_cataloged(sample, ntuples[sample], catalog):
+                parser.error(f"no up-to-date catalog of {sample} to pack by events (see make_json.py --catalog)")
+            infiles = catalogs.get_sample_files(sample, ntuples[sample], catalog)
+            for infile in infiles:
+                if infile not in file_sizes:
+                    file_sizes[infile] = os.path.getsize(infile)
+            jobs[sample] = skimtools.pack_jobs(
+                infiles,
+                args.files_per_job,
+                int(args.mb_per_job * 1024**2) if args.mb_per_job is not None else None,
+                args.events_per_job,
+                file_sizes,
+                file_entries,
+            )
+
+    # Estimate the jobs of each sample without submitting, if specified
+    if args.dry_run:
+        print_estimate(jobs, file_sizes, file_entries, args.throughput * 1024**2, args.job_overhead)
+        return
 
     # Determine unique directory names (to avoid overwriting)
     args.submission_dir = helpers.get_unique_dirname(args.submission_dir)
@@ -82,24 +174,73 @@ def main():
     if not args.quiet:
         print(f"Setting up jobs for {list(ntuples.keys())}\n")
     os.mkdir(args.submission_dir)
+
+    # Pack kernel cache to ship with each job
+    extra_inputs = []
+    if args.kernel_cache is not None:
+        kernels_path = os.path.join(args.submission_dir, "kernels.tar.gz")
+        with tarfile.open(kernels_path, "w:gz") as kernels_tarball:
+            kernels_tarball.add(args.kernel_cache, arcname="kernels")
+        extra_inputs.append(kernels_path)
+
+    # Resolve configuration once to ship with each job
+    if args.bundle:
+        bundle_path = os.path.join(args.submission_dir, "bundle.json")
+        bundles.save_bundle(bundle_path, bundles.build_bundle(args.analysis, args.year))
+        extra_inputs.append(bundle_path)
+
     for sample in ntuples:
         job_dir = os.path.join(args.submission_dir, sample)
         os.mkdir(job_dir)
         if args.verbose:
             print(f"Created directory {job_dir}")
 
+        # List input files of packed jobs, with a list for each number of files per job
+        files_per_job = None
+        if packed:
+            buckets = skimtools.get_job_buckets(jobs[sample])
+            files_per_job = list(buckets)
+            for num_files, infiles in buckets.items():
+                with open(os.path.join(job_dir, f"inputs_{num_files}.txt"), "w") as outfile:
+                    outfile.writelines(f"{path.replace('/hdfs', '')}\n" for path in infiles)
+
+        # List input files from the catalog, if available, so they are not listed again with hdfs
+        elif catalogs.is_cataloged(sample, ntuples[sample], catalog):
+            infiles = catalogs.get_sample_files(sample, ntuples[sample], catalog)
+            with open(os.path.join(job_dir, "inputs.txt"), "w") as outfile:
+                outfile.writelines(f"{path.replace('/hdfs', '')}\n" for path in infiles)
+
         # Create farmout.sh file
         farmout_path = os.path.join(job_dir, "farmout.sh")
         with open(farmout_path, "w") as outfile:
             outfile.write(f"job_dir={job_dir}\n\n")
-            outfile.write(skimtools.build_farmout_command(ntuples[sample]).format(job_name=sample, **vars(args)))
+            farmout_command = skimtools.build_farmout_command(ntuples[sample], extra_inputs, files_per_job)
+            outfile.write(farmout_command.format(job_name=sample, **vars(args)))
 
         # Create skim.sh file
         with open(os.path.join(job_dir, "skim.sh"), "w") as outfile:
-            outfile.write(f"skim.py -v -a {args.analysis} -y {args.year} -I $INPUT -o $OUTPUT ")
+            if args.kernel_cache is not None:
+                outfile.write("tar xzf kernels.tar.gz\n")
+            if args.bundle:
+                outfile.write("skim.py -v --bundle bundle.json -I $INPUT -o $OUTPUT ")
+            else:
+                outfile.write(f"skim.py -v -a {args.analysis} -y {args.year} -I $INPUT -o $OUTPUT ")
+            outfile.write(f"-e {args.engine} --num-threads 1 -p {args.profile} ")
             if args.save_gen:
                 outfile.write("--save-gen ")
-            outfile.write(f"-t {skimtools.get_trigger(triggers, sample)} --json-dir {helpers.JSON_DIR}\n")
+            if args.single_pass:
+                outfile.write("--single-pass ")
+            if args.columnar:
+                outfile.write("--columnar ")
+            if args.metrics:
+                outfile.write("--metrics ")
+            if args.kernel_cache is not None:
+                outfile.write("--kernel-cache kernels ")
+            if args.cluster_index:
+                outfile.write("--cluster-index ")
+            if args.index_dir is not None:
+                outfile.write(f"--index-dir {os.path.abspath(args.index_dir)} ")
+            outfile.write(f"-t {skimconfig.get_trigger(triggers, sample)} --json-dir {helpers.JSON_DIR}\n")
 
         # Call farmout.sh file and pipe output to file
         if not args.test:
@@ -119,5 +260,33 @@ def main():
         print("\nDone.")
 
 
+def print_estimate(jobs: dict, file_sizes: dict, file_entries: dict, throughput: float, job_overhead: float):
+    """Print the number of jobs and expected runtime of each sample.
+
+    The runtime of each job is estimated as the startup time plus the time to read
+    its input files at the given throughput (in bytes/s). Entries are only shown for
+    cataloged files.
+    """
+    print(
+        f"{'Sample':<40} {'Files':>6} {'Jobs':>6} {'Size (GB)':>10} {'Entries':>12} "
+        f"{'Mean (min)':>11} {'Max (min)':>10}"
+    )
+    total_jobs, total_time = 0, 0.0
+    for sample, sample_jobs in jobs.items():
+        infiles = [infile for job in sample_jobs for infile in job]
+        times = [job_overhead + sum(file_sizes[infile] for infile in job) / throughput for job in sample_jobs]
+        entries = sum(file_entries.get(infile, 0) for infile in infiles)
+        mean_time = sum(times) / len(times) if times else 0.0
+        max_time = max(times, default=0.0)
+        print(
+            f"{sample:<40} {len(infiles):>6} {len(sample_jobs):>6} "
+            f"{sum(file_sizes[infile] for infile in infiles) / 1024**3:>10.2f} {entries:>12} "
+            f"{mean_time / 60:>11.1f} {max_time / 60:>10.1f}"
+        )
+        total_jobs += len(sample_jobs)
+        total_time += sum(times)
+    print(f"\nTotal: {total_jobs} job(s), {total_time / 3600:.1f} core-hours")
+
+
 if __name__ == "__main__":
     main()
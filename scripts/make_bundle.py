@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+
+from UWVV.VVAnalysis import bundles, helpers
+
+
+def main():
+    """Resolve the configuration of an analysis/year into a config bundle for skim.py --bundle.
+
+    The JSON files of the analysis are merged once, and the cutstring, aliases,
+    required branches, and selector inputs of every channel are resolved for every
+    trigger. The bundle is versioned and hashed, and the hash is saved in every file
+    skimmed with it.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=helpers.CustomHelpFormatter)
+    parser.add_argument("-a", "--analysis", default="ZZ4l", help="name of analysis")
+    parser.add_argument("-y", "--year", default="2022", help="year for analysis")
+    parser.add_argument("--json-dir", default=helpers.JSON_DIR, help="directory for JSON files")
+    parser.add_argument(
+        "-o", "--outfile", default=argparse.SUPPRESS, help="output file (default: <ANALYSIS><YEAR>.bundle.json)"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="print the contents of the bundle")
+    args = parser.parse_args()
+
+    # Error checking
+    if not os.path.isdir(os.path.join(args.json_dir, args.analysis)):
+        parser.error(f"invalid analysis: {args.analysis}")
+    if not os.path.isdir(os.path.join(args.json_dir, args.analysis, args.year)):
+        parser.error(f"invalid year for analysis {args.analysis}: {args.year}")
+
+    # Handle defaults
+    if "outfile" not in args:
+        args.outfile = bundles.get_bundle_path(args.analysis, args.year)
+
+    bundle = bundles.build_bundle(args.analysis, args.year, args.json_dir)
+    bundles.save_bundle(args.outfile, bundle)
+
+    if args.verbose:
+        for trigger, channels in bundle["channels"].items():
+            print(f"{trigger}: {', '.join(channels)}")
+    print(f"Bundle {bundle['hash'][:12]} written to {args.outfile}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import tqdm
+from UWVV.VVAnalysis import catalogs, fakerates, helpers, mergetools
+
+
+def main():
+    """Fill ZplusL fake-rate histograms for every skimmed sample in parallel using multiple cores.
+
+    Each skimmed file is processed by its own task, filling the histograms of every
+    channel into a partial output. Once all files of a sample are done, the partial
+    outputs are merged into <OUTPUT_DIR>/<SAMPLE>.root, with the histograms of each
+    channel stored in <SAMPLE>/<CHANNEL>/.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=helpers.CustomHelpFormatter)
+    parser.add_argument("-y", "--year", default="2022", help="year for analysis")
+    parser.add_argument("-q", "--quiet", action="store_true", help="disable all print statements")
+    parser.add_argument("-j", "--num-cores", type=int, default=1, help="number of cores to use")
+    parser.add_argument(
+        "--skimmed", default=argparse.SUPPRESS, help="skimmed JSON (default: json/ZplusL/<YEAR>/skimmed.json)"
+    )
+    parser.add_argument(
+        "-o", "--output-dir", default=argparse.SUPPRESS, help="output directory (default: ZplusL<YEAR>FakeRates/)"
+    )
+    args = parser.parse_args()
+
+    # Error checking
+    if not os.path.isdir(os.path.join(helpers.JSON_DIR, "ZplusL", args.year)):
+        parser.error(f"invalid year for analysis ZplusL: {args.year}")
+    if args.num_cores <= 0:
+        parser.error(f"invalid number of cores: {args.num_cores}")
+    if "skimmed" in args and not os.path.isfile(args.skimmed):
+        parser.error(f"invalid skimmed JSON: {args.skimmed}")
+
+    # Handle defaults
+    if "output_dir" not in args:
+        args.output_dir = f"ZplusL{args.year}FakeRates"
+
+    # Load JSON information
+    if "skimmed" in args:
+        with open(args.skimmed) as infile:
+            skimmed = json.load(infile)
+        catalog = catalogs.load_catalog(args.skimmed)
+    else:
+        skimmed = helpers.load_json("ZplusL", args.year, "skimmed.json")
+        catalog = catalogs.remove_stale_samples(
+            helpers.load_json("ZplusL", args.year, catalogs.get_catalog_path("skimmed.json"))
+        )
+    file_sizes = catalogs.get_file_sizes(catalog)
+
+    # Determine unique directory names (to avoid overwriting)
+    args.output_dir = helpers.get_unique_dirname(args.output_dir)
+    os.makedirs(args.output_dir)
+    partial_dir = tempfile.mkdtemp(prefix="partial_", dir=args.output_dir)
+
+    # Process each file of each sample as its own task
+    samples = {}
+    tasks = []
+    num_samples = len(skimmed)
+    for i, sample in enumerate(skimmed):
+        infiles = catalogs.get_sample_files(sample, skimmed[sample], catalog)
+
+        if not args.quiet:
+            print(f"{i + 1}/{num_samples} Found {len(infiles)} file(s) for {sample}")
+
+        if not infiles:
+            continue
+        partials = [os.path.join(partial_dir, f"{sample}_{j + 1}.root") for j in range(len(infiles))]
+        samples[sample] = {"partials": partials, "remaining": len(infiles)}
+        tasks += list(zip([sample] * len(infiles), infiles, partials))
+
+    # Process the largest files first, so the smallest files fill in the tail of the run
+    for task in tasks:
+        if task[1] not in file_sizes:
+            file_sizes[task[1]] = os.path.getsize(task[1])
+    tasks.sort(key=lambda task: file_sizes[task[1]], reverse=True)
+
+    failed = []
+    try:
+        with multiprocessing.Pool(processes=args.num_cores) as pool:
+            results = pool.imap_unordered(call_fill, tasks)
+            if not args.quiet:
+                print(f"\nProcessing {len(tasks)} file(s) from {len(samples)} sample(s)")
+                results = tqdm.tqdm(results, total=len(tasks))
+
+            for sample, _ in results:
+                info = samples[sample]
+
+                # Merge the histograms of a sample once all its files are processed
+                info["remaining"] -= 1
+                if info["remaining"] > 0:
+                    continue
+                outfile = os.path.join(args.output_dir, f"{sample}.root")
+                if not merge(info["partials"], outfile):
+                    failed.append(outfile)
+                elif not args.quiet:
+                    results.write(f"Finished {sample}")
+    finally:
+        shutil.rmtree(partial_dir)
+
+    if failed:
+        raise RuntimeError(f"failed to merge {len(failed)} file(s): {', '.join(failed)}")
+
+
+def call_fill(args: tuple) -> tuple:
+    """Unpack tuple of arguments and call fakerates.fill_histograms(), returning the sample with the result."""
+    return args[0], fakerates.fill_histograms(*args)
+
+
+def merge(infiles: list, outfile: str) -> bool:
+    """Merge the partial histograms of a sample, returning whether the merge was successful."""
+    # Determine temporary output file path
+    # (Temporary file needed for saving in /hdfs/store/...)
+    temp_file = f"temp_fake_rates_{os.path.basename(outfile)}"
+
+    # Merge files and move to target directory
+    success = mergetools.merge_files(infiles, temp_file)
+    if success:
+        shutil.move(temp_file, outfile)
+    elif os.path.isfile(temp_file):
+        os.remove(temp_file)
+    return success
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ import glob
 import json
 import os
 
-from UWVV.VVAnalysis import helpers
+from UWVV.VVAnalysis import catalogs, helpers
 
 
 def main():
@@ -20,11 +20,34 @@ def main():
     In skimmed mode, the base directory containing output files from skimming all
     the above-mentioned UWVV ntuples can be provided to create the relevant
     skimmed.json file to use for merging/plotting.
+
+    With --catalog, every file matching the output JSON is also scanned once, and its
+    path, size, and entries per channel are saved to a sidecar <MODE>.catalog.json
+    file. The skimming, merging, and fake-rate scripts then use the catalog instead
+    of listing the directories again.
+
+    With --cluster-index, the minimum and maximum of each branch used by the cuts of
+    any trigger are also saved for each cluster of each file, so skim.py
+    --cluster-index skips the clusters that cannot pass without indexing them first.
     """
     parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=helpers.CustomHelpFormatter)
     parser.add_argument("-a", "--analysis", default="ZZ4l", help="name of analysis")
     parser.add_argument("-y", "--year", default="2022", help="year for analysis")
     parser.add_argument("-v", "--verbose", action="store_true", help="more print statements")
+    parser.add_argument(
+        "-c", "--catalog", action="store_true", help="also catalog the files, sizes, and entries of each sample"
+    )
+    parser.add_argument(
+        "--cluster-index", action="store_true", help="also index the min/max of the cut branches in each cluster"
+    )
+    parser.add_argument("--index-dir", help="directory for cluster indexes (default: next to each input file)")
+    parser.add_argument(
+        "-j",
+        "--num-workers",
+        type=int,
+        default=catalogs.NUM_WORKERS,
+        help="number of threads/processes to catalog and index with",
+    )
     parser.add_argument(
         "-o", "--outfile", default=argparse.SUPPRESS, help="output file (default: json/<ANALYSIS>/<YEAR>/<MODE>.json)"
     )
@@ -50,6 +73,8 @@ def main():
         parser.error(f"invalid analysis: {args.analysis}")
     if not os.path.isdir(os.path.join(helpers.JSON_DIR, args.analysis, args.year)):
         parser.error(f"invalid year for analysis {args.analysis}: {args.year}")
+    if args.num_workers <= 0:
+        parser.error(f"invalid number of workers: {args.num_workers}")
 
     # Load JSON information
     streams = [key for key in helpers.load_json(args.analysis, args.year, "triggers.json") if key != "MonteCarlo"]
@@ -107,6 +132,37 @@ def main():
         json.dump(result, outfile, indent=2)
         outfile.write("\n")
 
+    # Catalog the files of each sample, if specified
+    catalog = None
+    if args.catalog:
+        catalog = catalogs.build_catalog(result, helpers.get_channels(args.analysis), args.num_workers, args.verbose)
+        catalogs.save_catalog(args.outfile, catalog)
+        if args.verbose:
+            print(f"Catalog written to {catalogs.get_catalog_path(args.outfile)}")
+
+    # Index the clusters of each file for the cuts of every trigger, if specified
+    if args.cluster_index:
+        # Imported here, so only indexing needs uproot
+        from UWVV.VVAnalysis import indexes, skimconfig  # noqa: PLC0415
+
+        cutinfo = helpers.load_json(args.analysis, args.year, "cuts.json")
+        aliases = helpers.load_json(args.analysis, args.year, "aliases.json")
+        triggers = helpers.load_json(args.analysis, args.year, "triggers.json")
+        branches = {}
+        for channel in helpers.get_channels(args.analysis):
+            cutstring = skimconfig.build_cutstring(cutinfo, channel)
+            channel_aliases = aliases["Event"] | aliases["Channel"][channel]
+            branches[channel] = set().union(
+                *(
+                    indexes.get_cut_branches(f"{cutstring} && ({selection})", channel_aliases)
+                    for selection in triggers.values()
+                )
+            )
+        paths = sorted(
+            {path for sample in result for path in catalogs.get_sample_files(sample, result[sample], catalog)}
+        )
+        indexes.build_indexes(paths, branches, args.index_dir, args.num_workers, args.verbose)
+
 
 if __name__ == "__main__":
     main()
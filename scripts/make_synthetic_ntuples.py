@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+
+from UWVV.VVAnalysis import helpers, synthetic
+
+
+def main():
+    """Write synthetic UWVV ntuples locally, to test and benchmark skimming without access to /hdfs.
+
+    The channel trees contain every branch used by the cuts, aliases, triggers, and
+    selectors of the analysis, with several combinatoric candidates per event. A
+    <channel>Gen tree per channel and a metaInfo tree are also written. The files are
+    listed in <OUTPUT_DIR>/ntuples.json, which can be passed to multi_skim.py with
+    --ntuples.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=helpers.CustomHelpFormatter)
+    parser.add_argument("-a", "--analysis", default="ZZ4l", help="name of analysis")
+    parser.add_argument("-y", "--year", default="2022", help="year for analysis")
+    parser.add_argument("-s", "--sample", default="synthetic", help="name of sample (use data_<TRIGGER>_... for data)")
+    parser.add_argument("-f", "--num-files", type=int, default=1, help="number of files to write")
+    parser.add_argument("-n", "--num-events", type=int, default=10000, help="number of events per channel per file")
+    parser.add_argument("--candidates", type=float, default=2.0, help="mean number of candidates per event")
+    parser.add_argument("--extra-branches", type=int, default=100, help="number of unused branches per channel tree")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random number generator")
+    parser.add_argument("--json-dir", default=helpers.JSON_DIR, help="directory for JSON files")
+    parser.add_argument("-o", "--output-dir", default="synthetic", help="output directory")
+    args = parser.parse_args()
+
+    # Error checking
+    if not os.path.isdir(os.path.join(args.json_dir, args.analysis)):
+        parser.error(f"invalid analysis: {args.analysis}")
+    if not os.path.isdir(os.path.join(args.json_dir, args.analysis, args.year)):
+        parser.error(f"invalid year for analysis {args.analysis}: {args.year}")
+    if args.num_files <= 0:
+        parser.error(f"invalid number of files: {args.num_files}")
+    if args.num_events <= 0:
+        parser.error(f"invalid number of events: {args.num_events}")
+    if args.candidates < 1:
+        parser.error(f"invalid mean number of candidates: {args.candidates}")
+    if args.extra_branches < 0:
+        parser.error(f"invalid number of extra branches: {args.extra_branches}")
+
+    result = synthetic.generate_ntuples(
+        args.output_dir,
+        args.analysis,
+        args.year,
+        args.sample,
+        args.num_files,
+        args.num_events,
+        args.candidates,
+        args.extra_branches,
+        args.seed,
+        args.json_dir,
+    )
+    print(f"Wrote {result['events']} events ({result['entries']} entries) to {len(result['files'])} file(s)")
+    print(f"Listed in {os.path.join(args.output_dir, 'ntuples.json')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+
+import tqdm
+from UWVV.VVAnalysis import catalogs, helpers, mergetools
+
+
+def main():
+    """Merge the skimmed files of each sample in parallel using multiple cores."""
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=helpers.CustomHelpFormatter)
+    parser.add_argument("-a", "--analysis", default="ZZ4l", help="name of analysis")
+    parser.add_argument("-y", "--year", default="2022", help="year for analysis")
+    parser.add_argument("-q", "--quiet", action="store_true", help="disable all print statements")
+    parser.add_argument("-j", "--num-cores", type=int, default=1, help="number of samples to merge at once")
+    parser.add_argument(
+        "--max-open-files",
+        type=int,
+        default=mergetools.MAX_OPEN_FILES,
+        help="maximum number of input files open at once, shared between all cores",
+    )
+    parser.add_argument(
+        "--max-size", type=float, help="target size of each merged file in MB (default: one file per sample)"
+    )
+    parser.add_argument(
+        "--skimmed", default=argparse.SUPPRESS, help="skimmed JSON (default: json/<ANALYSIS>/<YEAR>/skimmed.json)"
+    )
+    parser.add_argument(
+        "-o", "--output-dir", default=argparse.SUPPRESS, help="output directory (default: <ANALYSIS><YEAR>Merged/)"
+    )
+    args = parser.parse_args()
+
+    # Error checking
+    if not os.path.isdir(os.path.join(helpers.JSON_DIR, args.analysis)):
+        parser.error(f"invalid analysis: {args.analysis}")
+    if not os.path.isdir(os.path.join(helpers.JSON_DIR, args.analysis, args.year)):
+        parser.error(f"invalid year for analysis {args.analysis}: {args.year}")
+    if args.num_cores <= 0:
+        parser.error(f"invalid number of cores: {args.num_cores}")
+    if args.max_open_files < 2 * args.num_cores:
+        parser.error(f"need at least two open files per core: {args.max_open_files}")
+    if args.max_size is not None and args.max_size <= 0:
+        parser.error(f"invalid target size: {args.max_size}")
+    if "skimmed" in args and not os.path.isfile(args.skimmed):
+        parser.error(f"invalid skimmed JSON: {args.skimmed}")
+
+    # Handle defaults
+    if "output_dir" not in args:
+        args.output_dir = f"{args.analysis}{args.year}Merged"
+    max_size = int(args.max_size * 1024**2) if args.max_size is not None else None
+
+    # Load JSON information
+    if "skimmed" in args:
+        with open(args.skimmed) as infile:
+            skimmed = json.load(infile)
+        catalog = catalogs.load_catalog(args.skimmed)
+    else:
+        skimmed = helpers.load_json(args.analysis, args.year, "skimmed.json")
+        catalog = catalogs.remove_stale_samples(
+            helpers.load_json(args.analysis, args.year, catalogs.get_catalog_path("skimmed.json"))
+        )
+    file_sizes = catalogs.get_file_sizes(catalog)
+
+    # Determine unique directory names (to avoid overwriting)
+    args.output_dir = helpers.get_unique_dirname(args.output_dir)
+    os.makedirs(args.output_dir)
+
+    # Split the files of each sample into groups, one per merged file
+    tasks = []
+    num_samples = len(skimmed)
+    for i, sample in enumerate(skimmed):
+        infiles = catalogs.get_sample_files(sample, skimmed[sample], catalog)
+        groups = mergetools.group_files(infiles, max_size, file_sizes)
+
+        if not args.quiet:
+            print(f"{i + 1}/{num_samples} Found {len(infiles)} file(s) for {sample} ({len(groups)} merged file(s))")
+
+        for j, group in enumerate(groups):
+            basename = f"{sample}.root" if len(groups) == 1 else f"{sample}_{j + 1}.root"
+            tasks.append((group, os.path.join(args.output_dir, basename), args.max_open_files // args.num_cores))
+
+    # Merge the largest groups first, so the smallest groups fill in the tail of the run
+    for path in {path for task in tasks for path in task[0]} - file_sizes.keys():
+        file_sizes[path] = os.path.getsize(path)
+    tasks.sort(key=lambda task: sum(file_sizes[path] for path in task[0]), reverse=True)
+
+    failed = []
+    with multiprocessing.Pool(processes=args.num_cores) as pool:
+        results = pool.imap_unordered(call_merge, tasks)
+        if not args.quiet:
+            print(f"\nMerging {len(tasks)} file(s) from {num_samples} sample(s)")
+            results = tqdm.tqdm(results, total=len(tasks))
+
+        for outfile, success in results:
+            if not success:
+                failed.append(outfile)
+            elif not args.quiet:
+                results.write(f"Finished {os.path.basename(outfile)}")
+
+    if failed:
+        raise RuntimeError(f"failed to merge {len(failed)} file(s): {', '.join(failed)}")
+
+
+def call_merge(args: tuple) -> tuple:
+    """Unpack tuple of arguments and call merge(), returning the output file with the result."""
+    return args[1], merge(*args)
+
+
+def merge(infiles: list, outfile: str, max_open_files: int) -> bool:
+    """Merge a group of files, returning whether the merge was successful."""
+    # Determine temporary output file path
+    # (Temporary file needed for saving in /hdfs/store/...)
+    temp_file = f"temp_merged_{os.path.basename(outfile)}"
+
+    # Merge files and move to target directory
+    success = mergetools.merge_files(infiles, temp_file, max_open_files)
+    if success:
+        shutil.move(temp_file, outfile)
+    elif os.path.isfile(temp_file):
+        os.remove(temp_file)
+    return success
+
+
+if __name__ == "__main__":
+    main()
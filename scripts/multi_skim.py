@@ -3,24 +3,64 @@
 import argparse
 import configparser
 import datetime
-import glob
 import json
 import multiprocessing
 import os
 import shutil
+import time
 
 import tqdm
-from UWVV.VVAnalysis import helpers, skimtools
+from UWVV.VVAnalysis import catalogs, helpers, metrics, skimconfig
+
+# Configuration shared by every task of a worker process, set by init_worker()
+worker_config = {}
+
+# Manifests are saved after this many skimmed files or seconds, whichever comes first, and when the run ends
+MANIFEST_SAVE_FILES = 50
+MANIFEST_SAVE_SECONDS = 60
 
 
 def main():
     """Process skim.py jobs in parallel using multiple cores."""
     parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=helpers.CustomHelpFormatter)
-    parser.add_argument("-a", "--analysis", default="ZZ4l", help="name of analysis")
+    parser.add_argument(
+        "-a", "--analysis", nargs="+", default=["ZZ4l"], help="name of analysis (several are skimmed in one read)"
+    )
     parser.add_argument("-y", "--year", default="2022", help="year for analysis")
     parser.add_argument("-g", "--save-gen", action="store_true", help="save gen trees")
     parser.add_argument("-q", "--quiet", action="store_true", help="disable all print statements")
     parser.add_argument("-j", "--num-cores", type=int, required=True, help="number of cores to use")
+    parser.add_argument(
+        "--single-pass", action="store_true", help="apply cuts and selector together, copying only the best candidates"
+    )
+    parser.add_argument(
+        "--columnar", action="store_true", help="select the best candidates with vectorized passes over columns"
+    )
+    parser.add_argument(
+        "-e", "--engine", default="tree", choices=["tree", "rdf", "numpy"], help="engine used to apply cuts"
+    )
+    parser.add_argument("--kernel-cache", help="directory to cache compiled cuts for the rdf engine")
+    parser.add_argument(
+        "--cluster-index",
+        action="store_true",
+        help="skip clusters that cannot pass the cuts, using the min/max index of each input file (built if missing)",
+    )
+    parser.add_argument("--index-dir", help="directory for cluster indexes (default: next to each input file)")
+    parser.add_argument("--cutflow", action="store_true", help="save cutflow and timing of each cut per sample")
+    parser.add_argument(
+        "--metrics", action="store_true", help="save timing, memory, and I/O of each stage next to each output file"
+    )
+    parser.add_argument(
+        "-p",
+        "--profile",
+        default=skimconfig.DEFAULT_PROFILE,
+        help="compression and clustering profile of the output files",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="reuse the output directory, skipping files already skimmed with the same configuration",
+    )
     parser.add_argument(
         "--ntuples", default=argparse.SUPPRESS, help="ntuple JSON (default: json/<ANALYSIS>/<YEAR>/ntuples.json)"
     )
@@ -28,17 +68,23 @@ def main():
         "-o",
         "--output-dir",
         default=argparse.SUPPRESS,
-        help="output directory (default: /hdfs/store/user/<CERN_USERNAME>/<ANALYSIS><YEAR>AnalysisJobs_<DATE>/)",
+        help="output directory, with a subdirectory per analysis if several are given "
+        "(default: /hdfs/store/user/<CERN_USERNAME>/<ANALYSIS><YEAR>AnalysisJobs_<DATE>/)",
     )
     args = parser.parse_args()
 
     # Error checking
-    if not os.path.isdir(os.path.join(helpers.JSON_DIR, args.analysis)):
-        parser.error(f"invalid analysis: {args.analysis}")
-    if not os.path.isdir(os.path.join(helpers.JSON_DIR, args.analysis, args.year)):
-        parser.error(f"invalid year for analysis {args.analysis}: {args.year}")
+    if len(set(args.analysis)) != len(args.analysis):
+        parser.error(f"duplicate analyses: {' '.join(args.analysis)}")
+    for analysis in args.analysis:
+        if not os.path.isdir(os.path.join(helpers.JSON_DIR, analysis)):
+            parser.error(f"invalid analysis: {analysis}")
+        if not os.path.isdir(os.path.join(helpers.JSON_DIR, analysis, args.year)):
+            parser.error(f"invalid year for analysis {analysis}: {args.year}")
     if args.num_cores <= 0:
         parser.error(f"invalid number of cores: {args.num_cores}")
+    if args.cluster_index and (args.engine == "rdf" or (args.engine == "tree" and args.columnar)):
+        parser.error("--cluster-index is not supported by the rdf engine or by --columnar with the tree engine")
     if "ntuples" in args and not os.path.isfile(args.ntuples):
         parser.error(f"invalid ntuples JSON: {args.ntuples}")
 
@@ -52,96 +98,342 @@ def main():
 
     # Handle defaults
     date = f"{datetime.date.today():%Y-%m-%d}"
-    if "ntuples" not in args:
-        args.ntuples = None
-    if "output_dir" not in args:
-        args.output_dir = (
-            f"/hdfs/store/user/{settings['farmout']['cern_username']}/{args.analysis}{args.year}AnalysisJobs_{date}"
-        )
-
-    # Load JSON information
-    args.cutinfo = helpers.load_json(args.analysis, args.year, "cuts.json")
-    args.aliases = helpers.load_json(args.analysis, args.year, "aliases.json")
-    args.triggers = helpers.load_json(args.analysis, args.year, "triggers.json")
-    if args.ntuples is not None:
+    if "ntuples" in args:
+        ntuples_catalog = catalogs.load_catalog(args.ntuples)
         with open(args.ntuples) as infile:
             args.ntuples = json.load(infile)
     else:
-        args.ntuples = helpers.load_json(args.analysis, args.year, "ntuples.json")
+        args.ntuples = None
 
-    # Determine unique directory names (to avoid overwriting)
-    args.output_dir = helpers.get_unique_dirname(args.output_dir)
+    # Load JSON information for each analysis
+    analyses = {}
+    for analysis in args.analysis:
+        config = {
+            "cutinfo": helpers.load_json(analysis, args.year, "cuts.json"),
+            "aliases": helpers.load_json(analysis, args.year, "aliases.json"),
+            "triggers": helpers.load_json(analysis, args.year, "triggers.json"),
+            "branchinfo": helpers.load_json(analysis, args.year, "branches.json"),
+        }
+        output_profiles = helpers.load_json(analysis, args.year, "profiles.json")
+        if args.profile not in output_profiles:
+            parser.error(f"invalid profile for analysis {analysis}: {args.profile}")
+        config["profile"] = output_profiles[args.profile]
+        if args.ntuples is not None:
+            config["ntuples"] = args.ntuples
+            config["catalog"] = ntuples_catalog
+        else:
+            config["ntuples"] = helpers.load_json(analysis, args.year, "ntuples.json")
+            config["catalog"] = catalogs.remove_stale_samples(
+                helpers.load_json(analysis, args.year, catalogs.get_catalog_path("ntuples.json"))
+            )
 
-    # Process each dataset
-    num_samples = len(args.ntuples)
-    for i, sample in enumerate(args.ntuples):
-        # Get list of files to process and determine the trigger
-        infiles = [infile for path in args.ntuples[sample] for infile in glob.iglob(path)]
-        trigger = skimtools.get_trigger(list(args.triggers.keys()), sample)
+        # Determine output directory of each analysis
+        if "output_dir" not in args:
+            output_dir = (
+                f"/hdfs/store/user/{settings['farmout']['cern_username']}/{analysis}{args.year}AnalysisJobs_{date}"
+            )
+        elif len(args.analysis) > 1:
+            output_dir = os.path.join(args.output_dir, analysis)
+        else:
+            output_dir = args.output_dir
 
-        if not args.quiet:
-            print(f"\n{i+1}/{num_samples} Processing {sample} ({trigger})")
+        # Determine unique directory names (to avoid overwriting)
+        if not args.incremental:
+            output_dir = helpers.get_unique_dirname(output_dir)
+        config["output_dir"] = output_dir
 
-        # Skip any skim calls if there are no input files
-        if not infiles:
-            continue
+        # Hash the resolved configuration, so outputs of a different configuration are not reused
+        config["hash"] = helpers.get_config_hash(
+            analysis,
+            args.year,
+            args.save_gen,
+            config["cutinfo"],
+            config["aliases"],
+            config["triggers"],
+            config["branchinfo"],
+            config["profile"],
+        )
+        analyses[analysis] = config
 
-        # Create output directory as needed
-        output_dir = os.path.join(args.output_dir, sample)
-        os.makedirs(output_dir, exist_ok=True)
+    # Determine the files to process for each sample of each analysis
+    # (Files listed by several analyses are skimmed for all of them in a single read)
+    # (Files listed by several samples of the same analysis are skimmed once for each sample)
+    samples = {}
+    targets = {}
+    for analysis, config in analyses.items():
+        num_samples = len(config["ntuples"])
+        for i, sample in enumerate(config["ntuples"]):
+            # Get list of files to process (from the catalog, if available) and determine the trigger
+            infiles = catalogs.get_sample_files(sample, config["ntuples"][sample], config["catalog"])
+            trigger = skimconfig.get_trigger(list(config["triggers"].keys()), sample)
 
-        # Use multiple cores to call skim.py for each dataset
-        with multiprocessing.Pool(processes=args.num_cores) as pool:
             if not args.quiet:
-                list(
-                    tqdm.tqdm(
-                        pool.imap(
-                            call_skim,
-                            [(args, sample, infile, output_dir, trigger) for infile in infiles],
-                        ),
-                        total=len(infiles),
-                    )
-                )
-            else:
-                pool.map(
-                    call_skim,
-                    [(args, sample, infile, output_dir, trigger) for infile in infiles],
-                )
-
-
-def call_skim(args: tuple):
-    """Unpack tuple of arguments and call skim()."""
-    skim(*args)
-
-
-def skim(
-    args: argparse.Namespace,
-    sample: str,
-    infile: str,
-    output_dir: str,
-    trigger: str,
-):
-    """Skim file one at a time with the given inputs."""
-    # Determine output file path
-    # (Temporary file needed for saving in /hdfs/store/...)
+                print(f"{i + 1}/{num_samples} Found {len(infiles)} file(s) for {sample} ({analysis}, {trigger})")
+
+            # Skip any skim calls if there are no input files
+            if not infiles:
+                continue
+
+            # Create output directory as needed
+            output_dir = os.path.join(config["output_dir"], sample)
+            os.makedirs(output_dir, exist_ok=True)
+
+            # Skip files whose output matches the manifest, if specified
+            manifest_path = os.path.join(output_dir, "manifest.json")
+            manifest = helpers.load_manifest(manifest_path) if args.incremental else {}
+            skipped_files = {infile for infile in infiles if is_skimmed(manifest, infile, trigger, config["hash"])}
+            infiles = [infile for infile in infiles if infile not in skipped_files]
+            if not args.quiet and skipped_files:
+                print(f"  Skipping {len(skipped_files)} file(s) already skimmed")
+
+            # Include cutflows of skipped files in the sample cutflow
+            cutflows = []
+            if args.cutflow:
+                for infile in skipped_files:
+                    cutflow_path = skimconfig.get_cutflow_path(manifest[infile]["outfile"])
+                    if os.path.isfile(cutflow_path):
+                        with open(cutflow_path) as cutflow_file:
+                            cutflows.append(json.load(cutflow_file))
+
+            samples[analysis, sample] = {
+                "output_dir": output_dir,
+                "manifest_path": manifest_path,
+                "manifest": manifest,
+                "trigger": trigger,
+                "cutflows": cutflows,
+                "remaining": len(infiles),
+            }
+            for infile in infiles:
+                targets.setdefault(infile, []).append((analysis, sample, trigger))
+            if not infiles and args.cutflow:
+                save_cutflow(output_dir, cutflows)
+
+    # Process the largest files first, so the smallest files fill in the tail of the run
+    file_sizes = {}
+    for config in analyses.values():
+        file_sizes |= catalogs.get_file_sizes(config["catalog"])
+    for infile in targets:
+        if infile not in file_sizes:
+            file_sizes[infile] = os.path.getsize(infile)
+    tasks = sorted(targets.items(), key=lambda task: file_sizes[task[0]], reverse=True)
+
+    # Only send the options needed by the workers, rather than the full arguments
+    options = argparse.Namespace(
+        year=args.year,
+        save_gen=args.save_gen,
+        engine=args.engine,
+        single_pass=args.single_pass,
+        columnar=args.columnar,
+        kernel_cache=args.kernel_cache,
+        cluster_index=args.cluster_index,
+        index_dir=args.index_dir,
+        cutflow=args.cutflow,
+        metrics=args.metrics,
+    )
+    worker_analyses = {
+        analysis: {
+            key: config[key] for key in ("cutinfo", "aliases", "triggers", "branchinfo", "profile", "output_dir")
+        }
+        for analysis, config in analyses.items()
+    }
+    used_triggers = {
+        analysis: sorted({trigger for _, target in tasks for name, _, trigger in target if name == analysis})
+        for analysis in analyses
+    }
+
+    # Use one pool of workers for the files of every sample
+    num_finished = sum(info["remaining"] == 0 for info in samples.values())
+    initargs = (options, worker_analyses, used_triggers)
+    with multiprocessing.Pool(processes=args.num_cores, initializer=init_worker, initargs=initargs) as pool:
+        results = pool.imap_unordered(call_skim, tasks)
+        if not args.quiet:
+            print(f"\nProcessing {len(tasks)} file(s) from {len(samples) - num_finished} sample(s)")
+            results = tqdm.tqdm(results, total=len(tasks))
+
+        # Record each file in the manifest as soon as it is skimmed, but only save the manifests in batches, since
+        # rewriting them after every file is slow for large samples (especially on /hdfs)
+        unsaved_samples = set()
+        unsaved_files = 0
+        last_save = time.monotonic()
+        try:
+            for infile, target, cutflows in results:
+                for analysis, sample, trigger in target:
+                    info = samples[analysis, sample]
+                    info["manifest"][infile] = {
+                        "outfile": os.path.join(info["output_dir"], os.path.basename(infile)),
+                        "trigger": trigger,
+                        "config": analyses[analysis]["hash"],
+                        **helpers.get_file_signature(infile),
+                    }
+                    unsaved_samples.add((analysis, sample))
+                    info["cutflows"].append(cutflows[analysis, sample])
+
+                    # Report progress per sample and aggregate cutflows once all files are skimmed
+                    info["remaining"] -= 1
+                    if info["remaining"] == 0:
+                        num_finished += 1
+                        if args.cutflow:
+                            save_cutflow(info["output_dir"], info["cutflows"])
+                        if not args.quiet:
+                            results.write(f"Finished {sample} ({analysis}, {num_finished}/{len(samples)} samples)")
+
+                unsaved_files += 1
+                if unsaved_files >= MANIFEST_SAVE_FILES or time.monotonic() - last_save >= MANIFEST_SAVE_SECONDS:
+                    save_manifests(samples, unsaved_samples)
+                    unsaved_files = 0
+                    last_save = time.monotonic()
+        finally:
+            # Keep the files skimmed so far, even if the run is interrupted or fails
+            save_manifests(samples, unsaved_samples)
+
+
+def save_manifests(samples: dict, keys: set):
+    """Save the manifest of each of the given (analysis, sample) pairs, and mark them as saved."""
+    for key in sorted(keys):
+        helpers.save_manifest(samples[key]["manifest_path"], samples[key]["manifest"])
+    keys.clear()
+
+
+def save_cutflow(output_dir: str, cutflows: list):
+    """Aggregate cutflows of each file for a sample and save them in its output directory."""
+    sample_cutflow = {}
+    for cutflow in cutflows:
+        skimconfig.merge_cutflows(sample_cutflow, cutflow)
+    with open(os.path.join(output_dir, "cutflow.json"), "w") as outfile:
+        json.dump(sample_cutflow, outfile, indent=2)
+        outfile.write("\n")
+
+
+def is_skimmed(manifest: dict, infile: str, trigger: str, config_hash: str) -> bool:
+    """Check whether an input file was already skimmed with the same configuration."""
+    if infile not in manifest:
+        return False
+    entry = manifest[infile]
+    return (
+        entry["trigger"] == trigger
+        and entry["config"] == config_hash
+        and {"size": entry["size"], "mtime": entry["mtime"]} == helpers.get_file_signature(infile)
+        and os.path.isfile(entry["outfile"])
+    )
+
+
+def init_worker(options: argparse.Namespace, analyses: dict, used_triggers: dict):
+    """Store the skim configuration and resolve the cuts of each trigger once per worker process."""
+    worker_config["options"] = options
+    worker_config["analyses"] = analyses
+
+    for analysis, config in analyses.items():
+        config["channels"] = {
+            trigger: skimconfig.resolve_channels(
+                analysis, trigger, config["cutinfo"], config["aliases"], config["triggers"]
+            )
+            for trigger in used_triggers[analysis]
+        }
+
+        # Load the selector dictionaries into this process, which the numpy engine doesn't use
+        # (Imported here, so the numpy engine runs without ROOT)
+        if options.engine != "numpy":
+            from UWVV.VVAnalysis import skimtools  # noqa: PLC0415
+
+            skimtools.load_selectors(analysis)
+
+
+def call_skim(args: tuple) -> tuple:
+    """Unpack tuple of arguments and call skim(), returning the input file and its targets with the result."""
+    return args[0], args[1], skim(*args)
+
+
+def skim(infile: str, target: list) -> dict:
+    """Skim a file for each of its targets with the worker configuration, returning the cutflows if requested.
+
+    The target lists the (analysis, sample, trigger) of each sample the file belongs
+    to. The file is read once for all of its analyses, and once more for each extra
+    sample of the same analysis. The cutflows are keyed by (analysis, sample).
+    """
+    # Split the targets into rounds with at most one sample per analysis, since each round is skimmed in one read
+    rounds = []
+    for analysis, sample, trigger in target:
+        for targets in rounds:
+            if analysis not in targets:
+                break
+        else:
+            targets = {}
+            rounds.append(targets)
+        targets[analysis] = (sample, trigger)
+
+    cutflows = {}
+    for targets in rounds:
+        cutflows |= skim_round(infile, targets)
+    return cutflows
+
+
+def skim_round(infile: str, targets: dict) -> dict:
+    """Skim a file in a single read, for the sample and trigger each analysis of the targets maps to."""
+    args = worker_config["options"]
+
+    # Determine output file paths of each analysis
+    # (Temporary files needed for saving in /hdfs/store/...)
     basename = os.path.basename(infile)
-    temp_file = f"temp_{sample}_{basename}"
-    outfile = os.path.join(output_dir, basename)
+    analyses = {}
+    outfiles = {}
+    for analysis, (sample, trigger) in targets.items():
+        config = worker_config["analyses"][analysis]
+        outfiles[analysis] = os.path.join(config["output_dir"], sample, basename)
+        analyses[analysis] = {
+            "outfile": f"temp_{analysis}_{sample}_{basename}",
+            "trigger": trigger,
+            "cutinfo": config["cutinfo"],
+            "aliases": config["aliases"],
+            "triggers": config["triggers"],
+            "branchinfo": config["branchinfo"],
+            "channels": config["channels"][trigger],
+            "profile": config["profile"],
+        }
 
     # Initialize arguments to pass to skimmer
     skim_args = argparse.Namespace(
-        analysis=args.analysis,
         year=args.year,
-        trigger=trigger,
         save_gen=args.save_gen,
+        engine=args.engine,
+        single_pass=args.single_pass,
+        columnar=args.columnar,
+        num_threads=1,
+        kernel_cache=args.kernel_cache,
+        cluster_index=args.cluster_index,
+        index_dir=args.index_dir,
+        cutflow=args.cutflow,
+        metrics=args.metrics,
         verbose=False,
         infiles=[infile],
-        outfile=temp_file,
     )
 
-    # Skim file and move to target directory
-    skimtools.skim(skim_args, args.cutinfo, args.aliases, args.triggers)
-    shutil.move(temp_file, outfile)
+    # Skim file and move outputs to target directories
+    # (Imported here, so the numpy engine runs without ROOT)
+    if args.engine == "numpy":
+        from UWVV.VVAnalysis import vectorized  # noqa: PLC0415
+
+        vectorized.skim_analyses(skim_args, analyses)
+    else:
+        from UWVV.VVAnalysis import skimtools  # noqa: PLC0415
+
+        skimtools.skim_analyses(skim_args, analyses)
+    cutflows = {}
+    for analysis, config in analyses.items():
+        temp_file = config["outfile"]
+        shutil.move(temp_file, outfiles[analysis])
+
+        # Move cutflow next to output file
+        key = (analysis, targets[analysis][0])
+        cutflows[key] = None
+        if args.cutflow:
+            with open(skimconfig.get_cutflow_path(temp_file)) as cutflow_file:
+                cutflows[key] = json.load(cutflow_file)
+            shutil.move(skimconfig.get_cutflow_path(temp_file), skimconfig.get_cutflow_path(outfiles[analysis]))
+
+        # Move metrics next to output file
+        if args.metrics:
+            shutil.move(metrics.get_metrics_path(temp_file), metrics.get_metrics_path(outfiles[analysis]))
+    return cutflows
 
 
 if __name__ == "__main__":
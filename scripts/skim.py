@@ -2,31 +2,89 @@
 
 import argparse
 import os
-import subprocess
 
-from UWVV.VVAnalysis import helpers, skimtools
+from UWVV.VVAnalysis import bundles, helpers, service, skimconfig, storage
 
 
 def main():
     """Apply cuts/triggers and additional selections to an input file."""
     parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=helpers.CustomHelpFormatter)
-    parser.add_argument("-a", "--analysis", default="ZZ4l", help="name of analysis")
+    parser.add_argument(
+        "-a", "--analysis", nargs="+", default=["ZZ4l"], help="name of analysis (several are skimmed in one read)"
+    )
     parser.add_argument("-y", "--year", default="2022", help="year for analysis")
     parser.add_argument("-t", "--trigger", default="MonteCarlo", help="trigger set to apply")
-    parser.add_argument("-o", "--outfile", default=argparse.SUPPRESS, help="output file (default: output<YEAR>.root)")
+    parser.add_argument(
+        "-o",
+        "--outfile",
+        default=argparse.SUPPRESS,
+        help="output file, suffixed with _<ANALYSIS> for several analyses (default: output<YEAR>.root)",
+    )
     parser.add_argument("-g", "--save-gen", action="store_true", help="save gen trees")
     parser.add_argument("-v", "--verbose", action="store_true", help="print during skimming")
     parser.add_argument("--json-dir", default=helpers.JSON_DIR, help="directory for JSON files")
+    parser.add_argument(
+        "-b",
+        "--bundle",
+        nargs="+",
+        default=argparse.SUPPRESS,
+        help="config bundle of each analysis from make_bundle.py, replacing -a, -y, and --json-dir",
+    )
+    parser.add_argument(
+        "--single-pass", action="store_true", help="apply cuts and selector together, copying only the best candidates"
+    )
+    parser.add_argument(
+        "--columnar", action="store_true", help="select the best candidates with vectorized passes over columns"
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        default=argparse.SUPPRESS,
+        choices=["tree", "rdf", "numpy"],
+        help="engine used to apply cuts (default: rdf, which runs channels concurrently, or tree with --cluster-index)",
+    )
+    parser.add_argument(
+        "--num-threads", type=int, default=0, help="number of threads for the rdf engine (0 uses all available cores)"
+    )
+    parser.add_argument("--kernel-cache", help="directory to cache compiled cuts for the rdf engine")
+    parser.add_argument(
+        "--cluster-index",
+        action="store_true",
+        help="skip clusters that cannot pass the cuts, using the min/max index of each input file (built if missing)",
+    )
+    parser.add_argument("--index-dir", help="directory for cluster indexes (default: next to each input file)")
+    parser.add_argument(
+        "--cutflow", action="store_true", help="save cutflow and timing of each cut to <OUTFILE>.cutflow.json"
+    )
+    parser.add_argument(
+        "--metrics", action="store_true", help="save timing, memory, and I/O of each stage to <OUTFILE>.metrics.json"
+    )
+    parser.add_argument(
+        "-p",
+        "--profile",
+        default=argparse.SUPPRESS,
+        help="compression and clustering profile of the output file (default: default)",
+    )
+    parser.add_argument(
+        "--storage-backend",
+        default="hdfs",
+        choices=list(storage.BACKENDS),
+        help="backend used to check that remote input files exist",
+    )
+    parser.add_argument("--no-validation", action="store_true", help="skip checking that input files exist")
+    parser.add_argument(
+        "--server",
+        nargs="?",
+        const=service.get_default_address(),
+        default=argparse.SUPPRESS,
+        help="submit to a running skim_server.py, at the given socket or the default one of the user",
+    )
 
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument("-i", "--infiles", nargs="+", help="input file")
     group.add_argument("-I", "--input-file-list", help="file that lists input files, one per line")
     args = parser.parse_args()
 
-    # Handle defaults
-    if "outfile" not in args:
-        args.outfile = f"output{args.year}.root"
-
     # Read input file list, if given
     if args.input_file_list is not None:
         if not os.path.isfile(args.input_file_list):
@@ -34,34 +92,85 @@ def main():
         with open(args.input_file_list) as infile:
             args.infiles = [line.strip() for line in infile if not line.isspace() and not line.startswith("#")]
 
+    # Skim the channels concurrently by default, with the engine that supports it
+    # (The tree engine applies the cuts with TTree::CopyTree, one channel at a time)
+    if "engine" not in args:
+        args.engine = "tree" if args.cluster_index else "rdf"
+
     # Error checking
-    for infile in args.infiles:
-        if infile.startswith("root:"):
-            status = subprocess.call(
-                f"hdfs dfs -ls {infile[infile.find('/store'):]}".split(),
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
+    if args.num_threads < 0:
+        parser.error(f"invalid number of threads: {args.num_threads}")
+    if args.cluster_index and (args.engine == "rdf" or (args.engine == "tree" and args.columnar)):
+        parser.error("--cluster-index is not supported by the rdf engine or by --columnar with the tree engine")
+    if not args.no_validation:
+        missing = storage.find_missing_files(args.infiles, args.storage_backend)
+        if missing:
+            parser.error(f"invalid file(s): {', '.join(missing)}")
+    if "bundle" in args:
+        for path in args.bundle:
+            if not os.path.isfile(path):
+                parser.error(f"invalid bundle: {path}")
+    else:
+        if len(set(args.analysis)) != len(args.analysis):
+            parser.error(f"duplicate analyses: {' '.join(args.analysis)}")
+        for analysis in args.analysis:
+            if not os.path.isdir(os.path.join(args.json_dir, analysis)):
+                parser.error(f"invalid analysis: {analysis}")
+            if not os.path.isdir(os.path.join(args.json_dir, analysis, args.year)):
+                parser.error(f"invalid year for analysis {analysis}: {args.year}")
+
+    # Submit to a running skim server, if specified, which applies the remaining defaults
+    if "server" in args:
+        if not service.is_running(args.server):
+            parser.error(f"no skim server running at {args.server} (see skim_server.py)")
+        result = service.submit(args.server, service.build_request(vars(args)))
+        if result["status"] != "done":
+            if args.verbose:
+                print(result["traceback"])
+            raise RuntimeError(f"skim failed on server: {result['error']}")
+        if args.verbose:
+            for outfile in result["outfiles"]:
+                print(f"Written to {outfile}")
+        return
+
+    # Load config bundles, if given, which determine the analyses and year
+    loaded_bundles = {}
+    if "bundle" in args:
+        try:
+            loaded_bundles = bundles.load_bundles(args.bundle)
+        except ValueError as err:
+            parser.error(str(err))
+        args.analysis = list(loaded_bundles)
+        args.year = next(iter(loaded_bundles.values()))["year"]
+
+    # Handle defaults
+    if "outfile" not in args:
+        args.outfile = f"output{args.year}.root"
+    if "profile" not in args:
+        args.profile = skimconfig.DEFAULT_PROFILE
+
+    # Load JSON information (or the bundle) for each analysis
+    analyses = {}
+    for analysis in args.analysis:
+        try:
+            analyses[analysis] = bundles.load_analysis_config(
+                analysis, args.year, args.trigger, args.profile, args.json_dir, loaded_bundles.get(analysis)
             )
-            if status != 0:
-                parser.error(f"invalid file: {infile}")
-        elif not os.path.isfile(infile.replace("file:", "")):
-            parser.error(f"invalid file: {infile}")
-    if not os.path.isdir(os.path.join(args.json_dir, args.analysis)):
-        parser.error(f"invalid analysis: {args.analysis}")
-    if not os.path.isdir(os.path.join(args.json_dir, args.analysis, args.year)):
-        parser.error(f"invalid year for analysis {args.analysis}: {args.year}")
-
-    # Load JSON information
-    cutinfo = helpers.load_json(args.analysis, args.year, "cuts.json", json_dir=args.json_dir)
-    aliases = helpers.load_json(args.analysis, args.year, "aliases.json", json_dir=args.json_dir)
-    triggers = helpers.load_json(args.analysis, args.year, "triggers.json", json_dir=args.json_dir)
-
-    # Error check provided trigger
-    if args.trigger not in triggers:
-        parser.error(f"invalid trigger: {args.trigger}")
-
-    # Call skimming function
-    skimtools.skim(args, cutinfo, aliases, triggers)
+        except ValueError as err:
+            parser.error(str(err))
+
+        # Write each analysis to its own output file, if skimming several at once
+        analyses[analysis]["outfile"] = skimconfig.get_analysis_outfile(args.outfile, analysis, len(args.analysis))
+
+    # Call skimming function (imported here, so the client mode never loads ROOT and the numpy engine runs without it)
+    if args.engine == "numpy":
+        from UWVV.VVAnalysis import vectorized  # noqa: PLC0415
+
+        vectorized.skim_analyses(args, analyses)
+    else:
+        from UWVV.VVAnalysis import skimtools  # noqa: PLC0415
+
+        skimtools.skim_analyses(args, analyses)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+import argparse
+import concurrent.futures
+import glob
+import os
+import threading
+import traceback
+from multiprocessing.connection import Listener
+from typing import Optional
+
+from UWVV.VVAnalysis import bundles, helpers, service, skimconfig, skimtools
+
+# Configurations resolved by a worker process, kept between requests, set by get_analysis_config()
+worker_configs = {}
+
+
+def main():
+    """Run a long-lived skim server that handles skim.py --server requests with warm worker processes.
+
+    Each worker imports ROOT, loads the selector dictionaries, and resolves the
+    configuration of the given analyses once when it starts, then handles requests
+    one at a time, so small files are skimmed without paying for the startup of
+    Python and ROOT. Configurations of other analyses, triggers, and profiles are
+    resolved by the first request that needs them and reused until their JSON files
+    change. Requests are read from a Unix socket that only the user can access, and
+    relative paths are resolved from the working directory of each client. The
+    output of each skim (e.g. with -v) is printed by the server. The server runs
+    until interrupted.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=helpers.CustomHelpFormatter)
+    parser.add_argument(
+        "-a", "--analysis", nargs="+", default=["ZZ4l"], help="name of analyses to resolve when each worker starts"
+    )
+    parser.add_argument("-y", "--year", default="2022", help="year for analyses to resolve when each worker starts")
+    parser.add_argument("--json-dir", default=helpers.JSON_DIR, help="directory for JSON files")
+    parser.add_argument("-j", "--num-workers", type=int, default=1, help="number of requests to skim at once")
+    parser.add_argument("-s", "--socket", default=service.get_default_address(), help="socket to listen on")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print each request and its result")
+    args = parser.parse_args()
+
+    # Error checking
+    for analysis in args.analysis:
+        if not os.path.isdir(os.path.join(args.json_dir, analysis)):
+            parser.error(f"invalid analysis: {analysis}")
+        if not os.path.isdir(os.path.join(args.json_dir, analysis, args.year)):
+            parser.error(f"invalid year for analysis {analysis}: {args.year}")
+    if args.num_workers <= 0:
+        parser.error(f"invalid number of workers: {args.num_workers}")
+    if os.path.exists(args.socket):
+        if service.is_running(args.socket):
+            parser.error(f"a skim server is already running at {args.socket}")
+
+        # Remove the socket of a server that did not shut down cleanly
+        os.remove(args.socket)
+
+    # Workers are replaced together if any of them dies (e.g. from a crash within ROOT)
+    pool = {"executor": start_workers(args), "lock": threading.Lock()}
+
+    # Create the socket without access for other users, so no one else can connect before it is restricted
+    umask = os.umask(0o177)
+    try:
+        listener = Listener(args.socket, family="AF_UNIX")
+    finally:
+        os.umask(umask)
+    with listener:
+        os.chmod(args.socket, 0o600)
+        print(f"Listening on {args.socket} with {args.num_workers} worker(s)")
+        try:
+            while True:
+                connection = listener.accept()
+                threading.Thread(target=handle, args=(connection, pool, args), daemon=True).start()
+        except KeyboardInterrupt:
+            print("\nShutting down")
+        finally:
+            pool["executor"].shutdown(wait=False, cancel_futures=True)
+
+
+def start_workers(args: argparse.Namespace) -> concurrent.futures.ProcessPoolExecutor:
+    """Start the pool of worker processes, each resolving the configuration of the given analyses."""
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=args.num_workers, initializer=init_worker, initargs=(args.analysis, args.year, args.json_dir)
+    )
+
+    # Workers are otherwise only started once requests arrive, so start them all now
+    futures = [executor.submit(os.getpid) for _ in range(args.num_workers)]
+    concurrent.futures.wait(futures)
+    return executor
+
+
+def handle(connection, pool: dict, args: argparse.Namespace):
+    """Skim the request of a client with the worker pool and send back the result."""
+    with connection:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return  # Nothing is sent when a client only checks that the server is running
+
+        if args.verbose:
+            print(f"Skimming {len(request['options']['infiles'])} file(s) for {request['cwd']}")
+
+        with pool["lock"]:
+            executor = pool["executor"]
+        try:
+            result = executor.submit(skim, request).result()
+        except concurrent.futures.BrokenExecutor:
+            result = {"status": "failed", "outfiles": [], "error": "worker process died", "traceback": ""}
+            with pool["lock"]:
+                if pool["executor"] is executor:
+                    print("Worker process died, restarting workers")
+                    pool["executor"] = start_workers(args)
+                    executor.shutdown(wait=False)
+
+        if args.verbose:
+            print(f"Request {result['status']}: {', '.join(result['outfiles']) or result['error']}")
+        try:
+            connection.send(result)
+        except (BrokenPipeError, ConnectionResetError):
+            print("Client disconnected before the result was sent")
+
+
+def init_worker(analyses: list, year: str, json_dir: str):
+    """Resolve the configuration of each trigger of the given analyses once per worker process.
+
+    The selector dictionaries are also loaded into this process.
+    """
+    for analysis in analyses:
+        skimtools.load_selectors(analysis)
+        for trigger in helpers.load_json(analysis, year, "triggers.json", json_dir=json_dir):
+            get_analysis_config(analysis, year, trigger, skimconfig.DEFAULT_PROFILE, json_dir)
+
+
+def get_json_signature(analysis: str, year: str, json_dir: str) -> list:
+    """Determine the modification time of each JSON file an analysis can be loaded from."""
+    dirnames = [json_dir, os.path.join(json_dir, analysis), os.path.join(json_dir, analysis, year)]
+    paths = sorted(path for dirname in dirnames for path in glob.glob(os.path.join(dirname, "*.json")))
+    return [(path, os.path.getmtime(path)) for path in paths]
+
+
+def get_analysis_config(
+    analysis: str, year: str, trigger: str, profile: str, json_dir: str, bundle: Optional[dict] = None
+) -> dict:
+    """Get the resolved configuration of an analysis, reusing it until its JSON files (or bundle) change.
+
+    See bundles.load_analysis_config() for the parameters. The returned dict can be
+    updated (e.g. with the output file) without changing the stored configuration.
+    """
+    key = (analysis, year, trigger, profile, json_dir)
+    signature = bundle["hash"] if bundle is not None else get_json_signature(analysis, year, json_dir)
+    if key not in worker_configs or worker_configs[key][0] != signature:
+        config = bundles.load_analysis_config(analysis, year, trigger, profile, json_dir, bundle)
+        if config.get("channels") is None:
+            config["channels"] = skimconfig.resolve_channels(
+                analysis, trigger, config["cutinfo"], config["aliases"], config["triggers"]
+            )
+        worker_configs[key] = (signature, config)
+    return dict(worker_configs[key][1])
+
+
+def skim(request: dict) -> dict:
+    """Skim the input files of a request with the options of skim.py, returning the result of service.submit()."""
+    os.chdir(request["cwd"])
+    args = argparse.Namespace(**request["options"])
+    try:
+        # Load config bundles, if given, which determine the analyses and year
+        loaded_bundles = bundles.load_bundles(args.bundle) if "bundle" in args else {}
+        if loaded_bundles:
+            args.analysis = list(loaded_bundles)
+            args.year = next(iter(loaded_bundles.values()))["year"]
+
+        # Handle defaults, as in skim.py
+        if "outfile" not in args:
+            args.outfile = f"output{args.year}.root"
+        if "profile" not in args:
+            args.profile = skimconfig.DEFAULT_PROFILE
+
+        analyses = {}
+        for analysis in args.analysis:
+            analyses[analysis] = get_analysis_config(
+                analysis, args.year, args.trigger, args.profile, args.json_dir, loaded_bundles.get(analysis)
+            )
+            analyses[analysis]["outfile"] = skimconfig.get_analysis_outfile(args.outfile, analysis, len(args.analysis))
+        skimtools.skim_analyses(args, analyses)
+    except Exception as err:  # noqa: BLE001
+        # Report any error to the client, rather than losing the worker
+        return {"status": "failed", "outfiles": [], "error": str(err), "traceback": traceback.format_exc()}
+    return {"status": "done", "outfiles": [os.path.abspath(config["outfile"]) for config in analyses.values()]}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import json
+import os
+
+from UWVV.VVAnalysis import helpers, metrics
+
+
+def main():
+    """Summarize the metrics of skimming jobs per sample and over the whole production.
+
+    Metrics are read from the <OUTFILE>.metrics.json files written with --metrics by
+    skim.py and multi_skim.py, or with --from-root from the output files themselves
+    (e.g. those of farmout_skim.py --metrics jobs). Directories are searched
+    recursively, and the sample of each job is the name of the directory containing
+    its output.
+
+    Jobs that skim several analyses at once read each input file once, so the time,
+    bytes read, and shared stages of such a job are included in the sample of each
+    analysis, but only counted once per sample and once in the total.
+
+    The ratio of CPU to wall time shows whether a stage is limited by the CPU (close
+    to 1, or more with several threads) or spends its time waiting on I/O (close to 0).
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=helpers.CustomHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="metrics files, output files, or directories containing them")
+    parser.add_argument("-r", "--from-root", action="store_true", help="read the metrics saved in the output files")
+    parser.add_argument("-n", "--num-slowest", type=int, default=10, help="number of slowest files to list")
+    parser.add_argument("-o", "--outfile", help="JSON file to save the summary to")
+    args = parser.parse_args()
+
+    # Error checking
+    for path in args.paths:
+        if not os.path.exists(path):
+            parser.error(f"invalid path: {path}")
+    if args.num_slowest < 0:
+        parser.error(f"invalid number of slowest files: {args.num_slowest}")
+
+    # Find the metrics of every job
+    pattern = "*.root" if args.from_root else "*.metrics.json"
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths += sorted(glob.glob(os.path.join(path, "**", pattern), recursive=True))
+        else:
+            paths.append(path)
+
+    # Group the metrics of the analyses of each job, by job and by sample
+    jobs = {}
+    sample_jobs = {}
+    files = []
+    num_missing = 0
+    for path in paths:
+        analysis_metrics = metrics.load_metrics(path)
+        if not analysis_metrics:
+            num_missing += 1
+            continue
+        sample = os.path.basename(os.path.dirname(os.path.abspath(path)))
+        shared = analysis_metrics["shared"]
+        if shared["job"] not in jobs:
+            files += [(sample, infile, info) for infile, info in shared["files"].items()]
+        jobs.setdefault(shared["job"], []).append(analysis_metrics)
+        sample_jobs.setdefault(sample, {}).setdefault(shared["job"], []).append(analysis_metrics)
+    if num_missing:
+        print(f"WARNING: no metrics found in {num_missing} file(s)")
+    if not jobs:
+        parser.error("no metrics found")
+
+    # Aggregate the metrics of the jobs of each sample and of the whole production
+    samples = {}
+    for sample, sample_analyses in sample_jobs.items():
+        samples[sample] = {}
+        for job_analyses in sample_analyses.values():
+            metrics.merge_metrics(samples[sample], combine_analyses(job_analyses))
+    total = {}
+    for job_analyses in jobs.values():
+        metrics.merge_metrics(total, combine_analyses(job_analyses))
+    files.sort(key=lambda file: file[2]["wall_time"], reverse=True)
+
+    print_samples(samples, total)
+    print_stages(total["stages"], total["wall_time"])
+    print_files(files[: args.num_slowest])
+
+    # Save summary, if specified
+    if args.outfile is not None:
+        with open(args.outfile, "w") as outfile:
+            summary = {
+                "samples": samples,
+                "total": total,
+                "slowest_files": [
+                    {"sample": sample, "infile": infile, **info} for sample, infile, info in files[: args.num_slowest]
+                ],
+            }
+            json.dump(summary, outfile, indent=2)
+            outfile.write("\n")
+
+
+def combine_analyses(job_analyses: list) -> dict:
+    """Combine the metrics of the analyses of a job, counting the metrics they share once.
+
+    Parameters
+    ----------
+    job_analyses : list of dict
+        The metrics of each analysis of the job (or of those in the same sample).
+
+    Returns
+    -------
+    dict
+        The metrics of the job, in the same format as those of a sample.
+
+    """
+    shared = job_analyses[0]["shared"]
+    combined = {
+        "jobs": 1,
+        "stages": json.loads(json.dumps(shared["stages"])),
+        "bytes_read": shared["bytes_read"],
+        "wall_time": max(analysis_metrics["wall_time"] for analysis_metrics in job_analyses),
+        "cpu_time": max(analysis_metrics["cpu_time"] for analysis_metrics in job_analyses),
+        "max_rss": max(analysis_metrics["max_rss"] for analysis_metrics in job_analyses),
+    }
+    for analysis_metrics in job_analyses:
+        metrics.merge_metrics(combined, {key: analysis_metrics[key] for key in ("stages", "channels", "bytes_written")})
+    return combined
+
+
+def get_ratio(numerator: float, denominator: float) -> float:
+    """Divide two numbers, returning 0 if the denominator is 0."""
+    return numerator / denominator if denominator else 0.0
+
+
+def print_samples(samples: dict, total: dict):
+    """Print the time, memory, I/O, and entries of each sample and of the whole production."""
+    print(
+        f"{'Sample':<40} {'Jobs':>5} {'Wall (h)':>9} {'CPU/wall':>9} {'RSS (MB)':>9} {'Read (GB)':>10} "
+        f"{'MB/s':>7} {'Written (GB)':>13} {'Entries in':>12} {'Entries out':>12}"
+    )
+    for sample, sample_metrics in [*sorted(samples.items()), ("Total", total)]:
+        entries_in = sum(info["entries_in"] for info in sample_metrics["channels"].values())
+        entries_out = sum(info["entries_out"] for info in sample_metrics["channels"].values())
+        print(
+            f"{sample:<40} {sample_metrics['jobs']:>5} {sample_metrics['wall_time'] / 3600:>9.2f} "
+            f"{get_ratio(sample_metrics['cpu_time'], sample_metrics['wall_time']):>9.2f} "
+            f"{sample_metrics['max_rss'] / 1024**2:>9.0f} {sample_metrics['bytes_read'] / 1024**3:>10.2f} "
+            f"{get_ratio(sample_metrics['bytes_read'] / 1024**2, sample_metrics['wall_time']):>7.1f} "
+            f"{sample_metrics['bytes_written'] / 1024**3:>13.2f} {entries_in:>12} {entries_out:>12}"
+        )
+
+
+def print_stages(stages: dict, wall_time: float):
+    """Print the time and memory of each stage over the whole production, slowest first."""
+    print(f"\n{'Stage':<10} {'Wall (h)':>9} {'Share':>7} {'CPU/wall':>9} {'RSS (MB)':>9} {'Calls':>9}")
+    for stage, info in sorted(stages.items(), key=lambda item: item[1]["wall_time"], reverse=True):
+        print(
+            f"{stage:<10} {info['wall_time'] / 3600:>9.2f} {get_ratio(info['wall_time'], wall_time):>7.1%} "
+            f"{get_ratio(info['cpu_time'], info['wall_time']):>9.2f} {info['max_rss'] / 1024**2:>9.0f} "
+            f"{info['calls']:>9}"
+        )
+
+
+def print_files(files: list):
+    """Print the slowest input files, as (sample, input file, metrics) tuples."""
+    if not files:
+        return
+    print(f"\n{'Wall (s)':>9} {'CPU/wall':>9} {'Read (MB)':>10} {'MB/s':>7}  Input file (sample)")
+    for sample, infile, info in files:
+        print(
+            f"{info['wall_time']:>9.1f} {get_ratio(info['cpu_time'], info['wall_time']):>9.2f} "
+            f"{info['bytes_read'] / 1024**2:>10.1f} {get_ratio(info['bytes_read'] / 1024**2, info['wall_time']):>7.1f}"
+            f"  {infile} ({sample})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,6 @@ void BestZZCandSelector::Init(TTree *tree) {
   if (!tree)
     return;
   fChain = tree;
-  nEntries = fChain->GetEntries();
 
   if (!GetInputList())
     throw std::invalid_argument("input list is empty");
@@ -52,16 +51,29 @@ void BestZZCandSelector::Init(TTree *tree) {
   fChain->SetBranchAddress(((TNamed *)GetInputList()->FindObject("l2Iso"))->GetTitle(), &l2Iso, &b_l2Iso);
   fChain->SetBranchAddress(((TNamed *)GetInputList()->FindObject("l3Iso"))->GetTitle(), &l3Iso, &b_l3Iso);
   fChain->SetBranchAddress(((TNamed *)GetInputList()->FindObject("l4Iso"))->GetTitle(), &l4Iso, &b_l4Iso);
+
+  // Optionally apply the cutstring in the same pass as the selection
+  TObject *cut = GetInputList()->FindObject("cut");
+  if (cut != nullptr) {
+    delete fCut;
+    fCut = new TTreeFormula("cut", ((TNamed *)cut)->GetTitle(), fChain);
+    if (fCut->GetNdim() == 0)
+      throw std::invalid_argument("invalid cut " + (std::string)((TNamed *)cut)->GetTitle());
+  }
+}
+
+Bool_t BestZZCandSelector::Notify() {
+  if (fCut)
+    fCut->UpdateFormulaLeaves();
+  return true;
 }
 
 Bool_t BestZZCandSelector::Process(Long64_t entry) {
+  if (fCut && !passesCut())
+    return true;
+
   b_evt->GetEntry(entry);
   b_run->GetEntry(entry);
-  if (run != fCurrentRun || evt != fCurrentEvt)
-    findBestEntry();
-  fCurrentRun = run;
-  fCurrentEvt = evt;
-
   b_Z1Mass->GetEntry(entry);
   b_Z2Mass->GetEntry(entry);
   b_l1Pt->GetEntry(entry);
@@ -88,67 +100,84 @@ Bool_t BestZZCandSelector::Process(Long64_t entry) {
     z2PtSum = l1Pt + l2Pt;
   }
 
-  if (tightZZ()) {
-    fTightEntries.push_back(entry);
-    fTightDiscriminants.push_back(discriminant);
-    fTightZ2PtSums.push_back(z2PtSum);
-  } else {
-    fLooseEntries.push_back(entry);
-    fLooseDiscriminants.push_back(discriminant);
-    fLooseZ2PtSums.push_back(z2PtSum);
-  }
+  // Skip candidates that cannot improve on the initial discriminant
+  const float maxDiscriminant = 1e10;
+  if (!(discriminant < maxDiscriminant || (discriminant == maxDiscriminant && z2PtSum > 0)))
+    return true;
 
-  if (entry == nEntries - 1)
-    findBestEntry();
+  // Keep the best candidate of each event, storing entry numbers relative to the full chain
+  Candidate candidate = {entry + fChain->GetTree()->GetChainOffset(), discriminant, z2PtSum};
+  if (tightZZ())
+    addCandidate(fBestTight, std::make_pair(run, evt), candidate);
+  else
+    addCandidate(fBestLoose, std::make_pair(run, evt), candidate);
 
   return true;
 }
 
 void BestZZCandSelector::SlaveTerminate() {
+  // Use the best tight candidate of each event, or the best loose candidate if there is none
+  for (const auto &[key, event] : fBestLoose)
+    fBestTight.emplace(key, event);
+  for (const auto &[key, event] : fBestTight) {
+    if (fChain->InheritsFrom(TChain::Class()))
+      fEntryList->Enter(getBest(event).entry, fChain);
+    else
+      fEntryList->Enter(getBest(event).entry);
+  }
+  fBestTight.clear();
+  fBestLoose.clear();
   fEntryList->OptimizeStorage();
   fEntryList = nullptr;
 }
 
+bool BestZZCandSelector::passesCut() {
+  Int_t ndata = fCut->GetNdata();
+  for (Int_t i = 0; i < ndata; i++) {
+    if (fCut->EvalInstance(i) != 0)
+      return true;
+  }
+  return false;
+}
+
 bool BestZZCandSelector::tightZZ() {
   return l1Tight && l2Tight && l3Tight && l4Tight && l1Iso && l2Iso && l3Iso && l4Iso;
 }
 
-void BestZZCandSelector::findBestEntry() {
-  Long64_t bestTightEntry = -1;
-  float bestTightDiscriminant = 1e10;
-  float bestTightZ2PtSum = 0.0;
-
-  Long64_t bestLooseEntry = -1;
-  float bestLooseDiscriminant = 1e10;
-  float bestLooseZ2PtSum = 0.0;
-
-  for (size_t i = 0; i < fTightEntries.size(); i++) {
-    if (fTightDiscriminants[i] < bestTightDiscriminant ||
-        (fTightDiscriminants[i] == bestTightDiscriminant && fTightZ2PtSums[i] > bestTightZ2PtSum)) {
-      bestTightEntry = fTightEntries[i];
-      bestTightDiscriminant = fTightDiscriminants[i];
-      bestTightZ2PtSum = fTightZ2PtSums[i];
-    }
-  }
-  for (size_t i = 0; i < fLooseEntries.size(); i++) {
-    if (fLooseDiscriminants[i] < bestLooseDiscriminant ||
-        (fLooseDiscriminants[i] == bestLooseDiscriminant && fLooseZ2PtSums[i] > bestLooseZ2PtSum)) {
-      bestLooseEntry = fLooseEntries[i];
-      bestLooseDiscriminant = fLooseDiscriminants[i];
-      bestLooseZ2PtSum = fLooseZ2PtSums[i];
-    }
-  }
+bool BestZZCandSelector::isBetter(const Candidate &candidate, const Candidate &best) {
+  // Compare candidates with the same discriminant by pt sum, where a NaN pt sum never wins a comparison,
+  // and break ties by entry number, so the result does not depend on the order entries are processed
+  if (std::isnan(candidate.z2PtSum))
+    return false;
+  if (std::isnan(best.z2PtSum))
+    return true;
+  if (candidate.z2PtSum != best.z2PtSum)
+    return candidate.z2PtSum > best.z2PtSum;
+  return candidate.entry < best.entry;
+}
 
-  if (bestTightEntry >= 0)
-    fEntryList->Enter(bestTightEntry);
-  else if (bestLooseEntry >= 0)
-    fEntryList->Enter(bestLooseEntry);
+void BestZZCandSelector::addCandidate(CandidateMap &bestCandidates,
+                                      const CandidateMap::key_type &key,
+                                      const Candidate &candidate) {
+  auto found = bestCandidates.find(key);
+  if (found == bestCandidates.end() || candidate.discriminant < found->second.first.discriminant) {
+    bestCandidates[key] = {candidate, candidate};
+    return;
+  }
 
-  fTightEntries.clear();
-  fTightDiscriminants.clear();
-  fTightZ2PtSums.clear();
+  // Only candidates with the best discriminant so far can be chosen
+  // (Candidates with a NaN discriminant are already skipped by Process())
+  EventCandidates &event = found->second;
+  if (candidate.discriminant != event.first.discriminant)
+    return;
+  if (candidate.entry < event.first.entry)
+    event.first = candidate;
+  if (isBetter(candidate, event.best))
+    event.best = candidate;
+}
 
-  fLooseEntries.clear();
-  fLooseDiscriminants.clear();
-  fLooseZ2PtSums.clear();
+const BestZZCandSelector::Candidate &BestZZCandSelector::getBest(const EventCandidates &event) {
+  // When entries are read in order, as by the original selector, a first candidate with a NaN pt sum is never
+  // replaced by one with the same discriminant, since comparisons with NaN are false
+  return std::isnan(event.first.z2PtSum) ? event.first : event.best;
 }
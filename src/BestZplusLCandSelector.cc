@@ -11,7 +11,6 @@ void BestZplusLCandSelector::Init(TTree *tree) {
   if (!tree)
     return;
   fChain = tree;
-  nEntries = fChain->GetEntries();
 
   if (!GetInputList())
     throw std::invalid_argument("input list is empty");
@@ -24,46 +23,71 @@ void BestZplusLCandSelector::Init(TTree *tree) {
   fChain->SetBranchAddress(((TNamed *)GetInputList()->FindObject("run"))->GetTitle(), &run, &b_run);
   fChain->SetBranchAddress(((TNamed *)GetInputList()->FindObject("evt"))->GetTitle(), &evt, &b_evt);
   fChain->SetBranchAddress(((TNamed *)GetInputList()->FindObject("Z1Mass"))->GetTitle(), &Z1Mass, &b_Z1Mass);
+
+  // Optionally apply the cutstring in the same pass as the selection
+  TObject *cut = GetInputList()->FindObject("cut");
+  if (cut != nullptr) {
+    delete fCut;
+    fCut = new TTreeFormula("cut", ((TNamed *)cut)->GetTitle(), fChain);
+    if (fCut->GetNdim() == 0)
+      throw std::invalid_argument("invalid cut " + (std::string)((TNamed *)cut)->GetTitle());
+  }
+}
+
+Bool_t BestZplusLCandSelector::Notify() {
+  if (fCut)
+    fCut->UpdateFormulaLeaves();
+  return true;
 }
 
 Bool_t BestZplusLCandSelector::Process(Long64_t entry) {
+  if (fCut && !passesCut())
+    return true;
+
   b_evt->GetEntry(entry);
   b_run->GetEntry(entry);
-  if (run != fCurrentRun || evt != fCurrentEvt)
-    findBestEntry();
-  fCurrentRun = run;
-  fCurrentEvt = evt;
-
   b_Z1Mass->GetEntry(entry);
 
-  fEntries.push_back(entry);
-  fDiscriminants.push_back(fabs(Z1Mass - 91.1876));
+  // Skip candidates that cannot improve on the initial discriminant
+  float discriminant = fabs(Z1Mass - 91.1876);
+  if (!(discriminant < 1e10))
+    return true;
 
-  if (entry == nEntries - 1)
-    findBestEntry();
+  // Keep the best candidate of each event, storing entry numbers relative to the full chain
+  Candidate candidate = {entry + fChain->GetTree()->GetChainOffset(), discriminant};
+  auto best = fBestCandidates.find(std::make_pair(run, evt));
+  if (best == fBestCandidates.end())
+    fBestCandidates.emplace(std::make_pair(run, evt), candidate);
+  else if (isBetter(candidate, best->second))
+    best->second = candidate;
 
   return true;
 }
 
 void BestZplusLCandSelector::SlaveTerminate() {
+  for (const auto &[key, candidate] : fBestCandidates) {
+    if (fChain->InheritsFrom(TChain::Class()))
+      fEntryList->Enter(candidate.entry, fChain);
+    else
+      fEntryList->Enter(candidate.entry);
+  }
+  fBestCandidates.clear();
   fEntryList->OptimizeStorage();
   fEntryList = nullptr;
 }
 
-void BestZplusLCandSelector::findBestEntry() {
-  Long64_t bestEntry = -1;
-  float bestDiscriminant = 1e10;
-
-  for (size_t i = 0; i < fEntries.size(); i++) {
-    if (fDiscriminants[i] < bestDiscriminant) {
-      bestEntry = fEntries[i];
-      bestDiscriminant = fDiscriminants[i];
-    }
+bool BestZplusLCandSelector::passesCut() {
+  Int_t ndata = fCut->GetNdata();
+  for (Int_t i = 0; i < ndata; i++) {
+    if (fCut->EvalInstance(i) != 0)
+      return true;
   }
+  return false;
+}
 
-  if (bestEntry >= 0)
-    fEntryList->Enter(bestEntry);
-
-  fEntries.clear();
-  fDiscriminants.clear();
+bool BestZplusLCandSelector::isBetter(const Candidate &candidate, const Candidate &best) {
+  // Break ties by entry number, so the result does not depend on the order entries are processed
+  if (candidate.discriminant != best.discriminant)
+    return candidate.discriminant < best.discriminant;
+  return candidate.entry < best.entry;
 }
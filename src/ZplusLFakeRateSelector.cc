@@ -7,14 +7,7 @@ void ZplusLFakeRateSelector::SlaveBegin(TTree *tree) {
   // Check for valid channel
   if (channel_ != "eee" && channel_ != "eem" && channel_ != "emm" && channel_ != "mmm")
     throw std::invalid_argument("invalid channel provided for ZplusL fake rate: " + channel_);
-
-  // Create output file
-  std::string outpath = GetInput<TNamed>("output")->GetTitle();
-  outfile_ = new TFile(outpath.c_str(), "recreate");
-  if (outfile_ == nullptr)
-    throw std::invalid_argument("error creating file: " + outpath);
-  auto *subdir = outfile_->mkdir(name_.c_str())->mkdir(channel_.c_str());
-  subdir->cd();
+  isElectron_ = channel_ == "eee" || channel_ == "emm";
 
   // Set variable binning for pt/eta histograms
   const int numPtBins = 6;
@@ -27,27 +20,29 @@ void ZplusLFakeRateSelector::SlaveBegin(TTree *tree) {
   double muEtaBins[numMuEtaBins + 1] = {0.0, 1.2, 2.4};
 
   // Define histograms
-  looseElePt_barrel_ = new TH1D("looseElePt_barrel", "Electron Pt (Barrel)", numPtBins, ptBins);
-  looseElePt_endcap_ = new TH1D("looseElePt_endcap", "Electron Pt (Endcap)", numPtBins, ptBins);
-  looseMuPt_barrel_ = new TH1D("looseMuPt_barrel", "Muon Pt (Barrel)", numPtBins, ptBins);
-  looseMuPt_endcap_ = new TH1D("looseMuPt_endcap", "Muon Pt (Endcap)", numPtBins, ptBins);
+  looseElePt_barrel_ = AddOutput(new TH1D("looseElePt_barrel", "Electron Pt (Barrel)", numPtBins, ptBins));
+  looseElePt_endcap_ = AddOutput(new TH1D("looseElePt_endcap", "Electron Pt (Endcap)", numPtBins, ptBins));
+  looseMuPt_barrel_ = AddOutput(new TH1D("looseMuPt_barrel", "Muon Pt (Barrel)", numPtBins, ptBins));
+  looseMuPt_endcap_ = AddOutput(new TH1D("looseMuPt_endcap", "Muon Pt (Endcap)", numPtBins, ptBins));
 
-  looseEleEta_ = new TH1D("looseEleEta", "Electron Eta", numEleEtaBins, eleEtaBins);
-  looseMuEta_ = new TH1D("looseMuEta", "Muon Eta", numMuEtaBins, muEtaBins);
+  looseEleEta_ = AddOutput(new TH1D("looseEleEta", "Electron Eta", numEleEtaBins, eleEtaBins));
+  looseMuEta_ = AddOutput(new TH1D("looseMuEta", "Muon Eta", numMuEtaBins, muEtaBins));
 
-  looseElePtEta_ = new TH2D("looseElePtEta", "Electron Pt vs. Eta", numPtBins, ptBins, numEleEtaBins, eleEtaBins);
-  looseMuPtEta_ = new TH2D("looseMuPtEta", "Muon Pt vs. Eta", numPtBins, ptBins, numMuEtaBins, muEtaBins);
+  looseElePtEta_ =
+      AddOutput(new TH2D("looseElePtEta", "Electron Pt vs. Eta", numPtBins, ptBins, numEleEtaBins, eleEtaBins));
+  looseMuPtEta_ = AddOutput(new TH2D("looseMuPtEta", "Muon Pt vs. Eta", numPtBins, ptBins, numMuEtaBins, muEtaBins));
 
-  tightElePt_barrel_ = new TH1D("tightElePt_barrel", "Electron Pt (Barrel)", numPtBins, ptBins);
-  tightElePt_endcap_ = new TH1D("tightElePt_endcap", "Electron Pt (Endcap)", numPtBins, ptBins);
-  tightMuPt_barrel_ = new TH1D("tightMuPt_barrel", "Muon Pt (Barrel)", numPtBins, ptBins);
-  tightMuPt_endcap_ = new TH1D("tightMuPt_endcap", "Muon Pt (Endcap)", numPtBins, ptBins);
+  tightElePt_barrel_ = AddOutput(new TH1D("tightElePt_barrel", "Electron Pt (Barrel)", numPtBins, ptBins));
+  tightElePt_endcap_ = AddOutput(new TH1D("tightElePt_endcap", "Electron Pt (Endcap)", numPtBins, ptBins));
+  tightMuPt_barrel_ = AddOutput(new TH1D("tightMuPt_barrel", "Muon Pt (Barrel)", numPtBins, ptBins));
+  tightMuPt_endcap_ = AddOutput(new TH1D("tightMuPt_endcap", "Muon Pt (Endcap)", numPtBins, ptBins));
 
-  tightEleEta_ = new TH1D("tightEleEta", "Electron Eta", numEleEtaBins, eleEtaBins);
-  tightMuEta_ = new TH1D("tightMuEta", "Muon Eta", numMuEtaBins, muEtaBins);
+  tightEleEta_ = AddOutput(new TH1D("tightEleEta", "Electron Eta", numEleEtaBins, eleEtaBins));
+  tightMuEta_ = AddOutput(new TH1D("tightMuEta", "Muon Eta", numMuEtaBins, muEtaBins));
 
-  tightElePtEta_ = new TH2D("tightElePtEta", "Electron Pt vs. Eta", numPtBins, ptBins, numEleEtaBins, eleEtaBins);
-  tightMuPtEta_ = new TH2D("tightMuPtEta", "Muon Pt vs. Eta", numPtBins, ptBins, numMuEtaBins, muEtaBins);
+  tightElePtEta_ =
+      AddOutput(new TH2D("tightElePtEta", "Electron Pt vs. Eta", numPtBins, ptBins, numEleEtaBins, eleEtaBins));
+  tightMuPtEta_ = AddOutput(new TH2D("tightMuPtEta", "Muon Pt vs. Eta", numPtBins, ptBins, numMuEtaBins, muEtaBins));
 }
 
 void ZplusLFakeRateSelector::Init(TTree *tree) {
@@ -75,40 +70,40 @@ void ZplusLFakeRateSelector::Init(TTree *tree) {
 }
 
 Bool_t ZplusLFakeRateSelector::Process(Long64_t entry) {
-  // Load branches
-  weight_ = 1;
+  // Apply cuts, loading each branch only when needed
   b_Z1Mass->GetEntry(entry);
-
+  if (Z1Mass > 98.1876 || Z1Mass < 84.1876)
+    return true;
+  b_type1_pfMETEt->GetEntry(entry);
+  if (type1_pfMETEt > 25)
+    return true;
+  b_l3MtToMET->GetEntry(entry);
+  if (l3MtToMET > 30)
+    return true;
   b_l1Tight->GetEntry(entry);
   b_l1Iso->GetEntry(entry);
   b_l2Tight->GetEntry(entry);
   b_l2Iso->GetEntry(entry);
+  if (!l1Tight || !l1Iso || !l2Tight || !l2Iso)
+    return true;
 
+  // Load remaining branches
+  b_l3Tight->GetEntry(entry);
+  b_l3Iso->GetEntry(entry);
   b_l3Pt->GetEntry(entry);
   b_l3Eta->GetEntry(entry);
-  b_l3MtToMET->GetEntry(entry);
 
-  b_type1_pfMETEt->GetEntry(entry);
+  weight_ = 1;
   if (isMC_) {
     b_genWeight->GetEntry(entry);
     weight_ = genWeight;
   }
 
-  // Apply cuts
-  if (Z1Mass > 98.1876 || Z1Mass < 84.1876)
-    return true;
-  if (type1_pfMETEt > 25)
-    return true;
-  if (l3MtToMET > 30)
-    return true;
-  if (!l1Tight || !l1Iso || !l2Tight || !l2Iso)
-    return true;
-
   // Set variables
   float l3AbsEta = std::abs(l3Eta);
 
   // Fill loose histograms
-  if (channel_ == "eee" || channel_ == "emm") {
+  if (isElectron_) {
     //Electron barrel up to |eta| = 1.479
     if (l3AbsEta < 1.479) {
       looseElePt_barrel_->Fill(l3Pt, weight_);
@@ -130,7 +125,7 @@ Bool_t ZplusLFakeRateSelector::Process(Long64_t entry) {
 
   // Fill tight histograms
   if (l3Tight && l3Iso) {
-    if (channel_ == "eee" || channel_ == "emm") {
+    if (isElectron_) {
       //Electron barrel up to |eta| = 1.479
       if (l3AbsEta < 1.479) {
         tightElePt_barrel_->Fill(l3Pt, weight_);
@@ -153,9 +148,3 @@ Bool_t ZplusLFakeRateSelector::Process(Long64_t entry) {
 
   return true;
 }
-
-void ZplusLFakeRateSelector::SlaveTerminate() {
-  // Write and close file
-  outfile_->Write();
-  outfile_->Close();
-}